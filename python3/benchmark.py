@@ -0,0 +1,378 @@
+#! /usr/bin/env python3
+"""
+Benchmarks for the scheduler's hot paths, on synthetic workloads of growing size.
+
+Times CSV loading (as `Order` objects, and as an `OrderTable` parsed or memory-mapped
+from its cache), `ZipScheduler.queue_order` (with the drain of its intake into the
+priority queue), `Flight.get_distance`, `ZipScheduler.launch_flights` (per tick) and
+a full simulated day, and reports throughput and per-tick latency percentiles. Results can be saved as a baseline and
+later runs compared against it.
+
+A stress scenario also queues orders from several threads while ticks keep running,
+and fails unless every order ships exactly once.
+
+Usage:
+
+> python3 benchmark.py
+> python3 benchmark.py --sizes small medium --save baseline.json
+> python3 benchmark.py --sizes small medium --compare baseline.json
+> python3 benchmark.py --custom 10000 1000000
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from traveling_zip import Flight, Hospital, Order, OrderTable, Runner, ZipScheduler
+from traveling_zip import (
+    MAX_PACKAGES_PER_ZIP,
+    NUM_ZIPS,
+    SECONDS_PER_DAY,
+    SECONDS_PER_TICK,
+    ZIP_MAX_CUMULATIVE_RANGE_M,
+    ZIP_SPEED_MPS,
+)
+from workload import generate_workload
+
+# name -> (hospitals, orders)
+BENCHMARK_SIZES = {
+    "small": (50, 2_000),
+    "medium": (500, 20_000),
+    "large": (2_000, 200_000),
+}
+
+# random flight plans timed per get_distance benchmark
+DISTANCE_SAMPLES = 20_000
+
+# threads queueing orders at once in the concurrent intake stress test, and the number
+# of orders they share
+INTAKE_PRODUCERS = 8
+INTAKE_ORDERS = 5_000
+# a fleet big enough to ship the stress test's orders in a few simulated hours
+INTAKE_NUM_ZIPS = 100
+# GIL switch interval (s) during the stress test, short enough that threads switch in
+# the middle of ticks
+INTAKE_SWITCH_INTERVAL_S = 1e-5
+
+# benchmark name -> metric name -> value
+Results = Dict[str, Dict[str, float]]
+
+
+def _load(hospitals_path: str, orders_path: str) -> Tuple[Dict[str, Hospital], list]:
+    with open(hospitals_path, "r") as f:
+        hospitals = Hospital.load_from_csv(f)
+    with open(orders_path, "r") as f:
+        orders = Order.load_from_csv(f, hospitals)
+    return hospitals, orders
+
+
+def _new_scheduler(
+    hospitals: Dict[str, Hospital], num_zips: int = NUM_ZIPS
+) -> ZipScheduler:
+    return ZipScheduler(
+        hospitals=hospitals,
+        num_zips=num_zips,
+        max_packages_per_zip=MAX_PACKAGES_PER_ZIP,
+        zip_speed_mps=ZIP_SPEED_MPS,
+        zip_max_cumulative_range_m=ZIP_MAX_CUMULATIVE_RANGE_M,
+    )
+
+
+def bench_csv_load(hospitals_path: str, orders_path: str) -> Results:
+    start = time.perf_counter()
+    hospitals, orders = _load(hospitals_path, orders_path)
+    seconds = time.perf_counter() - start
+    return {
+        "csv_load": {
+            "seconds": seconds,
+            "rows_per_s": (len(hospitals) + len(orders)) / seconds,
+        }
+    }
+
+
+def bench_order_table(hospitals_path: str, orders_path: str) -> Results:
+    with open(hospitals_path, "r") as f:
+        hospitals = Hospital.load_from_csv(f)
+    results = {}
+    # the first load parses the CSV and writes the cache, the second maps the cache
+    for label in ("parse", "cached"):
+        start = time.perf_counter()
+        table = OrderTable.load(orders_path, hospitals)
+        seconds = time.perf_counter() - start
+        results[f"{label}_rows_per_s"] = len(table) / seconds
+    return {"order_table_load": results}
+
+
+def bench_queue_order(hospitals_path: str, orders_path: str) -> Results:
+    """
+    Queue every order, then order them by priority the way the next tick does.
+    `queue_order` only appends to the intake; the orders are pushed onto the priority
+    queue when the intake is drained, under the tick lock.
+    Raises:
+        RuntimeError: If the queue doesn't end up holding every order.
+    """
+    hospitals, orders = _load(hospitals_path, orders_path)
+    scheduler = _new_scheduler(hospitals)
+    start = time.perf_counter()
+    for order in orders:
+        scheduler.queue_order(order)
+    intake_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    # reading the queue's length drains the intake first, as a tick would
+    queued = scheduler.num_unfulfilled_orders
+    drain_seconds = time.perf_counter() - start
+    if queued != len(orders):
+        raise RuntimeError(f"Queued {queued} of {len(orders)} orders")
+    seconds = intake_seconds + drain_seconds
+    return {
+        "queue_order": {
+            "seconds": seconds,
+            "orders_per_s": len(orders) / seconds,
+            "intake_orders_per_s": len(orders) / intake_seconds,
+            "drain_orders_per_s": len(orders) / drain_seconds,
+        }
+    }
+
+
+def bench_get_distance(hospitals_path: str, seed: int) -> Results:
+    with open(hospitals_path, "r") as f:
+        hospitals = list(Hospital.load_from_csv(f).values())
+    scheduler = _new_scheduler({h.name: h for h in hospitals})
+    rng = random.Random(seed)
+    flight_plans = [
+        [
+            Order(0, rng.choice(hospitals), "Resupply")
+            for _ in range(rng.randint(1, MAX_PACKAGES_PER_ZIP))
+        ]
+        for _ in range(DISTANCE_SAMPLES)
+    ]
+
+    results = {}
+    for label, distance_matrix in (
+        ("matrix", scheduler.distance_matrix),
+        ("math_dist", None),
+    ):
+        start = time.perf_counter()
+        for flight_plan in flight_plans:
+            Flight.get_distance(flight_plan, distance_matrix)
+        seconds = time.perf_counter() - start
+        results[f"{label}_calls_per_s"] = len(flight_plans) / seconds
+    return {"get_distance": results}
+
+
+def bench_full_day(hospitals_path: str, orders_path: str) -> Results:
+    hospitals, orders = _load(hospitals_path, orders_path)
+    runner = Runner.from_loaded(hospitals, orders, verbose=False)
+
+    tick_seconds: List[float] = []
+    launch_flights = runner.scheduler.launch_flights
+
+    def timed_launch_flights(
+        current_time: int, emergency_only: bool = False
+    ) -> Optional[List[Flight]]:
+        start = time.perf_counter()
+        flights = launch_flights(current_time, emergency_only)
+        tick_seconds.append(time.perf_counter() - start)
+        return flights
+
+    runner.scheduler.launch_flights = timed_launch_flights  # type: ignore
+    start = time.perf_counter()
+    runner.run()
+    seconds = time.perf_counter() - start
+
+    ticks_ms = np.array(tick_seconds) * 1000 if tick_seconds else np.zeros(1)
+    return {
+        "launch_flights": {
+            "ticks": float(len(tick_seconds)),
+            "p50_ms": float(np.percentile(ticks_ms, 50)),
+            "p95_ms": float(np.percentile(ticks_ms, 95)),
+            "p99_ms": float(np.percentile(ticks_ms, 99)),
+            "max_ms": float(ticks_ms.max()),
+        },
+        "full_day": {
+            "seconds": seconds,
+            "orders_per_s": len(orders) / seconds,
+            "orders_shipped": float(runner.scheduler.metrics.order_wait_s.count),
+        },
+    }
+
+
+def bench_concurrent_intake(
+    hospitals_path: str, orders_path: str, producers: int = INTAKE_PRODUCERS
+) -> Results:
+    """
+    Queue orders from several threads while the main thread keeps ticking, then tick
+    until everything has shipped. This measures intake throughput: ticks start at the
+    last order's time, so no wait is negative however fast the orders come in.
+    tests/test_concurrency.py checks ticking against orders placed in real time.
+    Raises:
+        RuntimeError: If an order shipped twice, or never shipped.
+    """
+    hospitals, orders = _load(hospitals_path, orders_path)
+    orders = orders[:INTAKE_ORDERS]
+    scheduler = _new_scheduler(hospitals, INTAKE_NUM_ZIPS)
+
+    def produce(share: List[Order]) -> None:
+        for order in share:
+            scheduler.queue_order(order)
+            # give up the GIL after every order, so ticks run in between
+            time.sleep(0)
+
+    threads = [
+        threading.Thread(target=produce, args=(orders[start::producers],))
+        for start in range(producers)
+    ]
+    shipped: "collections.Counter[Order]" = collections.Counter()
+    ticks_during_intake = 0
+    intake_seconds = None
+    current_time = -(-orders[-1].time // SECONDS_PER_TICK) * SECONDS_PER_TICK
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(INTAKE_SWITCH_INTERVAL_S)
+    try:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        while current_time < 10 * SECONDS_PER_DAY:
+            for flight in scheduler.launch_flights(current_time) or []:
+                shipped.update(flight.orders)
+            current_time += SECONDS_PER_TICK
+            if intake_seconds is None:
+                ticks_during_intake += 1
+                if not any(thread.is_alive() for thread in threads):
+                    intake_seconds = time.perf_counter() - start
+            elif not scheduler.num_unfulfilled_orders:
+                break
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    shipped_twice = sum(1 for count in shipped.values() if count > 1)
+    never_shipped = len(orders) - len(shipped)
+    if shipped_twice or never_shipped:
+        raise RuntimeError(
+            f"Concurrent intake lost or duplicated orders: {shipped_twice} shipped"
+            + f" more than once, {never_shipped} never shipped"
+        )
+    return {
+        "concurrent_intake": {
+            "producers": float(producers),
+            "orders_per_s": len(orders) / (intake_seconds or float("nan")),
+            "ticks_during_intake": float(ticks_during_intake),
+        }
+    }
+
+
+def run_benchmarks(
+    sizes: Dict[str, Tuple[int, int]],
+    emergency_ratio: float = 0.3,
+    burstiness: float = 0.0,
+    seed: int = 0,
+    workdir: Optional[str] = None,
+) -> Results:
+    """
+    Generate a workload for every size and time each hot path on it.
+    Args:
+        sizes (dict): Size name -> (hospitals, orders).
+        emergency_ratio (float): Share of Emergency orders.
+        burstiness (float): Share of orders that arrive in bursts.
+        seed (int): Seed for the workloads.
+        workdir (str): Where to write the workloads, defaults to a temporary directory.
+    Returns:
+        dict: "<size>/<benchmark>" -> metric name -> value.
+    """
+    results: Results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, (num_hospitals, num_orders) in sizes.items():
+            hospitals_path, orders_path = generate_workload(
+                os.path.join(workdir or tmp, label),
+                num_hospitals,
+                num_orders,
+                emergency_ratio=emergency_ratio,
+                burstiness=burstiness,
+                seed=seed,
+            )
+            for benchmark_results in (
+                bench_csv_load(hospitals_path, orders_path),
+                bench_order_table(hospitals_path, orders_path),
+                bench_queue_order(hospitals_path, orders_path),
+                bench_get_distance(hospitals_path, seed),
+                bench_full_day(hospitals_path, orders_path),
+                bench_concurrent_intake(hospitals_path, orders_path),
+            ):
+                for name, metrics in benchmark_results.items():
+                    results[f"{label}/{name}"] = metrics
+    return results
+
+
+def print_results(results: Results, baseline: Optional[Results] = None) -> None:
+    """
+    Print one line per metric, with the change against a baseline when given.
+    Args:
+        results (dict): Output of `run_benchmarks`.
+        baseline (dict): Earlier output of `run_benchmarks` to compare against.
+    """
+    for benchmark, metrics in results.items():
+        for metric, value in metrics.items():
+            line = f"{benchmark:<28} {metric:<24} {value:>14.4g}"
+            previous = (baseline or {}).get(benchmark, {}).get(metric)
+            if previous:
+                line += f"   baseline {previous:>12.4g}  ({100 * (value / previous - 1):+.1f}%)"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scheduler.")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        choices=list(BENCHMARK_SIZES),
+        default=["small", "medium"],
+    )
+    parser.add_argument(
+        "--custom",
+        nargs=2,
+        type=int,
+        metavar=("HOSPITALS", "ORDERS"),
+        help="also benchmark a workload of this size",
+    )
+    parser.add_argument("--emergency-ratio", type=float, default=0.3)
+    parser.add_argument("--burstiness", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep the generated workloads here")
+    parser.add_argument("--save", metavar="JSON", help="save the results as a baseline")
+    parser.add_argument(
+        "--compare", metavar="JSON", help="compare against a saved baseline"
+    )
+    args = parser.parse_args()
+
+    sizes = {label: BENCHMARK_SIZES[label] for label in args.sizes}
+    if args.custom:
+        sizes["custom"] = tuple(args.custom)
+
+    results = run_benchmarks(
+        sizes,
+        emergency_ratio=args.emergency_ratio,
+        burstiness=args.burstiness,
+        seed=args.seed,
+        workdir=args.workdir,
+    )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
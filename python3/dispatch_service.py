@@ -0,0 +1,449 @@
+#! /usr/bin/env python3
+"""
+Real-time dispatch: feed orders to a `ZipScheduler` as they arrive and launch flights on
+a wall-clock timer.
+
+Orders are line-delimited records in the orders.csv schema (`time, hospital, priority`),
+read from stdin or a local TCP socket. The time may be left out (`hospital, priority`),
+in which case the order is stamped with the time it was read; an order stamped ahead of
+the scheduler's clock is held until the clock gets there, so a CSV piped into a sped-up
+clock replays in real time. Every launched flight is written to stdout as a JSON line.
+
+The service runs across midnight: its clock counts seconds since midnight of the day it
+started and carries on past `SECONDS_PER_DAY` on later days, and a record's time of day
+is taken to mean its nearest occurrence on that clock.
+
+With `--state-dir`, the scheduler journals its orders and launches there and snapshots
+its state every few minutes, and a restarted service resumes from it instead of starting
+with an empty queue.
+
+Readers hand orders to a bounded queue, so a client that sends faster than the service
+keeps up is slowed down instead of growing memory. Scheduling passes run in a single
+worker thread, off the event loop, so a slow pass never stalls reading orders; orders
+read during a pass are queued on the scheduler right before the next one. The time from
+reading an order to launching it is recorded per order and reported on exit.
+
+Usage:
+
+> python3 dispatch_service.py --listen 127.0.0.1:8765
+> python3 dispatch_service.py < ../inputs/orders.csv --start 25200 --speedup 600
+> python3 dispatch_service.py --listen 127.0.0.1:8765 --state-dir /var/lib/zips
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import os
+import signal
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, TextIO, Tuple
+
+from traveling_zip import (
+    MAX_PACKAGES_PER_ZIP,
+    NUM_ZIPS,
+    SECONDS_PER_DAY,
+    SECONDS_PER_TICK,
+    ZIP_MAX_CUMULATIVE_RANGE_M,
+    SNAPSHOT_INTERVAL_S,
+    ZIP_SPEED_MPS,
+    Flight,
+    Hospital,
+    Order,
+    SchedulerJournal,
+    StreamingHistogram,
+    ZipScheduler,
+)
+
+# orders read but not yet handed to the scheduling thread
+DEFAULT_INTAKE_SIZE = 10_000
+# launched flights not yet written out
+DEFAULT_OUTPUT_SIZE = 1_000
+
+
+class DispatchClock:
+    """Seconds since midnight of the day the service started on the scheduler's clock,
+    which can run faster than the wall clock to replay a day of orders quickly.
+
+    The clock never wraps: past midnight it reads `SECONDS_PER_DAY` and up, so the
+    scheduler sees one timeline however many days the service runs for.
+    """
+
+    def __init__(self, start_s: Optional[float] = None, speedup: float = 1.0):
+        """
+        Args:
+            start_s (float): Scheduler time to start at, defaults to the local time now.
+            speedup (float): Scheduler seconds per wall-clock second.
+        """
+        if start_s is None:
+            now = datetime.datetime.now()
+            start_s = now.hour * 3600 + now.minute * 60 + now.second
+        self.start_s = start_s
+        self.speedup = speedup
+        self._started = time.monotonic()
+
+    def now(self) -> int:
+        return int(self.start_s + (time.monotonic() - self._started) * self.speedup)
+
+    def place(self, time_of_day_s: int) -> int:
+        """
+        Args:
+            time_of_day_s (int): Seconds since some midnight.
+        Returns:
+            int: Scheduler time of the occurrence of that time of day nearest to now;
+                times of `SECONDS_PER_DAY` or more are already scheduler times.
+        """
+        if not 0 <= time_of_day_s < SECONDS_PER_DAY:
+            return time_of_day_s
+        now = self.now()
+        placed = now - now % SECONDS_PER_DAY + time_of_day_s
+        if placed - now > SECONDS_PER_DAY // 2:
+            placed -= SECONDS_PER_DAY
+        elif now - placed > SECONDS_PER_DAY // 2:
+            placed += SECONDS_PER_DAY
+        return placed
+
+    def catch_up(self, time_s: int) -> None:
+        """Move the clock on by whole days until it's past `time_s`, so a service
+        resumed from state saved on an earlier day carries on after it."""
+        if time_s > self.start_s:
+            self.start_s += SECONDS_PER_DAY * -(
+                -(time_s - self.start_s) // SECONDS_PER_DAY
+            )
+
+    def wall_seconds(self, scheduler_seconds: float) -> float:
+        """Wall-clock seconds that take this many seconds on the scheduler's clock."""
+        return scheduler_seconds / self.speedup
+
+
+class DispatchService:
+    """Wraps a ZipScheduler with asyncio order intake and a wall-clock tick loop.
+
+    The scheduler is only ever touched by one worker thread: each tick hands it the
+    orders read since the last tick, queues them and launches flights in one go.
+    """
+
+    def __init__(
+        self,
+        scheduler: ZipScheduler,
+        clock: DispatchClock,
+        output: TextIO,
+        intake_size: int = DEFAULT_INTAKE_SIZE,
+        output_size: int = DEFAULT_OUTPUT_SIZE,
+    ):
+        """
+        Args:
+            scheduler (ZipScheduler): Scheduler to feed.
+            clock (DispatchClock): Clock to tick and stamp orders on.
+            output (TextIO): Where to write launched flights.
+            intake_size (int): Orders that can be waiting for the scheduler before
+                readers are held back.
+            output_size (int): Flights that can be waiting to be written before
+                scheduling passes are held back.
+        """
+        self.scheduler = scheduler
+        self.clock = clock
+        self.output = output
+        self.intake: "asyncio.Queue[Tuple[Order, float]]" = asyncio.Queue(intake_size)
+        self.launched: "asyncio.Queue[Tuple[Flight, List[Optional[float]]]]" = (
+            asyncio.Queue(output_size)
+        )
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="scheduler"
+        )
+        # monotonic time each order was read, while it's queued on the scheduler; orders
+        # restored from a journal were read by an earlier process and have none
+        self._read_at: Dict[Order, float] = {}
+        # microseconds from reading an order to launching its flight
+        self.ingest_to_launch_us = StreamingHistogram()
+        self.invalid_records = 0
+
+    def parse(self, line: str) -> Optional[Order]:
+        """
+        Args:
+            line (str): `time, hospital, priority` or `hospital, priority`, with the
+                time in seconds since midnight.
+        Returns:
+            Order: The order, or None if the record is blank or invalid.
+        """
+        fields = [field.strip() for field in line.split(",")]
+        if fields == [""]:
+            return None
+        try:
+            if len(fields) == 2:
+                received_s = self.clock.now()
+            else:
+                received_s = self.clock.place(int(fields.pop(0)))
+            name, priority = fields
+            return Order(received_s, self.scheduler.hospitals[name], priority)
+        except (KeyError, ValueError):
+            self.invalid_records += 1
+            print(f"Ignoring invalid order record: {line.strip()!r}", file=sys.stderr)
+            return None
+
+    async def read_orders(self, lines: AsyncIterator[str]) -> None:
+        """Queue every order from a stream until it ends, waiting while the intake is full."""
+        async for line in lines:
+            order = self.parse(line)
+            if order is None:
+                continue
+            ahead_s = order.time - self.clock.now()
+            if ahead_s > 0:
+                await asyncio.sleep(self.clock.wall_seconds(ahead_s))
+            await self.intake.put((order, time.monotonic()))
+
+    async def serve_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        async def lines() -> AsyncIterator[str]:
+            async for line in reader:
+                yield line.decode()
+
+        try:
+            await self.read_orders(lines())
+        finally:
+            writer.close()
+
+    def _tick(self, orders: List[Order], current_time: int) -> List[Flight]:
+        # runs on the scheduling thread
+        for order in orders:
+            self.scheduler.queue_order(order)
+        return self.scheduler.launch_flights(current_time) or []
+
+    async def run_ticks(self, stop_when_idle: "asyncio.Event") -> None:
+        """
+        Launch flights once a minute on the scheduler's clock, across midnight. Returns
+        once `stop_when_idle` is set and every order read has launched.
+        """
+        loop = asyncio.get_running_loop()
+        tick_s = self.clock.wall_seconds(SECONDS_PER_TICK)
+        while True:
+            current_time = self.clock.now()
+            batch = []
+            while not self.intake.empty():
+                order, read_at = self.intake.get_nowait()
+                self._read_at[order] = read_at
+                batch.append(order)
+            flights = await loop.run_in_executor(
+                self._executor, self._tick, batch, current_time
+            )
+            for flight in flights:
+                now = time.monotonic()
+                latencies = [
+                    now - read_at if read_at is not None else None
+                    for read_at in (
+                        self._read_at.pop(order, None) for order in flight.orders
+                    )
+                ]
+                await self.launched.put((flight, latencies))
+            if len(self._read_at) > self.scheduler.num_unfulfilled_orders:
+                # orders that left the queue without launching in a flight
+                waiting = set(self.scheduler.unfulfilled_orders)
+                self._read_at = {
+                    order: read_at
+                    for order, read_at in self._read_at.items()
+                    if order in waiting
+                }
+
+            if (
+                stop_when_idle.is_set()
+                and self.intake.empty()
+                and not self.scheduler.num_unfulfilled_orders
+            ):
+                break
+            # aim for the top of the minute, like the simulated Runner's ticks
+            next_tick = -(-(current_time + 1) // SECONDS_PER_TICK) * SECONDS_PER_TICK
+            await asyncio.sleep(
+                min(self.clock.wall_seconds(next_tick - self.clock.now()), tick_s)
+            )
+
+    async def write_flights(self) -> None:
+        """Write launched flights out as JSON lines, recording each order's latency."""
+        while True:
+            flight, latencies = await self.launched.get()
+            for latency in latencies:
+                if latency is not None:
+                    self.ingest_to_launch_us.record(latency * 1_000_000)
+            record = {
+                "event": "flight_launched",
+                "t": flight.launch_time,
+                "zip": flight.zip_id,
+                "orders": [
+                    [o.time, o.hospital.name, o.priority] for o in flight.orders
+                ],
+                "distance_m": flight.distance,
+                "return_t": flight.get_return_time(),
+                "ingest_to_launch_ms": [
+                    round(1000 * latency, 3) if latency is not None else None
+                    for latency in latencies
+                ],
+            }
+            self.output.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self.output.flush()
+            self.launched.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        latency = self.ingest_to_launch_us
+        return {
+            "orders_launched": latency.count,
+            "orders_waiting": self.scheduler.num_unfulfilled_orders,
+            "invalid_records": self.invalid_records,
+            "ingest_to_launch_ms": {
+                f"p{p}": round(latency.percentile(p) / 1000, 3) for p in (50, 95, 99)
+            },
+            "profile": self.scheduler.profiler.snapshot(),
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        # orders still queued are dropped here, or left to the journal to resume
+        self._read_at.clear()
+        if self.scheduler.journal is not None:
+            self.scheduler.journal.close()
+
+
+async def _stdin_lines() -> AsyncIterator[str]:
+    # blocking reads in a thread work whether stdin is a pipe, a file or a terminal
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            return
+        yield line
+
+
+async def serve(
+    service: DispatchService,
+    read_stdin: bool,
+    listen: Optional[Tuple[str, int]],
+) -> None:
+    """
+    Run the service until stdin ends and every order from it has launched, or until
+    cancelled when listening on a socket.
+    """
+    stop_when_idle = asyncio.Event()
+    writer = asyncio.create_task(service.write_flights())
+    ticks = asyncio.create_task(service.run_ticks(stop_when_idle))
+    server = None
+    if listen is not None:
+        server = await asyncio.start_server(service.serve_client, *listen)
+        print(f"Listening for orders on {listen[0]}:{listen[1]}", file=sys.stderr)
+    try:
+        if read_stdin:
+            await service.read_orders(_stdin_lines())
+            if server is None:
+                stop_when_idle.set()
+        await ticks
+        await service.launched.join()
+    finally:
+        ticks.cancel()
+        writer.cancel()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+
+if __name__ == "__main__":
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Dispatch orders in real time.")
+    parser.add_argument(
+        "--hospitals", default=os.path.join(root_dir, "inputs", "hospitals.csv")
+    )
+    parser.add_argument(
+        "--listen",
+        metavar="HOST:PORT",
+        help="also accept orders on this TCP address; stdin is only read without it",
+    )
+    parser.add_argument(
+        "--start",
+        type=float,
+        help="scheduler time (s since midnight) to start at, defaults to the local time",
+    )
+    parser.add_argument(
+        "--speedup",
+        type=float,
+        default=1.0,
+        help="scheduler seconds per wall-clock second",
+    )
+    parser.add_argument("--num-zips", type=int, default=NUM_ZIPS)
+    parser.add_argument("--intake-size", type=int, default=DEFAULT_INTAKE_SIZE)
+    parser.add_argument(
+        "--state-dir",
+        help="journal and snapshot the scheduler's state here, resuming from it on start",
+    )
+    parser.add_argument(
+        "--snapshot-interval-s",
+        type=int,
+        default=SNAPSHOT_INTERVAL_S,
+        help="scheduler seconds between snapshots of the state",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="discard the state saved in --state-dir instead of resuming from it",
+    )
+    args = parser.parse_args()
+
+    with open(args.hospitals, "r") as f:
+        hospitals = Hospital.load_from_csv(f)
+    scheduler = ZipScheduler(
+        hospitals=hospitals,
+        num_zips=args.num_zips,
+        max_packages_per_zip=MAX_PACKAGES_PER_ZIP,
+        zip_speed_mps=ZIP_SPEED_MPS,
+        zip_max_cumulative_range_m=ZIP_MAX_CUMULATIVE_RANGE_M,
+        journal=(
+            SchedulerJournal(args.state_dir, args.snapshot_interval_s, fresh=args.fresh)
+            if args.state_dir
+            else None
+        ),
+    )
+    if scheduler.journal is not None:
+        started = time.perf_counter()
+        records = scheduler.resume()
+        print(
+            f"Resumed {scheduler.num_unfulfilled_orders} queued orders and"
+            + f" {len(scheduler.fleet.in_flight)} flights in the air from {args.state_dir}"
+            + f" ({records} journal records) in {1000 * (time.perf_counter() - started):.1f} ms",
+            file=sys.stderr,
+        )
+    listen = None
+    if args.listen:
+        host, port = args.listen.rsplit(":", 1)
+        listen = (host, int(port))
+
+    clock = DispatchClock(args.start, args.speedup)
+    if scheduler.journal is not None:
+        clock.catch_up(
+            max(
+                [order.time for order in scheduler.unfulfilled_orders]
+                + [flight.launch_time for flight in scheduler.fleet.in_flight],
+                default=0,
+            )
+        )
+
+    async def main() -> None:
+        # the queues must be created inside the running loop
+        service = DispatchService(
+            scheduler,
+            clock,
+            sys.stdout,
+            intake_size=args.intake_size,
+        )
+        # stop cleanly, with stats, on Ctrl-C or when the process is asked to stop
+        task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        if task is not None:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, task.cancel)
+        try:
+            await serve(service, read_stdin=listen is None, listen=listen)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            service.close()
+            print(json.dumps(service.stats()), file=sys.stderr)
+
+    asyncio.run(main())
@@ -0,0 +1,766 @@
+#! /usr/bin/env python3
+"""
+Monte Carlo fleet sizing: how many zips does a Nest need?
+
+Resamples many order days from an orders CSV. Each sampled day keeps the real day's mix
+of hospitals, priorities and arrival times, with jittered times and a Poisson number of
+orders. The days are then played through `ZipScheduler`'s default greedy policy for
+every fleet size. Instead of one `Runner` per day, `BatchSimulator` steps all the days
+through the minute ticks together, on (days, orders) NumPy arrays. Wait times and zip
+utilisation are reported as distributions over the days.
+
+`--check` runs the actual day through both engines instead, for each fleet size. It
+fails unless every order launches at the same time and every zip flies the same
+flights.
+
+Usage:
+
+> python3 monte_carlo.py
+> python3 monte_carlo.py --num-zips 6 7 8 9 10 11 12 --days 5000 --target-p99-min 5
+> python3 monte_carlo.py --check --num-zips 4 6 8 10 12 14
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sweep import write_table
+from traveling_zip import (
+    EMERGENCY,
+    MAX_PACKAGES_PER_ZIP,
+    MIN_RESUPPLY_ORDERS_NEEDED_TO_LOAD,
+    MIN_ZIPS_TO_SHIP_SINGLE_ORDERS,
+    NUM_ZIPS,
+    PRIORITY_CODES,
+    SECONDS_PER_DAY,
+    SECONDS_PER_TICK,
+    ZIP_MAX_CUMULATIVE_RANGE_M,
+    ZIP_SPEED_MPS,
+    DistanceMatrix,
+    Flight,
+    Hospital,
+    OrderTable,
+    Runner,
+)
+
+# sampled days per fleet size
+DEFAULT_DAYS = 1000
+# a sampled order arrives up to this many seconds before or after the order it copies
+SAMPLE_JITTER_S = 15 * 60
+# the fleet-sizing question: Emergency orders should wait less than this at p99 ...
+TARGET_EMERGENCY_P99_MIN = 5
+# ... on this share of days
+TARGET_SHARE_OF_DAYS = 0.95
+# days simulated per batch, bounds the memory the (days, orders) arrays take
+BATCH_DAYS = 5000
+
+EMERGENCY_CODE = PRIORITY_CODES[EMERGENCY]
+
+
+class OrderDays:
+    """A batch of order days as (days, orders) arrays, each day sorted by time.
+
+    Days with fewer orders are padded at the end with orders received at
+    SECONDS_PER_DAY, which never arrive.
+    """
+
+    def __init__(
+        self,
+        times: np.ndarray,
+        hospital_indices: np.ndarray,
+        priority_codes: np.ndarray,
+    ):
+        """
+        Args:
+            times (np.ndarray): Seconds since midnight each order is received.
+            hospital_indices (np.ndarray): `Hospital.index` of each order.
+            priority_codes (np.ndarray): Index into PRIORITIES of each order.
+        """
+        self.times = times
+        self.hospital_indices = hospital_indices
+        self.priority_codes = priority_codes
+        # orders that are not padding, and arrive before the day ends
+        self.received = times < SECONDS_PER_DAY
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, days: slice) -> "OrderDays":
+        return OrderDays(
+            self.times[days], self.hospital_indices[days], self.priority_codes[days]
+        )
+
+    @classmethod
+    def from_table(cls, orders: OrderTable) -> "OrderDays":
+        """
+        Args:
+            orders (OrderTable): One day of orders.
+        Returns:
+            OrderDays: A batch of that one day.
+        """
+        by_time = np.argsort(orders.times, kind="stable")
+        return cls(
+            orders.times[by_time].astype(np.int64)[np.newaxis],
+            orders.hospital_indices[by_time].astype(np.intp)[np.newaxis],
+            orders.priority_codes[by_time].astype(np.int8)[np.newaxis],
+        )
+
+    @classmethod
+    def sample(
+        cls,
+        orders: OrderTable,
+        num_days: int,
+        jitter_s: int = SAMPLE_JITTER_S,
+        seed: Optional[int] = None,
+    ) -> "OrderDays":
+        """
+        Resample days from a day of orders. Each day gets a Poisson number of orders
+        with the same mean as the original day. Each order copies a random order of the
+        original day, received up to `jitter_s` earlier or later.
+        Args:
+            orders (OrderTable): The day to resample, with at least one order.
+            num_days (int): Number of days.
+            jitter_s (int): Largest shift (s) of a copied order's received time.
+            seed (int): Random seed.
+        Returns:
+            OrderDays: The sampled days.
+        """
+        rng = np.random.default_rng(seed)
+        counts = rng.poisson(len(orders), num_days)
+        width = max(int(counts.max()), 1)
+        copied = rng.integers(0, len(orders), (num_days, width))
+        times = orders.times.astype(np.int64)[copied]
+        times += rng.integers(-jitter_s, jitter_s + 1, times.shape)
+        times = np.clip(times, 0, SECONDS_PER_DAY - 1)
+        times[np.arange(width) >= counts[:, np.newaxis]] = SECONDS_PER_DAY
+
+        by_time = np.argsort(times, axis=1, kind="stable")
+        copied = np.take_along_axis(copied, by_time, axis=1)
+        return cls(
+            np.take_along_axis(times, by_time, axis=1),
+            orders.hospital_indices.astype(np.intp)[copied],
+            orders.priority_codes.astype(np.int8)[copied],
+        )
+
+
+class DayResults:
+    """What happened to a batch of days, as arrays indexed like the batch."""
+
+    def __init__(self, num_days: int, num_orders: int, num_zips: int):
+        # time (s) each order's zip launched, -1 if it never did
+        self.launch_times = np.full((num_days, num_orders), -1, dtype=np.int64)
+        # usage of each zip, per day
+        self.flights_flown = np.zeros((num_days, num_zips), dtype=np.int64)
+        self.seconds_flown = np.zeros((num_days, num_zips), dtype=np.int64)
+        # ticks that found orders waiting and no zip at the Nest, per day
+        self.mins_with_0_zips_available = np.zeros(num_days, dtype=np.int64)
+        self.mins_with_0_zips_available_and_emergency_order = np.zeros(
+            num_days, dtype=np.int64
+        )
+
+
+class BatchSimulator:
+    """Plays many days through ZipScheduler's default policy at once.
+
+    Every minute tick is one pass over all the days. Each of a day's available zips is
+    packed in turn, exactly as `ZipScheduler.launch_flights` packs them. The first order
+    is the highest priority one that fits on a flight of its own. The zip is then filled
+    up: first with Emergency orders, oldest first, then with the Resupply order that
+    adds the least distance. Each order goes in at the cheapest place on the route.
+    Every packing step works on all the days that are still packing a zip, with one
+    NumPy pass over their waiting orders. Held Resupply orders, tour optimisation and
+    zip assignment follow the scheduler too. Only the orders received before the
+    oldest waiting order of any day are left out of the passes.
+
+    Packing budgets and the Emergency fast path are not modelled.
+    """
+
+    def __init__(
+        self,
+        distance_matrix: DistanceMatrix,
+        num_zips: int = NUM_ZIPS,
+        max_packages_per_zip: int = MAX_PACKAGES_PER_ZIP,
+        zip_speed_mps: int = ZIP_SPEED_MPS,
+        zip_max_cumulative_range_m: int = ZIP_MAX_CUMULATIVE_RANGE_M,
+        min_resupply_orders_needed_to_load: int = MIN_RESUPPLY_ORDERS_NEEDED_TO_LOAD,
+        min_zips_to_ship_single_orders: int = MIN_ZIPS_TO_SHIP_SINGLE_ORDERS,
+    ):
+        """
+        Args:
+            distance_matrix (DistanceMatrix): Legs between the Nest and the hospitals.
+            The rest: the ZipScheduler arguments of the same name.
+        """
+        self.distances = distance_matrix.matrix
+        self.nest_index = distance_matrix.nest_index
+        self.num_zips = num_zips
+        self.max_packages_per_zip = max_packages_per_zip
+        self.zip_speed_mps = zip_speed_mps
+        self.max_range_m = zip_max_cumulative_range_m
+        self.min_resupply_orders_needed_to_load = min_resupply_orders_needed_to_load
+        self.min_zips_to_ship_single_orders = min_zips_to_ship_single_orders
+        # visiting orders of 2 or more stops, as `RouteOptimizer` tries them
+        self._permutations = {
+            stops: np.array(list(itertools.permutations(range(stops))), dtype=np.intp)
+            for stops in range(2, max_packages_per_zip + 1)
+        }
+
+    def run(self, days: OrderDays) -> DayResults:
+        """
+        Play a batch of days from their first order to the end of the day.
+        Args:
+            days (OrderDays): Days to play.
+        Returns:
+            DayResults: Launch time of every order and usage of every zip, per day.
+        """
+        num_days, num_orders = days.times.shape
+        results = DayResults(num_days, num_orders, self.num_zips)
+        if not days.received.any():
+            return results
+
+        # orders received by each tick, per day: tick k is at k * SECONDS_PER_TICK
+        num_ticks = -(-SECONDS_PER_DAY // SECONDS_PER_TICK)
+        arrival_ticks = -(-days.times // SECONDS_PER_TICK)
+        arrived_by_tick = np.zeros((num_days, num_ticks + 1), dtype=np.int64)
+        np.add.at(
+            arrived_by_tick,
+            (np.nonzero(days.received)[0], arrival_ticks[days.received]),
+            1,
+        )
+        arrived_by_tick = arrived_by_tick.cumsum(axis=1)
+
+        self._days = days
+        self._results = results
+        self._shipped = np.zeros((num_days, num_orders), dtype=bool)
+        self._return_times = np.full((num_days, self.num_zips), -1, dtype=np.int64)
+        # orders before this one have shipped on every day
+        self._first_waiting = 0
+
+        first_tick = int(arrival_ticks[days.received].min())
+        for tick in range(first_tick, num_ticks):
+            self._tick(tick * SECONDS_PER_TICK, arrived_by_tick[:, tick])
+        return results
+
+    def _tick(self, current_time: int, arrived: np.ndarray) -> None:
+        # the window of orders that can be waiting on any day
+        start = self._first_waiting
+        while start < self._shipped.shape[1]:
+            column = self._shipped[:, start] | ~self._days.received[:, start]
+            if not column.all():
+                break
+            start += 1
+        self._first_waiting = start
+        end = int(arrived.max())
+        if end <= start:
+            return
+
+        waiting = ~self._shipped[:, start:end]
+        waiting &= np.arange(start, end) < arrived[:, np.newaxis]
+        busy = waiting.any(axis=1)
+        if not busy.any():
+            return
+        hospitals = self._days.hospital_indices[:, start:end]
+        emergency = self._days.priority_codes[:, start:end] == EMERGENCY_CODE
+
+        available = (self._return_times < current_time).sum(axis=1)
+        no_zips = busy & (available == 0)
+        self._results.mins_with_0_zips_available += no_zips
+        self._results.mins_with_0_zips_available_and_emergency_order += no_zips & (
+            waiting & emergency
+        ).any(axis=1)
+
+        packing = np.nonzero(busy & (available > 0))[0]
+        for slot in range(self.num_zips):
+            packing = packing[available[packing] > slot]
+            if not len(packing):
+                break
+            left = waiting[packing]
+            # Resupply orders wait while too few of them are queued and zips are scarce
+            held = (
+                (left.sum(axis=1) < self.min_resupply_orders_needed_to_load)
+                & ~(left & emergency[packing]).any(axis=1)
+                & (available[packing] < self.min_zips_to_ship_single_orders)
+            )
+            packing = packing[left.any(axis=1) & ~held]
+            if not len(packing):
+                break
+
+            packed, loaded, stops, num_stops, distance = self._pack(
+                waiting[packing], hospitals[packing], emergency[packing]
+            )
+            # days where nothing fits in a zip's range stop packing
+            packing = packing[packed]
+            if not len(packing):
+                break
+            waiting[packing] &= ~loaded
+            self._launch(
+                current_time,
+                packing,
+                start,
+                loaded,
+                stops,
+                num_stops,
+                distance,
+                loaded & emergency[packing],
+                hospitals[packing],
+            )
+
+    def _pack(
+        self, waiting: np.ndarray, hospitals: np.ndarray, emergency: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pack one zip per day, like `ZipScheduler._pack_zip`.
+        Args:
+            waiting (np.ndarray): (days, orders) mask of the waiting orders.
+            hospitals (np.ndarray): (days, orders) hospital index of each order.
+            emergency (np.ndarray): (days, orders) mask of the Emergency orders.
+        Returns:
+            tuple: Mask of the days that packed a zip and, for those days only: the
+                (days, orders) mask of the orders loaded, the (days, max packages)
+                hospital index of each stop in the order they were packed, the
+                number of stops, and the route's distance (m).
+        """
+        distances = self.distances
+        nest = self.nest_index
+        max_range_m = self.max_range_m
+        max_packages = self.max_packages_per_zip
+        num_days, num_orders = waiting.shape
+        everything = np.arange(num_days)
+
+        # the highest priority order that fits on a flight of its own
+        out_and_back = distances[nest][hospitals]
+        fits_alone = waiting & (out_and_back + out_and_back <= max_range_m)
+        rank = np.where(emergency, 0, num_orders) + np.arange(num_orders)
+        rank = np.where(fits_alone, rank, 2 * num_orders)
+        first = rank.argmin(axis=1)
+        packed = rank[everything, first] < 2 * num_orders
+
+        rows = np.nonzero(packed)[0]
+        waiting, hospitals, emergency = waiting[rows], hospitals[rows], emergency[rows]
+        first = first[rows]
+        num_days = len(rows)
+        everything = np.arange(num_days)
+        loaded = np.zeros_like(waiting)
+        loaded[everything, first] = True
+        stop = hospitals[everything, first]
+
+        # the route as in `RouteBuilder`: stops, the path with the Nest at both ends,
+        # and the legs flown into each stop then back to the Nest
+        stops = np.full((num_days, max_packages), nest, dtype=np.intp)
+        stops[:, 0] = stop
+        path = np.full((num_days, max_packages + 2), nest, dtype=np.intp)
+        path[:, 1] = stop
+        legs = np.zeros((num_days, max_packages + 1), dtype=np.float64)
+        legs[:, 0] = distances[stop, nest]
+        legs[:, 1] = distances[stop, nest]
+        distance = legs[:, 0] + legs[:, 1] - 0.0
+        num_stops = np.ones(num_days, dtype=np.intp)
+        filling = np.ones(num_days, dtype=bool)
+
+        for num_packages in range(1, max_packages):
+            candidates = waiting & ~loaded & filling[:, np.newaxis]
+            if not candidates.any():
+                break
+            # the cheapest place to visit each hospital, first place on ties; scoring
+            # hospitals rather than orders keeps the passes small
+            added = np.full((num_days, len(distances)), np.inf)
+            position = np.zeros(added.shape, dtype=np.intp)
+            for leg in range(num_packages + 1):
+                cost = distances[path[:, leg]] + distances[path[:, leg + 1]]
+                cost -= legs[:, leg, np.newaxis]
+                cheaper = (cost < added) & (leg <= num_stops)[:, np.newaxis]
+                added[cheaper] = cost[cheaper]
+                position[cheaper] = leg
+            # hospitals already on the route are visited where they are, at no cost
+            for slot in range(num_packages):
+                on_route = np.nonzero(slot < num_stops)[0]
+                added[on_route, stops[on_route, slot]] = 0.0
+                position[on_route, stops[on_route, slot]] = slot
+            added = added[everything[:, np.newaxis], hospitals]
+            candidates &= distance[:, np.newaxis] + added <= max_range_m
+
+            # the oldest Emergency order that fits, else the Resupply order that adds
+            # the least distance, oldest first on ties
+            emergency_candidates = candidates & emergency
+            has_emergency = emergency_candidates.any(axis=1)
+            resupply_added = np.where(candidates & ~emergency, added, np.inf)
+            chosen = np.where(
+                has_emergency,
+                emergency_candidates.argmax(axis=1),
+                resupply_added.argmin(axis=1),
+            )
+            filling &= candidates.any(axis=1)
+            if not filling.any():
+                break
+            days = np.nonzero(filling)[0]
+            chosen = chosen[days]
+            loaded[days, chosen] = True
+            stop = hospitals[days, chosen]
+            at = position[days, stop]
+
+            # insert the new stops, leaving routes that already visit them as they are
+            new_stop = ~(stops[days] == stop[:, np.newaxis]).any(axis=1)
+            days, stop, at = days[new_stop], stop[new_stop], at[new_stop]
+            into = distances[stop, path[days, at]]
+            out_of = distances[stop, path[days, at + 1]]
+            distance[days] += into + out_of - legs[days, at]
+
+            index = np.arange(max_packages)
+            shifted = np.where(index < at[:, np.newaxis], index, index - 1)
+            new_stops = np.take_along_axis(stops[days], shifted, axis=1)
+            new_stops[index == at[:, np.newaxis]] = stop
+            stops[days] = new_stops
+            path[days, 1:-1] = new_stops
+
+            index = np.arange(max_packages + 1)
+            shifted = np.where(index <= at[:, np.newaxis], index, index - 1)
+            new_legs = np.take_along_axis(legs[days], shifted, axis=1)
+            new_legs[index == at[:, np.newaxis]] = into
+            new_legs[index == at[:, np.newaxis] + 1] = out_of
+            legs[days] = new_legs
+            num_stops[days] += 1
+        return packed, loaded, stops, num_stops, distance
+
+    def _launch(
+        self,
+        current_time: int,
+        days: np.ndarray,
+        start: int,
+        loaded: np.ndarray,
+        stops: np.ndarray,
+        num_stops: np.ndarray,
+        distance: np.ndarray,
+        loaded_emergency: np.ndarray,
+        hospitals: np.ndarray,
+    ) -> None:
+        # fly routes of several stops in their shortest order, like `RouteOptimizer`
+        for count, permutations in self._permutations.items():
+            rows = np.nonzero(num_stops == count)[0]
+            if not len(rows):
+                continue
+            sorted_stops = np.sort(stops[rows, :count], axis=1)
+            tours = sorted_stops[:, permutations]
+            lengths = self._tour_lengths(tours)
+            tour = tours[np.arange(len(rows)), lengths.argmin(axis=1)]
+
+            # flown in whichever direction reaches the Emergency orders first
+            emergency_at = np.stack(
+                [
+                    (
+                        loaded_emergency[rows]
+                        & (hospitals[rows] == tour[:, index, np.newaxis])
+                    ).sum(axis=1)
+                    for index in range(count)
+                ],
+                axis=1,
+            )
+            forwards = (emergency_at * np.arange(count)).sum(axis=1)
+            backwards = (emergency_at * np.arange(count)[::-1]).sum(axis=1)
+            tour = np.where((backwards < forwards)[:, np.newaxis], tour[:, ::-1], tour)
+            distance[rows] = self._tour_lengths(tour[:, np.newaxis])[:, 0]
+
+        flight_s = np.rint(distance / self.zip_speed_mps).astype(np.int64)
+        return_times = self._return_times[days]
+        # the lowest numbered zip at the Nest flies, like `FleetTracker.launch`
+        zip_ids = (return_times < current_time).argmax(axis=1)
+        self._return_times[days, zip_ids] = current_time + flight_s
+        self._results.flights_flown[days, zip_ids] += 1
+        self._results.seconds_flown[days, zip_ids] += flight_s
+
+        loaded_days, loaded_orders = np.nonzero(loaded)
+        loaded_days, loaded_orders = days[loaded_days], start + loaded_orders
+        self._shipped[loaded_days, loaded_orders] = True
+        self._results.launch_times[loaded_days, loaded_orders] = current_time
+
+    def _tour_lengths(self, tours: np.ndarray) -> np.ndarray:
+        # Nest -> stops -> Nest, summed leg by leg like `DistanceMatrix.route_distance`
+        distances = self.distances
+        nest = self.nest_index
+        length = distances[nest][tours[..., 0]]
+        for leg in range(1, tours.shape[-1]):
+            length = length + distances[tours[..., leg - 1], tours[..., leg]]
+        return length + distances[tours[..., -1], nest]
+
+
+def simulate(
+    days: OrderDays,
+    distance_matrix: DistanceMatrix,
+    batch_days: int = BATCH_DAYS,
+    **scheduler_options: Any,
+) -> DayResults:
+    """
+    Play days through a `BatchSimulator`, a batch at a time.
+    Args:
+        days (OrderDays): Days to play.
+        distance_matrix (DistanceMatrix): Legs between the Nest and the hospitals.
+        batch_days (int): Days per batch.
+        scheduler_options: BatchSimulator arguments, e.g. num_zips=12.
+    Returns:
+        DayResults: Results of every day.
+    """
+    simulator = BatchSimulator(distance_matrix, **scheduler_options)
+    num_orders = days.times.shape[1]
+    results = DayResults(len(days), num_orders, simulator.num_zips)
+    for start in range(0, len(days), batch_days):
+        batch = simulator.run(days[start : start + batch_days])
+        for name, values in vars(batch).items():
+            getattr(results, name)[start : start + batch_days] = values
+    return results
+
+
+def summarize(
+    days: OrderDays,
+    results: DayResults,
+    target_p99_min: float = TARGET_EMERGENCY_P99_MIN,
+) -> Dict[str, Any]:
+    """
+    Distributions of wait times and zip utilisation over a batch of days.
+    Args:
+        days (OrderDays): The days played.
+        results (DayResults): What happened on them.
+        target_p99_min (float): Emergency p99 wait (minutes) a day should stay under.
+    Returns:
+        dict: Stat name -> value. "dayN" stats are the Nth percentile over the days.
+    """
+    launched = results.launch_times >= 0
+    wait_min = (results.launch_times - days.times) / 60
+    emergency = days.priority_codes == EMERGENCY_CODE
+
+    emergency_p99 = np.array(
+        [
+            np.percentile(day_wait[day_mask], 99) if day_mask.any() else 0.0
+            for day_wait, day_mask in zip(wait_min, launched & emergency)
+        ]
+    )
+    unfulfilled = (days.received & ~launched).sum(axis=1)
+    unfulfilled_emergency = (days.received & ~launched & emergency).sum(axis=1)
+    # share of the day since its first order that the zips spent in the air, capped
+    # per zip like `FleetTracker.utilisation`, as flights can return after midnight
+    first_order = np.where(days.received.any(axis=1), days.times[:, 0], 0)
+    period_s = (SECONDS_PER_DAY - first_order)[:, np.newaxis]
+    utilisation = np.minimum(results.seconds_flown / period_s, 1.0).mean(axis=1)
+
+    emergency_wait = wait_min[launched & emergency]
+    resupply_wait = wait_min[launched & ~emergency]
+    return {
+        "days": len(days),
+        "emergency_p99_min_day50": round(float(np.percentile(emergency_p99, 50)), 2),
+        "emergency_p99_min_day90": round(float(np.percentile(emergency_p99, 90)), 2),
+        "emergency_p99_min_day99": round(float(np.percentile(emergency_p99, 99)), 2),
+        "days_on_target_pct": round(
+            100
+            * float(
+                np.mean((emergency_p99 < target_p99_min) & (unfulfilled_emergency == 0))
+            ),
+            1,
+        ),
+        "emergency_wait_mean_min": _rounded_mean(emergency_wait),
+        "resupply_wait_mean_min": _rounded_mean(resupply_wait),
+        "resupply_wait_p95_min": round(
+            float(np.percentile(resupply_wait, 95)) if len(resupply_wait) else 0.0, 2
+        ),
+        "flights_per_day": round(float(results.flights_flown.sum(axis=1).mean()), 1),
+        "unfulfilled_per_day": round(float(unfulfilled.mean()), 2),
+        "zip_utilisation_pct_day10": round(100 * np.percentile(utilisation, 10), 1),
+        "zip_utilisation_pct_day50": round(100 * np.percentile(utilisation, 50), 1),
+        "zip_utilisation_pct_day90": round(100 * np.percentile(utilisation, 90), 1),
+    }
+
+
+def _rounded_mean(values: np.ndarray) -> float:
+    return round(float(values.mean()), 2) if len(values) else 0.0
+
+
+def check_against_scheduler(
+    hospitals: Dict[str, Hospital],
+    orders: OrderTable,
+    distance_matrix: DistanceMatrix,
+    **scheduler_options: Any,
+) -> int:
+    """
+    Play a day through a `Runner` and through a `BatchSimulator`, and compare them.
+    Args:
+        hospitals (dict): Hospitals the orders are for, by name.
+        orders (OrderTable): The day to play.
+        distance_matrix (DistanceMatrix): Legs between the Nest and the hospitals.
+        scheduler_options: Arguments for both engines, e.g. num_zips=12.
+    Raises:
+        RuntimeError: If an order launched at another time in either engine, or a zip
+            flew different flights.
+    Returns:
+        int: Number of orders compared.
+    """
+    runner = Runner.from_loaded(hospitals, orders, verbose=False, **scheduler_options)
+    expected: List[Tuple[int, int, int, int]] = []
+    launch_flights = runner.scheduler.launch_flights
+
+    def recording_launch_flights(
+        current_time: int, emergency_only: bool = False
+    ) -> List[Flight]:
+        flights = launch_flights(current_time, emergency_only)
+        for flight in flights:
+            expected.extend(
+                (o.time, o.hospital.index, o.priority_code, current_time)
+                for o in flight.orders
+            )
+        return flights
+
+    runner.scheduler.launch_flights = recording_launch_flights  # type: ignore
+    runner.run()
+    expected.extend(
+        (o.time, o.hospital.index, o.priority_code, -1)
+        for o in runner.scheduler.unfulfilled_orders
+    )
+
+    days = OrderDays.from_table(orders)
+    results = simulate(days, distance_matrix, **scheduler_options)
+    received = days.received[0]
+    actual = list(
+        zip(
+            days.times[0][received].tolist(),
+            days.hospital_indices[0][received].tolist(),
+            days.priority_codes[0][received].tolist(),
+            results.launch_times[0][received].tolist(),
+        )
+    )
+
+    mismatches = []
+    if sorted(expected) != sorted(actual):
+        different = set(expected).symmetric_difference(actual)
+        mismatches.append(f"{len(different)} orders launched at different times")
+    fleet = runner.scheduler.fleet
+    for name, runner_value, simulated_value in (
+        ("flights per zip", fleet.flights_flown, results.flights_flown[0].tolist()),
+        (
+            "seconds flown per zip",
+            fleet.seconds_flown,
+            results.seconds_flown[0].tolist(),
+        ),
+        (
+            "minutes with no zip available",
+            runner.scheduler.metrics.mins_with_0_zips_available,
+            int(results.mins_with_0_zips_available[0]),
+        ),
+    ):
+        if runner_value != simulated_value:
+            mismatches.append(f"{name}: {runner_value} != {simulated_value}")
+    if mismatches:
+        raise RuntimeError(
+            f"Simulation differs from ZipScheduler with {scheduler_options}: "
+            + "; ".join(mismatches)
+        )
+    return len(actual)
+
+
+def smallest_fleet(
+    rows: Sequence[Dict[str, Any]], share_of_days: float = TARGET_SHARE_OF_DAYS
+) -> Optional[int]:
+    """
+    Args:
+        rows (Sequence[dict]): `summarize` output with "num_zips", one per fleet size.
+        share_of_days (float): Share of days that must stay on target.
+    Returns:
+        int: The smallest fleet on target on that share of days, or None.
+    """
+    on_target = [
+        row["num_zips"]
+        for row in rows
+        if row["days_on_target_pct"] >= 100 * share_of_days
+    ]
+    return min(on_target, default=None)
+
+
+if __name__ == "__main__":
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(
+        description="Estimate wait times and zip utilisation for several fleet sizes"
+        + " over many resampled days."
+    )
+    parser.add_argument(
+        "--hospitals", default=os.path.join(root_dir, "inputs", "hospitals.csv")
+    )
+    parser.add_argument(
+        "--orders", default=os.path.join(root_dir, "inputs", "orders.csv")
+    )
+    parser.add_argument(
+        "--num-zips",
+        type=int,
+        nargs="+",
+        default=list(range(max(NUM_ZIPS - 4, 1), NUM_ZIPS + 5)),
+        metavar="N",
+        help="fleet sizes to simulate",
+    )
+    parser.add_argument(
+        "--max-packages-per-zip", type=int, default=MAX_PACKAGES_PER_ZIP
+    )
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument(
+        "--jitter-s",
+        type=int,
+        default=SAMPLE_JITTER_S,
+        help="largest shift (s) of a resampled order's received time",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--target-p99-min", type=float, default=TARGET_EMERGENCY_P99_MIN
+    )
+    parser.add_argument(
+        "--target-share-of-days", type=float, default=TARGET_SHARE_OF_DAYS
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="compare against ZipScheduler on the orders CSV instead",
+    )
+    args = parser.parse_args()
+
+    with open(args.hospitals, "r") as f:
+        hospitals = Hospital.load_from_csv(f)
+    orders = OrderTable.load(args.orders, hospitals)
+    distance_matrix = DistanceMatrix(hospitals)
+
+    if args.check:
+        for num_zips in args.num_zips:
+            compared = check_against_scheduler(
+                hospitals,
+                orders,
+                distance_matrix,
+                num_zips=num_zips,
+                max_packages_per_zip=args.max_packages_per_zip,
+            )
+            print(f"{num_zips} zips: {compared} orders match ZipScheduler.")
+        sys.exit(0)
+
+    days = OrderDays.sample(orders, args.days, args.jitter_s, args.seed)
+    rows = []
+    started = time.perf_counter()
+    for num_zips in args.num_zips:
+        results = simulate(
+            days,
+            distance_matrix,
+            num_zips=num_zips,
+            max_packages_per_zip=args.max_packages_per_zip,
+        )
+        rows.append(
+            {"num_zips": num_zips, **summarize(days, results, args.target_p99_min)}
+        )
+    seconds = time.perf_counter() - started
+
+    write_table(rows, sys.stdout)
+    print(
+        f"\n{len(rows) * len(days)} days simulated in {seconds:.1f} s, resampled from"
+        + f" {len(orders)} orders."
+    )
+    fleet = smallest_fleet(rows, args.target_share_of_days)
+    target = (
+        f"Emergency p99 wait under {args.target_p99_min} minutes on"
+        + f" {round(100 * args.target_share_of_days)}% of days"
+    )
+    if fleet is None:
+        print(f"No fleet size simulated keeps {target}.")
+    else:
+        print(f"{fleet} zips is the smallest fleet simulated that keeps {target}.")
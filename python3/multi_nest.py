@@ -0,0 +1,358 @@
+#! /usr/bin/env python3
+"""
+Schedule a network of nests, one worker process per nest.
+
+Each nest gets its own `ZipScheduler`, fleet and distance matrix, built from the
+hospitals it can reach on a round trip. A coordinator in the parent process replays the
+orders and sends each one to a nest that can reach its hospital. Among those nests, it
+picks the one with the least backlog for its fleet. Once a minute every worker is ticked
+in parallel; the coordinator then gathers each nest's flights and queue depth before
+assigning more orders.
+
+Usage:
+
+> python3 multi_nest.py --nest North 20000 0 --nest South -20000 0
+> python3 multi_nest.py --nest A 0 0 --nest B 60000 15000 --num-zips 6 \
+      --hospitals hospitals.csv --orders orders.csv
+"""
+
+import argparse
+import multiprocessing
+import os
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from traveling_zip import (
+    EMERGENCY,
+    MAX_PACKAGES_PER_ZIP,
+    NUM_ZIPS,
+    PRIORITIES,
+    SECONDS_PER_DAY,
+    SECONDS_PER_TICK,
+    ZIP_MAX_CUMULATIVE_RANGE_M,
+    ZIP_SPEED_MPS,
+    DistanceProvider,
+    EuclideanDistances,
+    Hospital,
+    Order,
+    OrderTable,
+    SchedulerMetrics,
+    ZipScheduler,
+)
+
+# (time, hospital name, priority code) of an order, as sent to a nest's worker
+OrderRow = Tuple[int, str, int]
+# (zip id, [(order time, hospital name, priority)], distance (m), return time)
+FlightRow = Tuple[int, List[Tuple[int, str, str]], float, int]
+
+
+class Nest:
+    """A nest and the size of its fleet."""
+
+    def __init__(self, name: str, north_m: int, east_m: int, num_zips: int = NUM_ZIPS):
+        self.name = name
+        self.north_m = north_m
+        self.east_m = east_m
+        self.num_zips = num_zips
+
+    def round_trips_m(
+        self, hospitals: Sequence[Hospital], provider: Optional[DistanceProvider] = None
+    ) -> List[float]:
+        """
+        Args:
+            hospitals (Sequence[Hospital]): Hospitals to fly to.
+            provider (DistanceProvider): How legs are measured, straight lines if None.
+        Returns:
+            list: Distance (m) flown from the nest to each hospital and back, inf where
+                there is no way through.
+        """
+        coordinates = np.array(
+            [(self.north_m, self.east_m)] + [(h.north_m, h.east_m) for h in hospitals],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        provider = provider if provider is not None else EuclideanDistances()
+        legs = provider.leg_distances(coordinates)
+        return (legs[0, 1:] + legs[1:, 0]).tolist()
+
+
+class NestStatus:
+    """What the coordinator knows about a nest between ticks."""
+
+    def __init__(self, nest: Nest):
+        self.nest = nest
+        # as reported by the nest's last tick
+        self.available_zips = nest.num_zips
+        # as reported by the nest's last tick, plus the orders assigned since
+        self.queued = 0
+        self.orders_assigned = 0
+        self.flights: List[FlightRow] = []
+
+    def backlog(self) -> float:
+        """Queued orders per zip, beyond the ones the zips at the nest can take now."""
+        return (self.queued - self.available_zips) / self.nest.num_zips
+
+
+def _nest_worker(
+    conn: Connection,
+    nest: Nest,
+    hospitals: List[Hospital],
+    scheduler_options: Dict[str, Any],
+) -> None:
+    """
+    Run one nest's scheduler, answering the coordinator's messages until it is done.
+
+    Messages are ("tick", time, [OrderRow]), answered with (flights, queued, available
+    zips), and ("finish", first order time), answered with the nest's metrics snapshot,
+    zip utilisation and unfulfilled order count.
+    """
+    # index the nest's hospitals from 0, so its distance matrix only covers them
+    local_hospitals = {
+        h.name: Hospital(h.name, h.north_m, h.east_m, index)
+        for index, h in enumerate(hospitals)
+    }
+    scheduler = ZipScheduler(
+        hospitals=local_hospitals,
+        num_zips=nest.num_zips,
+        nest=(nest.north_m, nest.east_m),
+        **scheduler_options,
+    )
+    while True:
+        message = conn.recv()
+        if message[0] == "tick":
+            _, current_time, order_rows = message
+            for time, name, code in order_rows:
+                scheduler.queue_order(
+                    Order(time, local_hospitals[name], PRIORITIES[code])
+                )
+            flights = scheduler.launch_flights(current_time) or []
+            conn.send(
+                (
+                    [
+                        (
+                            flight.zip_id,
+                            [
+                                (o.time, o.hospital.name, o.priority)
+                                for o in flight.orders
+                            ],
+                            flight.distance,
+                            flight.get_return_time(),
+                        )
+                        for flight in flights
+                    ],
+                    scheduler.num_unfulfilled_orders,
+                    scheduler.fleet.available_zips,
+                )
+            )
+        else:
+            _, first_order_time = message
+            conn.send(
+                (
+                    scheduler.metrics.snapshot(),
+                    scheduler.fleet.utilisation(SECONDS_PER_DAY - first_order_time),
+                    scheduler.num_unfulfilled_orders,
+                )
+            )
+            conn.close()
+            return
+
+
+class MultiNestCoordinator:
+    """Replays a day of orders across several nests, each scheduled in its own process.
+
+    Every order goes to one of the nests that can reach its hospital on a round trip
+    within the zips' range. The coordinator picks the nest with the lowest backlog (queued
+    orders per zip, net of the zips waiting at the nest), then the shortest round trip.
+    Hospitals that no nest can reach are counted as unroutable.
+    """
+
+    def __init__(
+        self,
+        nests: Sequence[Nest],
+        hospitals: Dict[str, Hospital],
+        **scheduler_options: Any,
+    ):
+        """
+        Args:
+            nests (Sequence[Nest]): Nests to schedule, with distinct names.
+            hospitals (dict): Every hospital in the network, by name.
+            scheduler_options: ZipScheduler arguments that override the module defaults,
+                shared by every nest.
+        """
+        self.nests = list(nests)
+        self.hospitals = hospitals
+        self.scheduler_options: Dict[str, Any] = dict(
+            max_packages_per_zip=MAX_PACKAGES_PER_ZIP,
+            zip_speed_mps=ZIP_SPEED_MPS,
+            zip_max_cumulative_range_m=ZIP_MAX_CUMULATIVE_RANGE_M,
+        )
+        self.scheduler_options.update(scheduler_options)
+        max_range_m = self.scheduler_options["zip_max_cumulative_range_m"]
+
+        # round trips are measured like the nests' schedulers measure legs
+        provider = self.scheduler_options.get("distance_provider")
+        round_trips_m = [
+            nest.round_trips_m(list(hospitals.values()), provider)
+            for nest in self.nests
+        ]
+
+        # hospital name -> (round trip (m), nest position) of every nest that reaches it
+        self.reachable_from: Dict[str, List[Tuple[float, int]]] = {}
+        # hospitals each nest reaches, by nest position
+        self.reachable_hospitals: List[List[Hospital]] = [[] for _ in self.nests]
+        for number, (name, hospital) in enumerate(hospitals.items()):
+            self.reachable_from[name] = []
+            for position in range(len(self.nests)):
+                round_trip_m = round_trips_m[position][number]
+                if round_trip_m <= max_range_m:
+                    self.reachable_from[name].append((round_trip_m, position))
+                    self.reachable_hospitals[position].append(hospital)
+        self.status = [NestStatus(nest) for nest in self.nests]
+        self.unroutable_orders = 0
+        self.metrics: Dict[str, SchedulerMetrics] = {}
+        self.utilisation: Dict[str, List[float]] = {}
+        self.unfulfilled_orders: Dict[str, int] = {}
+
+    def assign(self, order: Order) -> Optional[int]:
+        """
+        Pick the nest to serve an order and count the order against its backlog.
+        Args:
+            order (Order): The order just placed.
+        Returns:
+            int: Position of the nest in `nests`, or None if no nest reaches the hospital.
+        """
+        candidates = self.reachable_from[order.hospital.name]
+        if not candidates:
+            self.unroutable_orders += 1
+            return None
+        _, _, position = min(
+            (self.status[position].backlog(), round_trip_m, position)
+            for round_trip_m, position in candidates
+        )
+        status = self.status[position]
+        status.queued += 1
+        status.orders_assigned += 1
+        return position
+
+    def run(self, orders: OrderTable) -> None:
+        """
+        Replay a day of orders, ticking every nest once a minute from the first order
+        until every queue is empty or the day ends.
+        Args:
+            orders (OrderTable): The day's orders, sorted by time.
+        """
+        if not len(orders):
+            return
+        connections = []
+        workers = []
+        for nest, reachable in zip(self.nests, self.reachable_hospitals):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_nest_worker,
+                args=(child_conn, nest, reachable, self.scheduler_options),
+                daemon=True,
+            )
+            worker.start()
+            child_conn.close()
+            connections.append(parent_conn)
+            workers.append(worker)
+
+        first_order_time = orders[0].time
+        pending = iter(orders)
+        order = next(pending, None)
+        current_time = -(-first_order_time // SECONDS_PER_TICK) * SECONDS_PER_TICK
+        try:
+            while current_time < SECONDS_PER_DAY:
+                # hand each nest the orders it was assigned since its last tick
+                batches: List[List[OrderRow]] = [[] for _ in self.nests]
+                while order is not None and order.time <= current_time:
+                    position = self.assign(order)
+                    if position is not None:
+                        batches[position].append(
+                            (order.time, order.hospital.name, order.priority_code)
+                        )
+                    order = next(pending, None)
+
+                # every nest ticks at once; gather their results once they all sent them
+                for conn, batch in zip(connections, batches):
+                    conn.send(("tick", current_time, batch))
+                for conn, status in zip(connections, self.status):
+                    flights, status.queued, status.available_zips = conn.recv()
+                    status.flights.extend(flights)
+
+                if order is None and not any(status.queued for status in self.status):
+                    break
+                current_time += SECONDS_PER_TICK
+
+            for conn in connections:
+                conn.send(("finish", first_order_time))
+            for conn, nest in zip(connections, self.nests):
+                snapshot, utilisation, unfulfilled = conn.recv()
+                self.metrics[nest.name] = SchedulerMetrics.from_snapshot(snapshot)
+                self.utilisation[nest.name] = utilisation
+                self.unfulfilled_orders[nest.name] = unfulfilled
+        finally:
+            for conn in connections:
+                conn.close()
+            for worker in workers:
+                worker.join()
+
+    def gather_stats(self) -> None:
+        """Print each nest's stats and the network's, once the day has run."""
+        network = SchedulerMetrics()
+        print("\n____________________NETWORK STATS____________________\n")
+        for nest, status in zip(self.nests, self.status):
+            metrics = self.metrics[nest.name]
+            network.merge(metrics)
+            utilisation = self.utilisation[nest.name]
+            print(
+                f"{nest.name}: {status.orders_assigned} orders assigned,"
+                + f" {metrics.order_wait_s.count} served,"
+                + f" {self.unfulfilled_orders[nest.name]} unfulfilled,"
+                + f" {len(status.flights)} flights,"
+                + f" Emergency wait p95 {round(metrics.wait_s(EMERGENCY).percentile(95) / 60, 2)} min,"
+                + f" zips in the air {round(100 * sum(utilisation) / len(utilisation))}% of the day."
+            )
+        print(
+            f"\n{network.order_wait_s.count} orders served across {len(self.nests)} nests,"
+            + f" {sum(self.unfulfilled_orders.values())} unfulfilled,"
+            + f" {self.unroutable_orders} out of range of every nest."
+        )
+        for priority in PRIORITIES:
+            wait = network.wait_s(priority)
+            print(
+                f"{priority} wait: mean {round(wait.mean / 60, 2)},"
+                + f" p95 {round(wait.percentile(95) / 60, 2)},"
+                + f" p99 {round(wait.percentile(99) / 60, 2)} minutes."
+            )
+
+
+if __name__ == "__main__":
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Schedule a network of nests.")
+    parser.add_argument(
+        "--nest",
+        nargs=3,
+        action="append",
+        metavar=("NAME", "NORTH_M", "EAST_M"),
+        help="a nest to schedule, repeat for every nest (default: one nest at 0, 0)",
+    )
+    parser.add_argument("--num-zips", type=int, default=NUM_ZIPS, help="zips per nest")
+    parser.add_argument(
+        "--hospitals", default=os.path.join(root_dir, "inputs", "hospitals.csv")
+    )
+    parser.add_argument(
+        "--orders", default=os.path.join(root_dir, "inputs", "orders.csv")
+    )
+    args = parser.parse_args()
+
+    nests = [
+        Nest(name, int(north_m), int(east_m), args.num_zips)
+        for name, north_m, east_m in (args.nest or [("Nest", "0", "0")])
+    ]
+    with open(args.hospitals, "r") as f:
+        hospitals = Hospital.load_from_csv(f)
+    coordinator = MultiNestCoordinator(nests, hospitals)
+    coordinator.run(OrderTable.load(args.orders, hospitals))
+    coordinator.gather_stats()
@@ -0,0 +1,220 @@
+#! /usr/bin/env python3
+"""
+Playground to explore how changing our specs changes our operations.
+
+Runs one isolated `Runner`/`ZipScheduler` simulation per configuration of fleet specs
+and throttling knobs, spread across a process pool. The input CSVs are parsed once, in
+the parent, and handed to every worker when it starts as a columnar `OrderTable`; each
+simulation then replays fresh `Order` objects from it (the scheduler marks them as it
+ships them).
+
+Usage:
+
+> python3 sweep.py --num-zips 6 8 10 12 --max-packages-per-zip 2 3 4
+> python3 sweep.py --num-zips 4 6 8 10 12 14 --min-zips-to-ship-single-orders 2 4 6 8 \
+      --samples 10 --seed 7 --output sweep.csv
+"""
+
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+from traveling_zip import (
+    EMERGENCY,
+    MAX_PACKAGES_PER_ZIP,
+    MIN_RESUPPLY_ORDERS_NEEDED_TO_LOAD,
+    MIN_ZIPS_TO_SHIP_SINGLE_ORDERS,
+    NUM_ZIPS,
+    RESUPPLY,
+    ZIP_MAX_CUMULATIVE_RANGE_M,
+    Hospital,
+    OrderTable,
+    Runner,
+)
+
+# ZipScheduler arguments a sweep can vary, with the values used when they aren't swept
+SWEEP_PARAMETERS = {
+    "num_zips": NUM_ZIPS,
+    "max_packages_per_zip": MAX_PACKAGES_PER_ZIP,
+    "zip_max_cumulative_range_m": ZIP_MAX_CUMULATIVE_RANGE_M,
+    "min_resupply_orders_needed_to_load": MIN_RESUPPLY_ORDERS_NEEDED_TO_LOAD,
+    "min_zips_to_ship_single_orders": MIN_ZIPS_TO_SHIP_SINGLE_ORDERS,
+}
+
+# inputs handed to each worker process when it starts
+_worker_hospitals: Dict[str, Hospital] = {}
+_worker_orders: Optional[OrderTable] = None
+
+
+def grid(space: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    Every combination of the swept values.
+    Args:
+        space (dict): Parameter name -> values to try.
+    Returns:
+        list: One configuration (parameter name -> value) per combination.
+    """
+    names = list(space)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(space[name] for name in names))
+    ]
+
+
+def random_sample(
+    space: Dict[str, Sequence[Any]], samples: int, seed: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    A random subset of the grid, without repeats.
+    Args:
+        space (dict): Parameter name -> values to try.
+        samples (int): Number of configurations to draw (capped at the grid size).
+        seed (int): Seed for the draw, for reproducible sweeps.
+    Returns:
+        list: Configurations (parameter name -> value).
+    """
+    configurations = grid(space)
+    return random.Random(seed).sample(configurations, min(samples, len(configurations)))
+
+
+def _init_worker(hospitals: Dict[str, Hospital], orders: OrderTable) -> None:
+    global _worker_hospitals, _worker_orders
+    _worker_hospitals = hospitals
+    _worker_orders = orders
+
+
+def run_simulation(configuration: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Play the day back with one configuration.
+    Args:
+        configuration (dict): ZipScheduler arguments to override.
+    Returns:
+        dict: The configuration followed by its wait-time and utilisation metrics.
+    Raises:
+        RuntimeError: If called outside a sweep's worker process.
+    """
+    if _worker_orders is None:
+        raise RuntimeError("run_simulation only runs in a sweep's worker processes")
+    runner = Runner.from_loaded(
+        _worker_hospitals, _worker_orders, verbose=False, **configuration
+    )
+    runner.run()
+
+    metrics = runner.scheduler.metrics
+    emergency_wait = metrics.wait_s(EMERGENCY)
+    resupply_wait = metrics.wait_s(RESUPPLY)
+    zip_utilisation = runner.zip_utilisation()
+    return {
+        **configuration,
+        "orders_served": metrics.order_wait_s.count,
+        "unfulfilled_orders": runner.scheduler.num_unfulfilled_orders,
+        "flights": runner.daily_flights_counter,
+        "emergency_wait_mean_min": round(emergency_wait.mean / 60, 2),
+        "emergency_wait_p95_min": round(emergency_wait.percentile(95) / 60, 2),
+        "emergency_wait_p99_min": round(emergency_wait.percentile(99) / 60, 2),
+        "resupply_wait_mean_min": round(resupply_wait.mean / 60, 2),
+        "resupply_wait_p95_min": round(resupply_wait.percentile(95) / 60, 2),
+        "packages_per_flight": round(metrics.flight_packages.mean, 2),
+        "distance_per_flight_m": round(metrics.flight_distance_m.mean),
+        "zip_utilisation_pct": round(
+            100 * sum(zip_utilisation) / len(zip_utilisation), 1
+        ),
+        "mins_with_0_zips_and_emergency": (
+            metrics.mins_with_0_zips_available_and_emergency_order
+        ),
+    }
+
+
+def sweep(
+    hospitals_path: str,
+    orders_path: str,
+    configurations: List[Dict[str, Any]],
+    processes: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run every configuration against the same inputs, in parallel.
+    Args:
+        hospitals_path (str): hospitals.csv to load.
+        orders_path (str): orders.csv to play back.
+        configurations (list): ZipScheduler arguments to override, one dict per run.
+        processes (int): Worker processes to use, defaults to one per core.
+    Returns:
+        list: One results row per configuration, in the order they were given.
+    """
+    with open(hospitals_path, "r") as f:
+        hospitals = Hospital.load_from_csv(f)
+    orders = OrderTable.load(orders_path, hospitals)
+
+    processes = processes or os.cpu_count() or 1
+    chunksize = max(len(configurations) // (4 * processes), 1)
+    with multiprocessing.Pool(
+        processes, initializer=_init_worker, initargs=(hospitals, orders)
+    ) as pool:
+        return pool.map(run_simulation, configurations, chunksize=chunksize)
+
+
+def write_table(rows: List[Dict[str, Any]], f: Any) -> None:
+    """
+    Print results as an aligned text table.
+    Args:
+        rows (list): Results rows, all with the same columns.
+        f (file_object): Where to write the table.
+    """
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = [max(len(c), *(len(str(row[c])) for row in rows)) for c in columns]
+    f.write("  ".join(c.rjust(w) for c, w in zip(columns, widths)) + "\n")
+    for row in rows:
+        f.write("  ".join(str(row[c]).rjust(w) for c, w in zip(columns, widths)))
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(
+        description="Sweep fleet specs and throttling knobs over a day of orders."
+    )
+    parser.add_argument(
+        "--hospitals", default=os.path.join(root_dir, "inputs", "hospitals.csv")
+    )
+    parser.add_argument(
+        "--orders", default=os.path.join(root_dir, "inputs", "orders.csv")
+    )
+    for name, default in SWEEP_PARAMETERS.items():
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            dest=name,
+            type=int,
+            nargs="+",
+            default=[default],
+            metavar="N",
+            help=f"values to sweep (default: {default})",
+        )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        help="run this many random configurations from the grid instead of all of them",
+    )
+    parser.add_argument("--seed", type=int, help="seed for --samples")
+    parser.add_argument("--processes", type=int, help="default: one per core")
+    parser.add_argument("--output", metavar="CSV", help="also write the results here")
+    args = parser.parse_args()
+
+    space = {name: getattr(args, name) for name in SWEEP_PARAMETERS}
+    configurations = (
+        random_sample(space, args.samples, args.seed) if args.samples else grid(space)
+    )
+    results = sweep(args.hospitals, args.orders, configurations, args.processes)
+
+    write_table(results, sys.stdout)
+    if args.output and results:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
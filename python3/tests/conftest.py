@@ -0,0 +1,64 @@
+import os
+import sys
+from typing import Any, Callable, Dict, Tuple
+
+import pytest
+
+# the scripts import each other as top-level modules, e.g. `from traveling_zip import ...`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from traveling_zip import (  # noqa: E402
+    MAX_PACKAGES_PER_ZIP,
+    ZIP_MAX_CUMULATIVE_RANGE_M,
+    ZIP_SPEED_MPS,
+    Hospital,
+    OrderTable,
+    ZipScheduler,
+)
+
+INPUTS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "inputs",
+)
+
+# (north_m, east_m) of each hospital, by name
+Points = Dict[str, Tuple[int, int]]
+SchedulerFactory = Callable[..., ZipScheduler]
+
+
+@pytest.fixture
+def make_scheduler() -> SchedulerFactory:
+    """
+    Builds a ZipScheduler for hospitals at the given points, with the module's zip
+    settings and 10 zips unless other ZipScheduler arguments are given. The hospitals
+    are the scheduler's `hospitals`.
+    """
+
+    def make(points: Points, **options: Any) -> ZipScheduler:
+        hospitals = {
+            name: Hospital(name, north, east, index)
+            for index, (name, (north, east)) in enumerate(points.items())
+        }
+        return ZipScheduler(
+            hospitals=hospitals,
+            **{
+                "num_zips": 10,
+                "max_packages_per_zip": MAX_PACKAGES_PER_ZIP,
+                "zip_speed_mps": ZIP_SPEED_MPS,
+                "zip_max_cumulative_range_m": ZIP_MAX_CUMULATIVE_RANGE_M,
+                **options,
+            },
+        )
+
+    return make
+
+
+@pytest.fixture
+def sample_day() -> Tuple[Dict[str, Hospital], OrderTable]:
+    """The hospitals and orders in inputs/."""
+    with open(os.path.join(INPUTS_DIR, "hospitals.csv"), "r") as f:
+        hospitals = Hospital.load_from_csv(f)
+    orders = OrderTable.load(
+        os.path.join(INPUTS_DIR, "orders.csv"), hospitals, cache=False
+    )
+    return hospitals, orders
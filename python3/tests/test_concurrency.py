@@ -0,0 +1,137 @@
+import bisect
+import collections
+import io
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from conftest import SchedulerFactory
+from traveling_zip import SECONDS_PER_DAY, SECONDS_PER_TICK, EventTrace, Hospital, Order
+
+PRODUCERS = 4
+HOSPITALS_PER_PRODUCER = 5
+NUM_ORDERS = 1000
+
+
+def _orders(hospitals: List[Hospital], seed: int = 0) -> List[Order]:
+    rng = random.Random(seed)
+    times = sorted(rng.randrange(6 * 3600, 20 * 3600) for _ in range(NUM_ORDERS))
+    return [
+        Order(
+            t,
+            rng.choice(hospitals),
+            "Emergency" if rng.random() < 0.3 else "Resupply",
+        )
+        for t in times
+    ]
+
+
+def test_orders_queued_while_ticking_launch_once_and_in_order(
+    make_scheduler: SchedulerFactory,
+) -> None:
+    trace_file = io.StringIO()
+    scheduler = make_scheduler(
+        {
+            f"H{i}": (3000 * (i + 1) * (-1) ** i, 2000 * (i % 7))
+            for i in range(PRODUCERS * HOSPITALS_PER_PRODUCER)
+        },
+        num_zips=20,
+        trace=EventTrace(trace_file),
+    )
+    hospitals = scheduler.hospitals
+    orders = _orders(list(hospitals.values()))
+    # every producer owns its hospitals, so its orders can be told apart in the trace
+    owner = {
+        hospital.name: i // HOSPITALS_PER_PRODUCER
+        for i, hospital in enumerate(hospitals.values())
+    }
+    shares: List[List[Order]] = [[] for _ in range(PRODUCERS)]
+    for order in orders:
+        shares[owner[order.hospital.name]].append(order)
+    share_times = [[order.time for order in share] for share in shares]
+
+    # producers queue an order once the clock reaches its time, like a live service;
+    # the clock only moves on once they have caught up with the previous tick
+    clock = threading.Condition()
+    now = [-(-orders[0].time // SECONDS_PER_TICK) * SECONDS_PER_TICK - SECONDS_PER_TICK]
+    queued = [0] * PRODUCERS
+
+    def produce(producer: int) -> None:
+        for order in shares[producer]:
+            with clock:
+                assert clock.wait_for(lambda: order.time <= now[0], timeout=30)
+            scheduler.queue_order(order)
+            with clock:
+                queued[producer] += 1
+                clock.notify_all()
+            time.sleep(0)
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(PRODUCERS)]
+    launched: List[Tuple[int, Order]] = []
+    ticks_during_intake = 0
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        for thread in threads:
+            thread.start()
+        current_time = now[0] + SECONDS_PER_TICK
+        while current_time < 2 * SECONDS_PER_DAY:
+            with clock:
+                assert clock.wait_for(
+                    lambda: all(
+                        queued[i]
+                        >= bisect.bisect_right(
+                            share_times[i], current_time - SECONDS_PER_TICK
+                        )
+                        for i in range(PRODUCERS)
+                    ),
+                    timeout=30,
+                )
+                now[0] = current_time
+                clock.notify_all()
+            if any(thread.is_alive() for thread in threads):
+                ticks_during_intake += 1
+            elif not scheduler.num_unfulfilled_orders:
+                break
+            for flight in scheduler.launch_flights(current_time) or []:
+                launched.extend((current_time, order) for order in flight.orders)
+            current_time += SECONDS_PER_TICK
+        for thread in threads:
+            thread.join()
+    finally:
+        # let the producers finish if a tick failed
+        with clock:
+            now[0] = 2 * SECONDS_PER_DAY
+            clock.notify_all()
+        sys.setswitchinterval(switch_interval)
+
+    assert ticks_during_intake >= (orders[-1].time - orders[0].time) // SECONDS_PER_TICK
+    # every order launched exactly once, at a tick after it was placed
+    launches = collections.Counter(id(order) for _, order in launched)
+    assert len(launches) == len(orders)
+    assert set(launches.values()) == {1}
+    assert all(launch_time >= order.time for launch_time, order in launched)
+
+    # the queue took every producer's orders in the order it placed them
+    scheduler.trace.flush()
+    trace_file.seek(0)
+    queued_by_producer: Dict[int, List[Tuple[int, str, str]]] = {
+        i: [] for i in range(PRODUCERS)
+    }
+    for event in EventTrace.replay(trace_file, ["order_queued"]):
+        queued_by_producer[owner[event["hospital"]]].append(
+            (event["t"], event["hospital"], event["priority"])
+        )
+    for i, share in enumerate(shares):
+        assert queued_by_producer[i] == [
+            (order.time, order.hospital.name, order.priority) for order in share
+        ]
+
+    # and orders for a hospital launched in the order they were placed, by priority
+    last_launch: Dict[Tuple[str, str], int] = {}
+    for launch_time, order in sorted(launched, key=lambda pair: pair[1].time):
+        key = (order.hospital.name, order.priority)
+        assert launch_time >= last_launch.get(key, 0)
+        last_launch[key] = launch_time
@@ -0,0 +1,59 @@
+import asyncio
+import io
+import json
+from typing import AsyncIterator, List
+
+from conftest import SchedulerFactory
+from dispatch_service import DispatchClock, DispatchService
+from traveling_zip import SECONDS_PER_DAY
+
+
+def test_clock_places_times_of_day_nearest_now() -> None:
+    # five minutes to midnight on the second day
+    clock = DispatchClock(2 * SECONDS_PER_DAY - 300, speedup=0)
+
+    assert clock.place(SECONDS_PER_DAY - 600) == 2 * SECONDS_PER_DAY - 600
+    assert clock.place(60) == 2 * SECONDS_PER_DAY + 60
+    assert clock.place(3 * SECONDS_PER_DAY) == 3 * SECONDS_PER_DAY
+
+    clock.catch_up(2 * SECONDS_PER_DAY + 1000)
+    assert clock.now() == 3 * SECONDS_PER_DAY - 300
+
+
+def test_service_keeps_launching_past_midnight(
+    make_scheduler: SchedulerFactory,
+) -> None:
+    scheduler = make_scheduler({"Near": (5_000, 0)})
+    output = io.StringIO()
+
+    async def lines() -> AsyncIterator[str]:
+        for line in ["86300, Near, Emergency", "30, Near, Emergency"]:
+            yield line
+
+    async def run() -> DispatchService:
+        # a scheduler minute every 10 ms, starting two minutes before midnight
+        service = DispatchService(
+            scheduler, DispatchClock(SECONDS_PER_DAY - 120, speedup=6000), output
+        )
+        stop_when_idle = asyncio.Event()
+        writer = asyncio.create_task(service.write_flights())
+        ticks = asyncio.create_task(service.run_ticks(stop_when_idle))
+        await service.read_orders(lines())
+        stop_when_idle.set()
+        await asyncio.wait_for(ticks, timeout=10)
+        await service.launched.join()
+        writer.cancel()
+        service.close()
+        return service
+
+    service = asyncio.run(run())
+
+    flights = [json.loads(line) for line in output.getvalue().splitlines()]
+    orders: List[list] = [order for flight in flights for order in flight["orders"]]
+    assert orders == [
+        [86300, "Near", "Emergency"],
+        [SECONDS_PER_DAY + 30, "Near", "Emergency"],
+    ]
+    assert flights[-1]["t"] >= SECONDS_PER_DAY + 30
+    assert service.stats()["orders_launched"] == 2
+    assert not service._read_at
@@ -0,0 +1,48 @@
+from conftest import SchedulerFactory
+from traveling_zip import Order, ZipScheduler
+
+POINTS = {
+    "Near": (5_000, 0),
+    "Mid": (20_000, 0),
+    # a 200 km round trip, out of every zip's range
+    "Far": (100_000, 0),
+}
+
+
+def _with_resupply_waiting(make_scheduler: SchedulerFactory) -> ZipScheduler:
+    scheduler = make_scheduler(POINTS, emergency_dispatch_delay_s=0)
+    scheduler.queue_order(Order(10, scheduler.hospitals["Near"], "Resupply"))
+    scheduler.queue_order(Order(15, scheduler.hospitals["Mid"], "Resupply"))
+    return scheduler
+
+
+def test_unreachable_emergency_launches_nothing_between_ticks(
+    make_scheduler: SchedulerFactory,
+) -> None:
+    scheduler = _with_resupply_waiting(make_scheduler)
+    hospitals = scheduler.hospitals
+    scheduler.queue_order(Order(70, hospitals["Far"], "Emergency"))
+
+    assert scheduler.next_emergency_dispatch(70) is None
+    assert scheduler.launch_flights(70, emergency_only=True) == []
+    # the Resupply orders wait for the minute tick
+    (flight,) = scheduler.launch_flights(120)
+    assert sorted(o.hospital.name for o in flight.orders) == ["Mid", "Near"]
+    assert [o.hospital.name for o in scheduler.unfulfilled_orders] == ["Far"]
+
+
+def test_emergency_launches_between_ticks_with_resupply_that_fits(
+    make_scheduler: SchedulerFactory,
+) -> None:
+    scheduler = _with_resupply_waiting(make_scheduler)
+    hospitals = scheduler.hospitals
+    scheduler.queue_order(Order(70, hospitals["Far"], "Emergency"))
+    scheduler.queue_order(Order(80, hospitals["Mid"], "Emergency"))
+
+    assert scheduler.next_emergency_dispatch(80) == 80
+    (flight,) = scheduler.launch_flights(80, emergency_only=True)
+    assert sorted((o.hospital.name, o.priority) for o in flight.orders) == [
+        ("Mid", "Emergency"),
+        ("Mid", "Resupply"),
+        ("Near", "Resupply"),
+    ]
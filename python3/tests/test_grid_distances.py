@@ -0,0 +1,77 @@
+import math
+from typing import Iterable, Tuple
+
+import numpy as np
+import pytest
+
+from traveling_zip import GridDistances
+
+CELL_SIZE_M = 100.0
+
+
+def _grid(
+    blocked_cells: Iterable[Tuple[int, int]], shape: Tuple[int, int] = (5, 5)
+) -> GridDistances:
+    blocked = np.zeros(shape, dtype=bool)
+    for row, column in blocked_cells:
+        blocked[row, column] = True
+    return GridDistances(blocked, (0.0, 0.0), CELL_SIZE_M)
+
+
+def _points(*cells: Tuple[float, float]) -> np.ndarray:
+    # (north_m, east_m) of points given in cell units
+    return np.array(cells, dtype=np.float64) * CELL_SIZE_M
+
+
+def test_leg_clipping_a_corner_goes_around() -> None:
+    grid = _grid([(1, 1)])
+    # passes through the corner of cell (1, 1) nearest (1, 2), for 0.02 of a cell
+    clipping = _points((0.5, 1.48), (3.5, 4.48))
+    # the same line moved 0.04 of a cell further out
+    clear = _points((0.5, 1.52), (3.5, 4.52))
+
+    assert not grid._line_of_sight(clipping[0], clipping[1:])[0]
+    assert grid._line_of_sight(clear[0], clear[1:])[0]
+
+    legs = grid.leg_distances(clipping)
+    assert legs[0, 1] > math.dist(*clipping)
+    assert grid.leg_distances(clear)[0, 1] == pytest.approx(math.dist(*clear))
+
+
+def test_leg_through_a_blocked_corner_point_goes_around() -> None:
+    # the diagonal passes exactly between two blocked cells, touching both corners
+    grid = _grid([(1, 2), (2, 1)])
+    through_corner = _points((1.5, 1.5), (2.5, 2.5))
+
+    assert not grid._line_of_sight(through_corner[0], through_corner[1:])[0]
+    assert grid.leg_distances(through_corner)[0, 1] > math.dist(*through_corner)
+
+
+def test_line_of_sight_along_rows_columns_and_diagonals() -> None:
+    grid = _grid([(2, 2)])
+    start = _points((0.5, 0.5))[0]
+    # along a row, along a column, within a column, across the blocked cell, and
+    # touching one of its corners only
+    ends = _points((0.5, 4.5), (4.5, 0.5), (2.5, 0.5), (4.5, 4.5), (2.9, 4.5))
+
+    assert grid._line_of_sight(start, ends).tolist() == [
+        True,
+        True,
+        True,
+        False,
+        False,
+    ]
+
+
+def test_legs_to_points_sharing_a_cell_behind_a_wall_all_go_around() -> None:
+    # a wall across row 5 with a gap in the last column
+    grid = _grid([(5, column) for column in range(9)], shape=(10, 10))
+    points = _points((1.5, 1.5), (8.5, 1.4), (8.6, 1.6))
+
+    legs = grid.leg_distances(points)
+    for target in (1, 2):
+        straight = math.dist(points[0], points[target])
+        # around the end of the wall: out to column 9 and back
+        assert legs[0, target] > straight + 1000
+        assert legs[target, 0] == legs[0, target]
+    assert legs[0, 1] == pytest.approx(legs[0, 2], rel=0.01)
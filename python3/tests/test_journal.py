@@ -0,0 +1,99 @@
+import pathlib
+from typing import Callable
+
+import pytest
+
+from conftest import SchedulerFactory
+from traveling_zip import Order, SchedulerJournal, ZipScheduler
+
+Journaled = Callable[..., ZipScheduler]
+
+
+@pytest.fixture
+def journaled(make_scheduler: SchedulerFactory, tmp_path: pathlib.Path) -> Journaled:
+    """Builds a scheduler that journals to tmp_path, resuming from it if asked."""
+
+    def build(fresh: bool = False, resume: bool = False) -> ZipScheduler:
+        scheduler = make_scheduler(
+            {"Near": (5000, 0), "Far": (0, 20000)},
+            num_zips=2,
+            journal=SchedulerJournal(str(tmp_path), fresh=fresh),
+        )
+        if resume:
+            scheduler.resume()
+        return scheduler
+
+    return build
+
+
+def _run(scheduler: ZipScheduler, start: int, end: int) -> ZipScheduler:
+    hospitals = scheduler.hospitals
+    for t in range(start, end, 60):
+        scheduler.queue_order(Order(t, hospitals["Near"], "Resupply"))
+        scheduler.queue_order(Order(t + 30, hospitals["Far"], "Emergency"))
+        scheduler.launch_flights(t + 60)
+    assert scheduler.journal is not None
+    scheduler.journal.close()
+    return scheduler
+
+
+def test_unloaded_state_is_not_overwritten(
+    tmp_path: pathlib.Path, journaled: Journaled
+) -> None:
+    _run(journaled(), 0, 7200)
+    saved = {path.name: path.read_bytes() for path in tmp_path.iterdir()}
+
+    with pytest.raises(RuntimeError, match="fresh=True"):
+        _run(journaled(), 7200, 7260)
+    assert {path.name: path.read_bytes() for path in tmp_path.iterdir()} == saved
+
+
+def test_resume_carries_on_from_saved_state(
+    tmp_path: pathlib.Path, journaled: Journaled
+) -> None:
+    first = _run(journaled(), 0, 7200)
+    resumed = journaled(resume=True)
+    assert resumed.snapshot() == first.snapshot()
+
+    _run(resumed, 7200, 7260)
+    assert journaled(resume=True).snapshot() == resumed.snapshot()
+    assert resumed.snapshot() != first.snapshot()
+
+
+def test_fresh_discards_saved_state(
+    tmp_path: pathlib.Path, journaled: Journaled
+) -> None:
+    _run(journaled(), 0, 7200)
+
+    scheduler = _run(journaled(fresh=True), 7200, 7260)
+    assert scheduler.metrics.order_wait_s.count == 2
+    assert journaled(resume=True).snapshot() == scheduler.snapshot()
+
+
+def test_resume_drops_a_record_cut_short(
+    tmp_path: pathlib.Path, journaled: Journaled
+) -> None:
+    first = _run(journaled(), 0, 7200)
+    journal_path = tmp_path / SchedulerJournal.JOURNAL_FILE
+    with open(journal_path, "a") as f:
+        f.write('["order",7230,1,')
+
+    resumed = journaled(resume=True)
+    assert resumed.snapshot() == first.snapshot()
+    # later records take its place
+    _run(resumed, 7200, 7260)
+    assert journaled(resume=True).snapshot() == resumed.snapshot()
+
+
+def test_resume_refuses_a_corrupt_journal(
+    tmp_path: pathlib.Path, journaled: Journaled
+) -> None:
+    _run(journaled(), 0, 7200)
+    journal_path = tmp_path / SchedulerJournal.JOURNAL_FILE
+    lines = journal_path.read_text().splitlines(keepends=True)
+    assert len(lines) > 2
+    lines[1] = lines[1][:5] + "\n"
+    journal_path.write_text("".join(lines))
+
+    with pytest.raises(ValueError, match="corrupt at line 2"):
+        journaled(resume=True)
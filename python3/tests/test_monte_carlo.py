@@ -0,0 +1,28 @@
+from typing import Dict, Tuple
+
+import pytest
+
+from monte_carlo import OrderDays, check_against_scheduler, simulate, summarize
+from traveling_zip import DistanceMatrix, Hospital, OrderTable
+
+
+@pytest.mark.parametrize("num_zips", [6, 10, 14])
+def test_batch_simulator_agrees_with_the_scheduler(
+    sample_day: Tuple[Dict[str, Hospital], OrderTable], num_zips: int
+) -> None:
+    hospitals, orders = sample_day
+    compared = check_against_scheduler(
+        hospitals, orders, DistanceMatrix(hospitals), num_zips=num_zips
+    )
+    assert compared == len(orders)
+
+
+def test_utilisation_is_capped_for_flights_past_midnight(
+    sample_day: Tuple[Dict[str, Hospital], OrderTable],
+) -> None:
+    hospitals, orders = sample_day
+    days = OrderDays.sample(orders, 200, seed=0)
+    # too few zips: the backlog keeps them flying until after midnight
+    results = simulate(days, DistanceMatrix(hospitals), num_zips=6)
+    stats = summarize(days, results)
+    assert 90 < stats["zip_utilisation_pct_day90"] <= 100
@@ -0,0 +1,21 @@
+import numpy as np
+
+from multi_nest import MultiNestCoordinator, Nest
+from traveling_zip import GridDistances, Hospital
+
+
+def test_nests_measure_round_trips_with_the_distance_provider() -> None:
+    # a wall between North and the hospital, 15 km north of it, with a gap far east
+    blocked = np.zeros((60, 200), dtype=bool)
+    blocked[35, :190] = True
+    grid = GridDistances(blocked, (-30_000.0, -10_000.0), 1000.0)
+    hospitals = {"Below": Hospital("Below", 0, 0)}
+    nests = [Nest("North", 15_500, 0), Nest("South", -20_000, 0)]
+
+    straight = MultiNestCoordinator(nests, hospitals)
+    around = MultiNestCoordinator(nests, hospitals, distance_provider=grid)
+
+    # straight over the wall, North is closer; flying around it, North is out of range
+    assert straight.reachable_from["Below"] == [(31_000.0, 0), (40_000.0, 1)]
+    assert around.reachable_from["Below"] == [(40_000.0, 1)]
+    assert around.reachable_hospitals == [[], [hospitals["Below"]]]
@@ -0,0 +1,29 @@
+from typing import Dict, Tuple
+
+from traveling_zip import Hospital, OrderTable, Runner
+
+
+def test_runs_record_phase_timings_by_default(
+    sample_day: Tuple[Dict[str, Hospital], OrderTable],
+) -> None:
+    hospitals, orders = sample_day
+    runner = Runner.from_loaded(
+        hospitals, orders, verbose=False, emergency_dispatch_delay_s=0
+    )
+    runner.run()
+
+    snapshot = runner.scheduler.profiler.snapshot()
+    assert set(snapshot["phases"]) >= {
+        "run",
+        "order_received",
+        "scheduler_tick",
+        "emergency_dispatch",
+        "flight_returned",
+        "track_flights",
+        "pack_zip",
+        "dequeue_loaded_orders",
+        "optimize_routes",
+        "launch_bookkeeping",
+    }
+    assert snapshot["phases"]["run"]["calls"] == 1
+    assert snapshot["counters"]["zips_packed"] > 0
@@ -0,0 +1,78 @@
+import itertools
+import math
+from typing import Dict, List, Tuple
+
+import pytest
+
+from conftest import SchedulerFactory
+from traveling_zip import DistanceMatrix, Flight, Hospital, Order, OrderTable, Runner
+
+
+def test_three_stop_flight_flies_the_shortest_tour(
+    make_scheduler: SchedulerFactory,
+) -> None:
+    # visited in index order, A -> B -> C crosses the square diagonally
+    scheduler = make_scheduler(
+        {"A": (20_000, 0), "B": (0, 20_000), "C": (20_000, 20_000)}
+    )
+    hospitals = scheduler.hospitals
+    for name in ("A", "B", "C"):
+        scheduler.queue_order(Order(0, hospitals[name], "Resupply"))
+
+    (flight,) = scheduler.launch_flights(60)
+
+    assert [o.hospital.name for o in flight.orders] in (
+        ["A", "C", "B"],
+        ["B", "C", "A"],
+    )
+    assert flight.distance == pytest.approx(80_000)
+    assert scheduler.route_optimizer.tour_length(
+        h.index for h in hospitals.values()
+    ) == pytest.approx(80_000)
+
+
+def test_sample_day_flights_fly_their_shortest_tours(
+    sample_day: Tuple[Dict[str, Hospital], OrderTable],
+) -> None:
+    hospitals, orders = sample_day
+    runner = Runner.from_loaded(hospitals, orders, verbose=False)
+    flights: List[Flight] = []
+    launch_flights = runner.scheduler.launch_flights
+
+    def recording_launch_flights(
+        current_time: int, emergency_only: bool = False
+    ) -> List[Flight]:
+        launched = launch_flights(current_time, emergency_only)
+        flights.extend(launched or [])
+        return launched
+
+    runner.scheduler.launch_flights = recording_launch_flights  # type: ignore
+    runner.run()
+
+    matrix = runner.scheduler.distance_matrix
+    multi_stop = 0
+    for flight in flights:
+        stops = list(dict.fromkeys(o.hospital.index for o in flight.orders))
+        shortest = min(
+            matrix.route_distance(tour) for tour in itertools.permutations(stops)
+        )
+        assert math.isclose(flight.distance, shortest)
+        assert math.isclose(flight.distance, matrix.route_distance(stops))
+        multi_stop += len(stops) > 1
+    assert multi_stop > 0
+
+
+def test_distance_matrix_leaves_hospital_indices_alone() -> None:
+    # a hospital at index 0, which used to be the Nest's row
+    hospitals = {"A": Hospital("A", 3_000, 4_000, 0), "B": Hospital("B", 0, 5_000, 1)}
+    matrix = DistanceMatrix(hospitals, nest=(0, 0))
+
+    assert [h.index for h in hospitals.values()] == [0, 1]
+    assert matrix.nest_index == 2
+    assert matrix.route_distance([0]) == pytest.approx(10_000)
+    assert matrix.route_distance([0, 1]) == pytest.approx(
+        5_000 + math.dist((3_000, 4_000), (0, 5_000)) + 5_000
+    )
+
+    with pytest.raises(ValueError):
+        DistanceMatrix({"A": Hospital("A", 0, 1), "B": Hospital("B", 1, 0)})
@@ -1,10 +1,36 @@
 #! /usr/bin/env python3
 
 import os
-from typing import Dict, List, TextIO
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    KeysView,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+import argparse
+import collections
+import cProfile
+import hashlib
+import heapq
+import itertools
+import json
 import math
+import pstats
+import threading
+import time
 
 # If you add or upgrade any pip packages, please specify in `requirements.txt`
+import numpy as np
 import yaml  # noqa
 
 # Each Nest has this many Zips
@@ -23,6 +49,11 @@ ZIP_MAX_CUMULATIVE_RANGE_M = 160 * 1000  # 160 km -> meters
 # The two acceptable priorities
 EMERGENCY = "Emergency"
 RESUPPLY = "Resupply"
+# priorities are stored as small integer codes, indices into this tuple
+PRIORITIES = (EMERGENCY, RESUPPLY)
+PRIORITY_CODES = {priority: code for code, priority in enumerate(PRIORITIES)}
+# numeric weight of each priority code, higher ships first
+PRIORITY_WEIGHTS = (5, 1)
 
 NEST = [0, 0]
 
@@ -30,25 +61,30 @@ NEST = [0, 0]
 MIN_RESUPPLY_ORDERS_NEEDED_TO_LOAD = 3
 MIN_ZIPS_TO_SHIP_SINGLE_ORDERS = 8
 
-# flight and order stats
-EMERGENCY_ORDER_WAIT_TIME = []
-RESUPPLY_ORDER_WAIT_TIME = []
-ORDER_WAIT_TIME = []
+# simulation events, handled in this order when they happen in the same second
+ORDER_RECEIVED_EVENT = 0
+SCHEDULER_TICK_EVENT = 1
+FLIGHT_RETURNED_EVENT = 2
+EMERGENCY_DISPATCH_EVENT = 3
 
-FLIGHT_PLAN_ORDERS = []
-FLIGHT_PLAN_DISTANCE = []
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_TICK = 60
 
-# assuming launch_flights is called once per minute
-NUM_MINS_WITH_0_ZIPS_AVAILABLE = []
-NUM_MINS_WITH_0_ZIPS_AVAILABLE_AND_EMERGENCY_ORDER = []
+# a journaled scheduler snapshots its whole state this often (s)
+SNAPSHOT_INTERVAL_S = 15 * 60
 
 
 # You shouldn't need to modify this class
 class Hospital:
-    def __init__(self, name: str, north_m: int, east_m: int):
+    __slots__ = ("name", "north_m", "east_m", "index")
+
+    def __init__(self, name: str, north_m: int, east_m: int, index: int = 0):
         self.name = name
         self.north_m = north_m
         self.east_m = east_m
+        # row/column of this hospital in the DistanceMatrix, so hospitals scheduled
+        # together need distinct indices
+        self.index = index
 
     @staticmethod
     def load_from_csv(f: TextIO) -> Dict[str, "Hospital"]:
@@ -62,28 +98,408 @@ class Hospital:
             dict: Hospitals and their coordinates.
         """
         hospitals = {}
-        for line in f.readlines():
+        # numbered from 1, which the order caches and journals already written use
+        for index, line in enumerate(f, start=1):
             fields = [values.strip() for values in line.split(",")]
             name = fields[0]
             hospitals[name] = Hospital(
                 name=name,
                 north_m=int(fields[1]),
                 east_m=int(fields[2]),
+                index=index,
             )
         return hospitals
 
 
+class DistanceProvider:
+    """Works out the length (m) of every leg a zip can fly between a set of points.
+
+    A DistanceMatrix asks its provider for all the legs once, when it is built, so the
+    scheduler only ever looks legs up; providers are free to be slow.
+    """
+
+    def leg_distances(self, coordinates: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            coordinates (np.ndarray): (north_m, east_m) of each point, shape (n, 2).
+        Returns:
+            np.ndarray: (n, n) distance (m) flown from each point to each other point,
+                np.inf where there is no way through.
+        """
+        raise NotImplementedError
+
+
+class EuclideanDistances(DistanceProvider):
+    """Straight-line legs, as if nothing stood between any two points."""
+
+    # rows computed per numpy pass, bounds the temporary memory used
+    CHUNK_ROWS = 1024
+
+    def leg_distances(self, coordinates: np.ndarray) -> np.ndarray:
+        size = len(coordinates)
+        distances = np.empty((size, size), dtype=np.float64)
+        for start in range(0, size, self.CHUNK_ROWS):
+            rows = coordinates[start : start + self.CHUNK_ROWS]
+            deltas = rows[:, np.newaxis, :] - coordinates[np.newaxis, :, :]
+            distances[start : start + len(rows)] = np.hypot(
+                deltas[..., 0], deltas[..., 1]
+            )
+        return distances
+
+
+class GridDistances(DistanceProvider):
+    """Legs that fly around no-fly zones and terrain, marked as blocked cells on a grid.
+
+    A leg with a clear line of sight, touching no blocked cell (not even at a corner),
+    is flown straight. Any other leg follows the
+    shortest path through open cells found with Dijkstra's algorithm, moving to one of
+    the 8 neighbouring cells at a time and never cutting the corner of a blocked cell,
+    then pulled taut by flying straight to the farthest point of the path in sight.
+    Points in blocked cells can't be reached at all.
+
+    Searching the grid is slow, so the legs are cached in `cache_dir`, in a file named
+    after a hash of the grid and the points. Any other map or set of hospitals gets a
+    cache file of its own.
+    """
+
+    # bump whenever the way legs are computed changes, to ignore older caches
+    CACHE_VERSION = 3
+
+    # rounding slack (in cells) when walking a segment, so one through a grid corner
+    # touches every cell around it
+    TOUCH_SLACK = 1e-9
+
+    def __init__(
+        self,
+        blocked: np.ndarray,
+        origin_m: Sequence[float],
+        cell_size_m: float,
+        cache_dir: Optional[str] = None,
+    ):
+        """
+        Args:
+            blocked (np.ndarray): 2D boolean grid, True where zips can't fly. Row i
+                spans north_m from origin_m[0] + i * cell_size_m, column j spans east_m
+                from origin_m[1] + j * cell_size_m.
+            origin_m (Sequence[float]): (north_m, east_m) of the corner of cell (0, 0).
+            cell_size_m (float): Width of a cell (m).
+            cache_dir (str): Where to cache the legs, None to always compute them.
+        """
+        self.blocked = np.asarray(blocked, dtype=bool)
+        self.origin_m = (float(origin_m[0]), float(origin_m[1]))
+        self.cell_size_m = float(cell_size_m)
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def load(cls, path: str, cache_dir: Optional[str] = None) -> "GridDistances":
+        """
+        Args:
+            path (str): .npz map holding the "blocked" grid, "origin_m" and
+                "cell_size_m".
+            cache_dir (str): Where to cache the legs, defaults to the map's directory.
+        Returns:
+            GridDistances: A provider for the map.
+        """
+        with np.load(path) as grid:
+            return cls(
+                grid["blocked"],
+                grid["origin_m"],
+                float(grid["cell_size_m"]),
+                cache_dir if cache_dir is not None else os.path.dirname(path) or ".",
+            )
+
+    def leg_distances(self, coordinates: np.ndarray) -> np.ndarray:
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = os.path.join(
+                self.cache_dir, f"legs-{self._cache_key(coordinates)}.npy"
+            )
+            try:
+                return np.load(cache_path)
+            except (OSError, ValueError):
+                pass
+
+        distances = self._compute(coordinates)
+        if cache_path is not None:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path + ".tmp", "wb") as f:
+                    np.save(f, distances)
+                os.replace(cache_path + ".tmp", cache_path)
+            except OSError:
+                # e.g. a read-only map directory; the next run just computes them again
+                pass
+        return distances
+
+    def _cache_key(self, coordinates: np.ndarray) -> str:
+        digest = hashlib.sha256()
+        digest.update(repr((self.CACHE_VERSION, self.blocked.shape)).encode())
+        digest.update(repr((self.origin_m, self.cell_size_m)).encode())
+        digest.update(np.packbits(self.blocked).tobytes())
+        digest.update(np.ascontiguousarray(coordinates, dtype=np.float64).tobytes())
+        return digest.hexdigest()[:32]
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        # (row, column) of the cell each point is in
+        cells = np.floor((points - self.origin_m) / self.cell_size_m).astype(np.intp)
+        outside = (cells < 0).any(axis=1) | (cells >= self.blocked.shape).any(axis=1)
+        if outside.any():
+            raise ValueError(f"Point {points[outside][0].tolist()} is outside the map")
+        return cells
+
+    def _compute(self, coordinates: np.ndarray) -> np.ndarray:
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        size = len(coordinates)
+        distances = EuclideanDistances().leg_distances(coordinates)
+        cells = self._cells(coordinates)
+        rows, columns = self.blocked.shape
+        # pad the grid with blocked cells, so searches never step off it
+        open_cells = np.zeros((rows + 2, columns + 2), dtype=bool)
+        open_cells[1:-1, 1:-1] = ~self.blocked
+        width = columns + 2
+        flat_cells = ((cells[:, 0] + 1) * width + cells[:, 1] + 1).tolist()
+        passable = open_cells.ravel().tolist()
+
+        for source in range(size):
+            clear = self._line_of_sight(coordinates[source], coordinates[source + 1 :])
+            # out-of-sight targets by cell; targets in one cell share its search path
+            targets: Dict[int, List[int]] = {}
+            for target in range(source + 1, size):
+                if not clear[target - source - 1]:
+                    targets.setdefault(flat_cells[target], []).append(target)
+            if not targets:
+                continue
+            parents = self._search(flat_cells[source], set(targets), passable, width)
+            for cell, cell_targets in targets.items():
+                if parents[cell] < 0:
+                    for target in cell_targets:
+                        distances[source, target] = distances[target, source] = math.inf
+                    continue
+                path = [cell]
+                while path[-1] != flat_cells[source]:
+                    path.append(parents[path[-1]])
+                # centres of the cells flown through, from the source to the targets
+                centres = np.array(
+                    [divmod(step, width) for step in reversed(path[1:-1])],
+                    dtype=np.float64,
+                ).reshape(-1, 2)
+                centres = self.origin_m + (centres - 0.5) * self.cell_size_m
+                for target in cell_targets:
+                    distance = self._taut_length(
+                        np.vstack([coordinates[source], centres, coordinates[target]])
+                    )
+                    distances[source, target] = distances[target, source] = distance
+        # a point in a blocked cell is cut off from every other point
+        for point, (row, column) in enumerate(cells.tolist()):
+            if self.blocked[row, column]:
+                distances[point, :] = distances[:, point] = math.inf
+                distances[point, point] = 0.0
+        return distances
+
+    def _line_of_sight(self, start: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        # every cell each segment touches, edges and corners included: the column
+        # strips it crosses, then the rows it spans within each strip
+        if not len(ends):
+            return np.zeros(0, dtype=bool)
+        rows, columns = self.blocked.shape
+        start = (np.asarray(start, dtype=np.float64) - self.origin_m) / self.cell_size_m
+        ends = (np.asarray(ends, dtype=np.float64) - self.origin_m) / self.cell_size_m
+        delta = ends - start
+
+        low = np.minimum(start[1], ends[:, 1])
+        high = np.maximum(start[1], ends[:, 1])
+        segments, column = self._spans(low, high, columns)
+        # the stretch of each segment within the strip, as fractions of the segment
+        run = delta[segments, 1]
+        along_strip = np.abs(run) <= self.TOUCH_SLACK
+        run = np.where(along_strip, 1.0, run)
+        enter = (np.maximum(column, low[segments]) - start[1]) / run
+        leave = (np.minimum(column + 1, high[segments]) - start[1]) / run
+        enter = np.where(along_strip, 0.0, np.clip(enter, 0.0, 1.0))
+        leave = np.where(along_strip, 1.0, np.clip(leave, 0.0, 1.0))
+        enter_row = start[0] + enter * delta[segments, 0]
+        leave_row = start[0] + leave * delta[segments, 0]
+        cells, row = self._spans(
+            np.minimum(enter_row, leave_row), np.maximum(enter_row, leave_row), rows
+        )
+
+        blocked = self.blocked[row, column[cells]]
+        return np.bincount(segments[cells], weights=blocked, minlength=len(ends)) == 0
+
+    def _spans(
+        self, low: np.ndarray, high: np.ndarray, size: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # the cells along one axis (clipped to the grid) that each closed range
+        # [low, high] touches, flattened: which range each cell is for, and the cell
+        first = np.ceil(low - self.TOUCH_SLACK).astype(np.intp) - 1
+        last = np.floor(high + self.TOUCH_SLACK).astype(np.intp)
+        first, last = np.clip(first, 0, size - 1), np.clip(last, 0, size - 1)
+        counts = last - first + 1
+        ranges = np.repeat(np.arange(len(low)), counts)
+        offsets = np.arange(len(ranges)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return ranges, first[ranges] + offsets
+
+    def _taut_length(self, path: np.ndarray) -> float:
+        # grid paths zigzag in 45 degree steps; pull the path tight by flying straight
+        # from each point to the farthest point further along that is in sight
+        length = 0.0
+        anchor, last = 0, len(path) - 1
+        while anchor < last:
+            visible = np.flatnonzero(
+                self._line_of_sight(path[anchor], path[anchor + 1 :])
+            )
+            reach = anchor + 1 + (int(visible[-1]) if len(visible) else 0)
+            length += math.dist(path[anchor], path[reach])
+            anchor = reach
+        return length
+
+    @staticmethod
+    def _search(
+        source: int, targets: Set[int], passable: List[bool], width: int
+    ) -> List[int]:
+        """
+        Dijkstra's algorithm over the padded grid, from one cell until every target cell
+        is settled or nothing else is reachable.
+        Returns:
+            list: The cell before each cell on its shortest path from the source, -1 for
+                cells not reached.
+        """
+        diagonal = math.sqrt(2)
+        # (step, cost, the two cells a diagonal step passes between)
+        moves = [(step, 1.0, 0, 0) for step in (-width, width, -1, 1)] + [
+            (dr * width + dc, diagonal, dr * width, dc)
+            for dr in (-1, 1)
+            for dc in (-1, 1)
+        ]
+        # blocked cells start below any path length, so they are never improved on
+        best = [math.inf if is_open else -math.inf for is_open in passable]
+        best[source] = 0.0
+        parents = [-1] * len(passable)
+        parents[source] = source
+        heap = [(0.0, source)]
+        remaining = set(targets)
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap and remaining:
+            length, cell = heappop(heap)
+            if length > best[cell]:
+                continue
+            remaining.discard(cell)
+            for step, cost, side_a, side_b in moves:
+                neighbour = cell + step
+                candidate = length + cost
+                if candidate < best[neighbour] and (
+                    not side_a or (passable[cell + side_a] and passable[cell + side_b])
+                ):
+                    best[neighbour] = candidate
+                    parents[neighbour] = cell
+                    heappush(heap, (candidate, neighbour))
+        return parents
+
+
+class DistanceMatrix:
+    """Dense matrix of the distances (m) between the Nest and every hospital.
+
+    Hospitals are fixed once they are loaded, so every leg a zip can fly is computed
+    once up front, by a DistanceProvider (straight lines unless told otherwise). Each
+    hospital's row/column is its `Hospital.index`, and the Nest has a row/column of its
+    own after the last hospital's, `nest_index`, which turns the length of a flight plan
+    into a gather-and-sum over the matrix.
+    """
+
+    # rows kept as Python lists by `row`; the cache is dropped once it holds this many
+    MAX_CACHED_ROWS = 256
+
+    def __init__(
+        self,
+        hospitals: Dict[str, Hospital],
+        nest: Sequence[int] = NEST,
+        provider: Optional[DistanceProvider] = None,
+    ):
+        """
+        Args:
+            hospitals (dict): Hospitals by name, with distinct indices.
+            nest (Sequence[int]): (north_m, east_m) of the Nest.
+            provider (DistanceProvider): Measures the legs, straight lines by default.
+        Raises:
+            ValueError: If two hospitals share an index.
+        """
+        indices = [hospital.index for hospital in hospitals.values()]
+        if len(set(indices)) < len(indices):
+            raise ValueError(
+                "Hospitals need distinct indices, e.g. as numbered by Hospital.load_from_csv"
+            )
+
+        # row/column of the Nest
+        self.nest_index = max(indices, default=-1) + 1
+        # indices no hospital uses are placed at the Nest, so every row is a real place
+        coordinates = np.empty((self.nest_index + 1, 2), dtype=np.float64)
+        coordinates[:] = nest
+        for hospital in hospitals.values():
+            coordinates[hospital.index] = (hospital.north_m, hospital.east_m)
+
+        # (north_m, east_m) of every hospital and the Nest, by index
+        self.coordinates = coordinates
+        provider = provider if provider is not None else EuclideanDistances()
+        self.matrix = provider.leg_distances(coordinates)
+        self._rows: Dict[int, List[float]] = {}
+
+    def row(self, index: int) -> List[float]:
+        """
+        Distances between one stop and every other. Lists make scalar lookups several
+        times cheaper than indexing the matrix, which adds up in the packing loops.
+        Args:
+            index (int): Hospital index of the stop (`nest_index` for the Nest).
+        Returns:
+            list: Distance (m) to every hospital, by index.
+        """
+        row = self._rows.get(index)
+        if row is None:
+            if len(self._rows) >= self.MAX_CACHED_ROWS:
+                self._rows.clear()
+            row = self._rows[index] = self.matrix[index].tolist()
+        return row
+
+    def route_distance(self, stops: Sequence[int]) -> float:
+        """
+        Distance (in meters) to fly from the Nest through each stop and back to the Nest.
+        Args:
+            stops (Sequence[int]): Hospital indices of the stops, in the order they are flown.
+        Returns:
+            float: flight plan distance in meters
+        """
+        # routes are a handful of stops, too short to be worth a numpy gather
+        matrix = self.matrix
+        nest = previous = self.nest_index
+        distance = 0.0
+        for stop in stops:
+            distance += matrix.item(previous, stop)
+            previous = stop
+        return distance + matrix.item(previous, nest)
+
+
 # You shouldn't need to modify this class
 class Order:
+    # slots keep an order to a fraction of the memory of a __dict__, which adds up
+    # over millions of orders
+    __slots__ = ("time", "hospital", "priority_code", "allocated")
+
     def __init__(self, time: int, hospital: Hospital, priority: str):
         self.time = time
         self.hospital = hospital
-        self.priority = priority
+        # index into PRIORITIES
+        self.priority_code = PRIORITY_CODES[priority]
         # marking an order as allocated in order to exclude it
         # from other zips that are being packed before it ships
         self.allocated = False
+
+    @property
+    def priority(self) -> str:
+        return PRIORITIES[self.priority_code]
+
+    @property
+    def weighted_priority(self) -> int:
         # numeric priority in order to make sorting easier
-        self.weighted_priority = None
+        return PRIORITY_WEIGHTS[self.priority_code]
 
     def __str__(self) -> str:
         return f"[{self.time}] {self.priority}, deliver to {self.hospital.name}"
@@ -99,120 +515,1568 @@ class Order:
             hospitals (dict): mapping of hospital name to Hospital objects
 
         Returns:
-            list: Order objects.
+            list: Order objects.
+        """
+        orders = []
+        for line in f:
+            fields = [values.strip() for values in line.split(",")]
+            orders.append(
+                Order(
+                    time=int(fields[0]),
+                    hospital=hospitals[fields[1]],
+                    priority=fields[2],
+                )
+            )
+        return orders
+
+
+class OrderTable:
+    """A day of orders stored as columns: receive times, hospital indices and priority
+    codes (indices into PRIORITIES), 9 bytes per order.
+
+    `Order` objects are only created as the table is iterated, so a Runner can replay
+    millions of orders without holding an object for each of them. Parsed tables are
+    cached in a binary file next to their CSV and memory-mapped by later loads, which
+    skips parsing altogether.
+    """
+
+    DTYPE = np.dtype([("time", "<i4"), ("hospital", "<i4"), ("priority", "i1")])
+    # CSV lines parsed per chunk, and Orders created per chunk while iterating
+    CHUNK_ROWS = 65536
+    # bump whenever DTYPE or the cache layout changes, to ignore older caches
+    CACHE_VERSION = 1
+
+    def __init__(self, rows: np.ndarray, hospitals: Dict[str, Hospital]):
+        """
+        Args:
+            rows (np.ndarray): Structured array with the DTYPE fields, sorted by time.
+            hospitals (dict): Hospitals the indices refer to, by name.
+        """
+        self.rows = rows
+        self._hospitals: List[Optional[Hospital]] = [None] * (
+            max((h.index for h in hospitals.values()), default=0) + 1
+        )
+        for hospital in hospitals.values():
+            self._hospitals[hospital.index] = hospital
+
+    @property
+    def times(self) -> np.ndarray:
+        return self.rows["time"]
+
+    @property
+    def hospital_indices(self) -> np.ndarray:
+        return self.rows["hospital"]
+
+    @property
+    def priority_codes(self) -> np.ndarray:
+        return self.rows["priority"]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index: int) -> Order:
+        received_s, hospital, priority = self.rows[index].tolist()
+        return Order(received_s, self._hospitals[hospital], PRIORITIES[priority])
+
+    def __iter__(self) -> Iterator[Order]:
+        """Yields a new Order per row, so every pass replays the day from scratch."""
+        hospitals = self._hospitals
+        for start in range(0, len(self.rows), self.CHUNK_ROWS):
+            chunk = self.rows[start : start + self.CHUNK_ROWS]
+            for received_s, hospital, priority in zip(
+                chunk["time"].tolist(),
+                chunk["hospital"].tolist(),
+                chunk["priority"].tolist(),
+            ):
+                yield Order(received_s, hospitals[hospital], PRIORITIES[priority])
+
+    @classmethod
+    def from_csv(cls, f: TextIO, hospitals: Dict[str, Hospital]) -> "OrderTable":
+        """Parse a CSV file object that conforms to the orders.csv schema defined in
+        README.md, a chunk of lines at a time.
+
+        Args:
+            f (file_object): CSV file object to read.
+            hospitals (dict): mapping of hospital name to Hospital objects
+        Returns:
+            OrderTable: The orders, in the order they were read.
+        """
+        hospital_indices = {name: h.index for name, h in hospitals.items()}
+        chunks = []
+        while True:
+            lines = list(itertools.islice(f, cls.CHUNK_ROWS))
+            if not lines:
+                break
+            fields = [line.split(",") for line in lines if line.strip()]
+            chunk = np.empty(len(fields), dtype=cls.DTYPE)
+            chunk["time"] = [int(row[0]) for row in fields]
+            chunk["hospital"] = [hospital_indices[row[1].strip()] for row in fields]
+            try:
+                chunk["priority"] = [PRIORITY_CODES[row[2].strip()] for row in fields]
+            except KeyError as error:
+                raise ValueError(f"Unknown order priority {error}") from None
+            chunks.append(chunk)
+        rows = np.concatenate(chunks) if chunks else np.empty(0, dtype=cls.DTYPE)
+        return cls(rows, hospitals)
+
+    @classmethod
+    def load(
+        cls, path: str, hospitals: Dict[str, Hospital], cache: bool = True
+    ) -> "OrderTable":
+        """
+        Load an orders CSV, from its binary cache when it is up to date.
+
+        The cache is `<path>.cache.npy`, memory-mapped on load, with a
+        `<path>.cache.json` sidecar recording the CSV it was parsed from and the
+        hospitals its indices refer to. Either one changing makes the cache stale; a
+        stale cache is rewritten after parsing the CSV.
+
+        Args:
+            path (str): orders.csv to load.
+            hospitals (dict): mapping of hospital name to Hospital objects
+            cache (bool): Whether to read and write the cache.
+        Returns:
+            OrderTable: The orders.
+        """
+        rows_path, sidecar_path = path + ".cache.npy", path + ".cache.json"
+        source = cls._cache_sidecar(path, hospitals)
+        if cache:
+            try:
+                with open(sidecar_path, "r") as f:
+                    if json.load(f) == source:
+                        return cls(np.load(rows_path, mmap_mode="r"), hospitals)
+            except (OSError, ValueError):
+                pass
+
+        with open(path, "r") as f:
+            table = cls.from_csv(f, hospitals)
+        if cache:
+            try:
+                # the sidecar is written last, so a partly written cache is never used
+                with open(rows_path + ".tmp", "wb") as f:
+                    np.save(f, table.rows)
+                os.replace(rows_path + ".tmp", rows_path)
+                with open(sidecar_path + ".tmp", "w") as f:
+                    json.dump(source, f)
+                os.replace(sidecar_path + ".tmp", sidecar_path)
+            except OSError:
+                # e.g. a read-only input directory; the next run just parses again
+                pass
+        return table
+
+    @classmethod
+    def _cache_sidecar(
+        cls, path: str, hospitals: Dict[str, Hospital]
+    ) -> Dict[str, Any]:
+        stat = os.stat(path)
+        return {
+            "version": cls.CACHE_VERSION,
+            "csv_size": stat.st_size,
+            "csv_mtime_ns": stat.st_mtime_ns,
+            "hospitals": [
+                name
+                for name, _ in sorted(hospitals.items(), key=lambda item: item[1].index)
+            ],
+        }
+
+
+# Feel free to extend as needed
+class Flight:
+    __slots__ = ("launch_time", "orders", "zip_speed_mps", "distance", "zip_id")
+
+    def __init__(
+        self,
+        launch_time: int,
+        orders: List[Order],
+        distance_matrix: Optional[DistanceMatrix] = None,
+        zip_speed_mps: int = ZIP_SPEED_MPS,
+        distance: Optional[float] = None,
+    ):
+        self.launch_time = launch_time
+        self.orders = orders
+        self.zip_speed_mps = zip_speed_mps
+        # callers that already know the flight plan's distance can pass it in
+        self.distance = (
+            distance
+            if distance is not None
+            else Flight.get_distance(orders, distance_matrix)
+        )
+        # set by the FleetTracker once the flight is assigned a zip
+        self.zip_id: Optional[int] = None
+
+    def __str__(self) -> str:
+        orders_str = "->".join([o.hospital.name for o in self.orders])
+        return f"<Flight @ {self.launch_time} to {orders_str} returning at {self.get_return_time()}>"
+
+    def get_return_time(self) -> int:
+        """
+        Get return time in seconds for the flight.
+        Returns:
+            int: Time (s) that flight is expected to return.
+        """
+        flight_time_s = round(self.distance / self.zip_speed_mps)
+        return self.launch_time + flight_time_s
+
+    @staticmethod
+    def get_distance(
+        flight_plan: List[Order], distance_matrix: Optional[DistanceMatrix] = None
+    ) -> float:
+        """
+        Given a flight plan, calculate the distance (in meters) to go to each stop and then return to
+        the Nest.
+        Args:
+            flight_plan (List[Orders]): List of orders that make up the flight plan stops, including coordinates.
+            distance_matrix (DistanceMatrix): Precomputed legs to look the distance up in, if available.
+                Without one, legs are flown in straight lines.
+        Returns:
+            float: flight plan distance in meters
+        """
+        if distance_matrix is not None:
+            return distance_matrix.route_distance(
+                [order.hospital.index for order in flight_plan]
+            )
+
+        flight_segment_distances = []
+
+        # parse the start and end coordinates for each stop in order to calculate distance
+        stop_coordinates = [
+            {"north_m": order.hospital.north_m, "east_m": order.hospital.east_m}
+            for order in flight_plan
+        ]
+
+        # add the Nest as the last stop to account for mileage to return home
+        stop_coordinates.append({"north_m": NEST[0], "east_m": NEST[1]})
+
+        # using the coordinates of the previous stop as the starting point and
+        # the coordinates of the current stop as the ending point, calculate the distance of the segment
+        for index, stop in enumerate(stop_coordinates):
+            start_coordinates = (
+                [
+                    stop_coordinates[index - 1]["north_m"],
+                    stop_coordinates[index - 1]["east_m"],
+                ]
+                if index > 0
+                else NEST
+            )
+            dest_hospital = [stop["north_m"], stop["east_m"]]
+
+            segment_distance = math.dist(start_coordinates, dest_hospital)
+
+            # get the absolute distance of start to end point for the stop
+            absolute_distance = abs(segment_distance)
+            flight_segment_distances.append(absolute_distance)
+
+        # the sum of the segment distances, beginning at and returning to the Nest, is the total distance flown
+        flight_path_distance = sum(flight_segment_distances)
+        return flight_path_distance
+
+    @staticmethod
+    def validate_flight_plan(
+        flight_plan: List[Order],
+        order: Order,
+        distance_matrix: Optional[DistanceMatrix] = None,
+        max_range_m: float = ZIP_MAX_CUMULATIVE_RANGE_M,
+    ) -> bool:
+        """
+        Validate whether the proposed next stop can be added to the current, valid flight plan.
+        Flight plan cannot exceed zip range and must be able to return to the Nest.
+
+        Args:
+            flight_plan (List[Orders]): List of Orders currently in the flight plan, already validated.
+            order (Order): Order to validate as the next stop in flight plan.
+            distance_matrix (DistanceMatrix): Precomputed legs to look the distance up in, if available.
+            max_range_m (float): Zip's max cumulative range (m).
+        Returns:
+            bool: Whether the flight plan is valid with the passed in proposed next stop included.
+        """
+        # add the proposed next stop to the flight plan
+        flight_plan.append(order)
+
+        # not rounding distance to avoid over-allocating the zip
+        tentative_flight_path_distance = Flight.get_distance(
+            flight_plan, distance_matrix
+        )
+        return tentative_flight_path_distance <= max_range_m
+
+
+class RouteBuilder:
+    """A flight plan being packed, with its running distance.
+
+    Stops are the distinct hospitals on the route in the order they are flown, with the
+    Nest at both ends; more orders for a hospital already on the route ride along at no
+    extra distance. Every leg's length is cached, so the cost of adding a stop at a
+    given position is three lookups and checking it against the zip's range copies
+    nothing. The finished route becomes a `Flight` without measuring it again.
+    """
+
+    def __init__(self, distance_matrix: DistanceMatrix, max_range_m: float):
+        self.distance_matrix = distance_matrix
+        self.max_range_m = max_range_m
+        # hospital indices, in the order they are flown
+        self.stops: List[int] = []
+        # the stops with the Nest at both ends
+        self._path = [distance_matrix.nest_index, distance_matrix.nest_index]
+        # legs[i] is flown into stops[i]; the last leg flies back to the Nest
+        self.legs: List[float] = [0.0]
+        self.distance = 0.0
+        # hospital index -> orders for it, in the order they were added
+        self._orders_at: Dict[int, List[Order]] = {}
+        self._num_orders = 0
+
+    def __len__(self) -> int:
+        return self._num_orders
+
+    @property
+    def orders(self) -> List[Order]:
+        """Orders in the order they are delivered."""
+        return [order for stop in self.stops for order in self._orders_at[stop]]
+
+    @property
+    def slack(self) -> float:
+        """Distance (m) the zip can still add to the route."""
+        return self.max_range_m - self.distance
+
+    def fits(self, added_m: float) -> bool:
+        # not rounding distance to avoid over-allocating the zip
+        return self.distance + added_m <= self.max_range_m
+
+    def insertion_cost(self, stop: int, position: int) -> float:
+        """
+        Args:
+            stop (int): Hospital index to visit.
+            position (int): Index in `stops` to fly it at, `len(stops)` to fly it last.
+        Returns:
+            float: Distance (m) visiting the hospital there adds to the route.
+        """
+        if stop in self._orders_at:
+            return 0.0
+        row = self.distance_matrix.row
+        return (
+            row(self._path[position])[stop]
+            + row(self._path[position + 1])[stop]
+            - self.legs[position]
+        )
+
+    def append_cost(self, stop: int) -> float:
+        """
+        Args:
+            stop (int): Hospital index to visit.
+        Returns:
+            float: Distance (m) visiting the hospital last adds to the route.
+        """
+        return self.insertion_cost(stop, len(self.stops))
+
+    def cheapest_insertion(self, stop: int) -> Tuple[float, int]:
+        """
+        Args:
+            stop (int): Hospital index to visit.
+        Returns:
+            tuple: (added distance (m), position) of the cheapest place to fly it.
+        """
+        if stop in self._orders_at:
+            return 0.0, self.stops.index(stop)
+        row = self.distance_matrix.row
+        best_cost, best_position = math.inf, 0
+        # distance from each node of the path to the stop
+        to_stop = [row(node)[stop] for node in self._path]
+        for position, leg in enumerate(self.legs):
+            cost = to_stop[position] + to_stop[position + 1] - leg
+            if cost < best_cost:
+                best_cost, best_position = cost, position
+        return best_cost, best_position
+
+    def insertion_costs(self, stops: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        `cheapest_insertion` for many hospitals at once, in one numpy pass.
+        Args:
+            stops (np.ndarray): Hospital indices to visit.
+        Returns:
+            tuple: Arrays of the added distance (m) and position of the cheapest place
+                to fly each hospital.
+        """
+        # distance from each hospital to every node of the path
+        to_path = self.distance_matrix.matrix[stops[:, np.newaxis], self._path]
+        costs = to_path[:, :-1] + to_path[:, 1:] - self.legs
+        positions = costs.argmin(axis=1)
+        added = costs[np.arange(len(stops)), positions]
+        # hospitals already on the route are visited where they are, at no cost
+        for position, stop in enumerate(self.stops):
+            on_route = stops == stop
+            added[on_route] = 0.0
+            positions[on_route] = position
+        return added, positions
+
+    def insert(self, order: Order, position: Optional[int] = None) -> None:
+        """
+        Add an order, visiting its hospital at the given position unless it already is a
+        stop. Whether it fits the zip's range is up to the caller.
+        Args:
+            order (Order): Order to add.
+            position (int): Index in `stops` to fly its hospital at, defaults to last.
+        """
+        stop = order.hospital.index
+        if stop not in self._orders_at:
+            if position is None:
+                position = len(self.stops)
+            row = self.distance_matrix.row(stop)
+            into = row[self._path[position]]
+            out_of = row[self._path[position + 1]]
+            self.distance += into + out_of - self.legs[position]
+            self.stops.insert(position, stop)
+            self._path.insert(position + 1, stop)
+            self.legs[position : position + 1] = [into, out_of]
+            self._orders_at[stop] = []
+        self._orders_at[stop].append(order)
+        self._num_orders += 1
+
+    def reroute(self, stops: Sequence[int]) -> None:
+        """
+        Fly the same stops in another order.
+        Args:
+            stops (Sequence[int]): Every stop of the route once, in the new order.
+        """
+        row = self.distance_matrix.row
+        self.stops = list(stops)
+        nest = self.distance_matrix.nest_index
+        self._path = [nest, *self.stops, nest]
+        self.legs = [row(a)[b] for a, b in zip(self._path, self._path[1:])]
+        self.distance = sum(self.legs)
+
+    def to_flight(self, launch_time: int, zip_speed_mps: int) -> Flight:
+        """
+        Args:
+            launch_time (int): Seconds since midnight.
+            zip_speed_mps (int): Zip's speed (m/s).
+        Returns:
+            Flight: The route as a flight, reusing its running distance.
+        """
+        return Flight(
+            launch_time,
+            self.orders,
+            zip_speed_mps=zip_speed_mps,
+            distance=self.distance,
+        )
+
+
+class RouteOptimizer:
+    """Finds the shortest Nest -> stops -> Nest tour for a packed flight.
+
+    A zip only carries a handful of packages, so every visiting order of its distinct
+    stops can be tried. Tours are memoized on the unordered set of hospitals, so
+    packing the same set of hospitals again only costs a lookup.
+    """
+
+    # the cache is dropped once it holds this many hospital sets
+    MAX_CACHED_ROUTES = 100_000
+
+    def __init__(self, distance_matrix: DistanceMatrix):
+        self.distance_matrix = distance_matrix
+        self._route_cache: Dict[FrozenSet[int], Tuple[int, ...]] = {}
+
+    def shortest_route(self, stops: Iterable[int]) -> Tuple[int, ...]:
+        """
+        Get the shortest order to visit a set of hospitals, starting and ending at the Nest.
+        Args:
+            stops (Iterable[int]): Hospital indices to visit, in any order and possibly repeated.
+        Returns:
+            tuple: Each distinct hospital index once, in the order to fly them.
+        """
+        key = frozenset(stops)
+        route = self._route_cache.get(key)
+        if route is None:
+            route = min(
+                itertools.permutations(sorted(key)),
+                key=self.distance_matrix.route_distance,
+            )
+            if len(self._route_cache) >= self.MAX_CACHED_ROUTES:
+                self._route_cache.clear()
+            self._route_cache[key] = route
+        return route
+
+    def tour_length(self, stops: Iterable[int]) -> float:
+        """
+        Args:
+            stops (Iterable[int]): Hospital indices to visit, in any order and possibly repeated.
+        Returns:
+            float: Distance (m) of the shortest tour through them from the Nest.
+        """
+        return self.distance_matrix.route_distance(self.shortest_route(stops))
+
+    def optimize(self, route: RouteBuilder) -> None:
+        """
+        Reorder a packed route's stops into the shortest tour, in place.
+        A tour is as long flown forwards as backwards, so it is flown in whichever
+        direction reaches the Emergency orders first.
+
+        Args:
+            route (RouteBuilder): Route packed for a zip, already within its range.
+        """
+        if len(route.stops) < 2:
+            return
+        tour = self.shortest_route(route.stops)
+        orders = route.orders
+
+        def emergency_stop_positions(stops: Sequence[int]) -> int:
+            position = {stop: index for index, stop in enumerate(stops)}
+            return sum(
+                position[order.hospital.index]
+                for order in orders
+                if order.priority == EMERGENCY
+            )
+
+        if emergency_stop_positions(tour[::-1]) < emergency_stop_positions(tour):
+            tour = tour[::-1]
+        route.reroute(tour)
+
+
+class PackingOptimizer:
+    """Anytime local search over the zips packed in one tick.
+
+    Starts from the greedy packing and moves Resupply orders between zips while that
+    shortens the total distance flown: relocating an order to another zip, swapping two
+    orders, or merging a whole zip into another, which frees it for a later tick. Every
+    move is checked against the zips' capacity and range. Emergency orders never move,
+    so they keep the zip they were packed on.
+
+    Search stops at a deadline. Only improving moves are applied, so the packing is
+    always the best found so far and can be returned at any time.
+    """
+
+    # moves that save less than this (m) are not worth taking
+    MIN_GAIN_M = 1e-6
+
+    def __init__(
+        self,
+        route_optimizer: RouteOptimizer,
+        max_packages_per_zip: int,
+        max_range_m: float,
+    ):
+        self.route_optimizer = route_optimizer
+        self.max_packages_per_zip = max_packages_per_zip
+        self.max_range_m = max_range_m
+
+    def _length(self, orders: List[Order]) -> float:
+        if not orders:
+            return 0.0
+        return self.route_optimizer.tour_length(o.hospital.index for o in orders)
+
+    def _fits(self, orders: List[Order], length: float) -> bool:
+        return len(orders) <= self.max_packages_per_zip and length <= self.max_range_m
+
+    def improve(
+        self, packing: List[List[Order]], deadline: float
+    ) -> Tuple[List[List[Order]], int]:
+        """
+        Args:
+            packing (list): Orders packed on each zip.
+            deadline (float): `time.perf_counter()` value to stop searching at.
+        Returns:
+            tuple: The improved packing, without zips that were emptied, and the number
+                of moves applied.
+        """
+        zips = [list(orders) for orders in packing]
+        lengths = [self._length(orders) for orders in zips]
+        moves = 0
+        improved = True
+        while improved:
+            improved = False
+            for a, b in itertools.permutations(range(len(zips)), 2):
+                if time.perf_counter() >= deadline:
+                    return [orders for orders in zips if orders], moves
+                if zips[a] and zips[b] and self._apply_best_move(zips, lengths, a, b):
+                    moves += 1
+                    improved = True
+        return [orders for orders in zips if orders], moves
+
+    def _apply_best_move(
+        self, zips: List[List[Order]], lengths: List[float], a: int, b: int
+    ) -> bool:
+        # the best of merging a into b, relocating one order from a to b, or swapping an
+        # order of a with one of b (each pair of zips is visited both ways)
+        before = lengths[a] + lengths[b]
+        best_gain, best = self.MIN_GAIN_M, None
+        movable_a = [o for o in zips[a] if o.priority != EMERGENCY]
+        movable_b = [o for o in zips[b] if o.priority != EMERGENCY]
+
+        candidates: List[Tuple[List[Order], List[Order]]] = []
+        if len(movable_a) == len(zips[a]):
+            candidates.append(([], zips[b] + zips[a]))
+        for order in movable_a:
+            candidates.append(
+                ([o for o in zips[a] if o is not order], zips[b] + [order])
+            )
+            if a < b:
+                for other in movable_b:
+                    candidates.append(
+                        (
+                            [o for o in zips[a] if o is not order] + [other],
+                            [o for o in zips[b] if o is not other] + [order],
+                        )
+                    )
+
+        for new_a, new_b in candidates:
+            if len(new_b) > self.max_packages_per_zip:
+                continue
+            length_a, length_b = self._length(new_a), self._length(new_b)
+            gain = before - length_a - length_b
+            if (
+                gain > best_gain
+                and self._fits(new_a, length_a)
+                and self._fits(new_b, length_b)
+            ):
+                best_gain, best = gain, (new_a, new_b, length_a, length_b)
+        if best is None:
+            return False
+        zips[a], zips[b], lengths[a], lengths[b] = best
+        return True
+
+
+class OrderQueue:
+    """Unfulfilled orders in a binary heap keyed by (-weighted_priority, time).
+
+    Orders with the same priority and time keep the order they were queued in.
+    Removing an order only marks its heap entry as dead, so it costs O(1); dead entries
+    are dropped once they reach the top of the heap, or all at once when they make up
+    more than half of it. Iterating the queue yields orders in the order they were
+    queued, `iter_by_priority` yields them by priority.
+
+    Every hospital with waiting orders also gets a heap of its own, sharing the same
+    entries, so the packer can ask for the best order waiting at a given hospital.
+    """
+
+    def __init__(self) -> None:
+        # entries are [-weighted_priority, time, sequence, order]; order is None once removed
+        self._heap: List[list] = []
+        # hospital index -> heap of the entries for that hospital; the top entry is always live
+        self._by_hospital: Dict[int, List[list]] = {}
+        # live entry of every queued order, in the order they were queued
+        self._entries: Dict[Order, list] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, order: Order) -> bool:
+        return order in self._entries
+
+    def __iter__(self) -> Iterator[Order]:
+        return iter(self._entries)
+
+    def push(self, order: Order) -> int:
+        """
+        Queue an order.
+        Args:
+            order (Order): Order to queue.
+        Returns:
+            int: Queue sequence number of the order, unique within the queue.
+        """
+        sequence = next(self._counter)
+        entry = [-order.weighted_priority, order.time, sequence, order]
+        self._entries[order] = entry
+        heapq.heappush(self._heap, entry)
+        heapq.heappush(self._by_hospital.setdefault(order.hospital.index, []), entry)
+        return sequence
+
+    def remove(self, order: Order) -> None:
+        """
+        Remove a queued order, e.g. once it has been loaded on a zip.
+        Args:
+            order (Order): Order to remove.
+        """
+        self._entries.pop(order)[-1] = None
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if entry[-1] is not None]
+            heapq.heapify(self._heap)
+
+        bucket = self._by_hospital[order.hospital.index]
+        while bucket and bucket[0][-1] is None:
+            heapq.heappop(bucket)
+        if not bucket:
+            del self._by_hospital[order.hospital.index]
+
+    def sort_key(self, order: Order) -> Tuple[int, int, int]:
+        """
+        Args:
+            order (Order): A queued order.
+        Returns:
+            tuple: (-weighted_priority, time, queue sequence); lower keys ship first.
+        """
+        entry = self._entries[order]
+        return entry[0], entry[1], entry[2]
+
+    def by_sequence(self) -> Dict[int, Order]:
+        """
+        Returns:
+            dict: Queue sequence number -> queued order.
+        """
+        return {entry[2]: order for order, entry in self._entries.items()}
+
+    def waiting_hospitals(self) -> KeysView[int]:
+        """
+        Returns:
+            KeysView: Indices of the hospitals with queued orders.
+        """
+        return self._by_hospital.keys()
+
+    def first_at(self, hospital_index: int) -> Optional[Order]:
+        """
+        Get the highest priority unallocated order for a hospital.
+        Args:
+            hospital_index (int): Index of the hospital.
+        Returns:
+            Order: The order, or None if nothing is waiting for that hospital.
+        """
+        bucket = self._by_hospital.get(hospital_index)
+        if bucket is None:
+            return None
+        if not bucket[0][-1].allocated:
+            return bucket[0][-1]
+        return next(self._walk(bucket), None)
+
+    def peek(self) -> Optional[Order]:
+        """
+        Get the highest priority order without removing it.
+        Returns:
+            Order: Highest priority, longest waiting order, or None if the queue is empty.
+        """
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+        return self._heap[0][-1] if self._heap else None
+
+    def emergency_waiting(self) -> bool:
+        """
+        Returns:
+            bool: Whether the highest priority order is an Emergency order.
+        """
+        first = self.peek()
+        return first is not None and first.priority == EMERGENCY
+
+    def iter_by_priority(self) -> Iterator[Order]:
+        """
+        Walk the queued orders by priority, then by the time they were received, skipping
+        orders already allocated to a zip. Only the part of the heap that is consumed
+        gets ordered, so stopping after the first few orders is cheap.
+
+        Note:
+            Orders must not be pushed while iterating.
+
+        Returns:
+            iterator: Unallocated orders, highest priority first.
+        """
+        return self._walk(self._heap)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: JSON-serializable columns of the queued orders (receive time, hospital
+                index, priority code and sequence number, in the order they were queued),
+                the sequence numbers of the allocated ones and the next sequence number.
+        """
+        # a count can't be peeked, so take the next number and start a new count there
+        next_sequence = next(self._counter)
+        self._counter = itertools.count(next_sequence)
+        orders = list(self._entries)
+        return {
+            "time": [order.time for order in orders],
+            "hospital": [order.hospital.index for order in orders],
+            "priority": [order.priority_code for order in orders],
+            "sequence": [self._entries[order][2] for order in orders],
+            "allocated": [
+                self._entries[order][2] for order in orders if order.allocated
+            ],
+            "next_sequence": next_sequence,
+        }
+
+    @classmethod
+    def from_snapshot(
+        cls, snapshot: Dict[str, Any], hospitals: Sequence[Optional[Hospital]]
+    ) -> "OrderQueue":
+        """
+        Args:
+            snapshot (dict): Output of `snapshot`.
+            hospitals (Sequence[Hospital]): Hospitals by index.
+        Returns:
+            OrderQueue: A queue of new Orders, which ships them as the snapshotted one would.
+        """
+        queue = cls()
+        entries, heap, by_hospital = queue._entries, queue._heap, queue._by_hospital
+        for received_s, hospital, priority, sequence in zip(
+            snapshot["time"],
+            snapshot["hospital"],
+            snapshot["priority"],
+            snapshot["sequence"],
+        ):
+            order = Order(received_s, hospitals[hospital], PRIORITIES[priority])
+            entry = [-PRIORITY_WEIGHTS[priority], received_s, sequence, order]
+            entries[order] = entry
+            heap.append(entry)
+            bucket = by_hospital.get(hospital)
+            if bucket is None:
+                by_hospital[hospital] = [entry]
+            else:
+                bucket.append(entry)
+        if snapshot["allocated"]:
+            allocated = set(snapshot["allocated"])
+            for order, entry in entries.items():
+                order.allocated = entry[2] in allocated
+        # heapifying once is linear, pushing every entry would be O(n log n)
+        heapq.heapify(queue._heap)
+        for bucket in queue._by_hospital.values():
+            heapq.heapify(bucket)
+        queue._counter = itertools.count(snapshot["next_sequence"])
+        return queue
+
+    @staticmethod
+    def _walk(heap: List[list]) -> Iterator[Order]:
+        # frontier of heap positions whose parents have already been yielded
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, position = heapq.heappop(frontier)
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+            order = entry[-1]
+            if order is not None and not order.allocated:
+                yield order
+
+
+class FleetTracker:
+    """Tracks which of a Nest's zips are at the Nest and which are in the air.
+
+    Zips in the air are kept in a min-heap keyed by their flight's return time, so
+    launching and landing a zip are O(log n), and both "how many zips are available"
+    and "when is the next zip back" are O(1). Zips keep their identity across flights,
+    which lets us report how much each one was used.
+    """
+
+    def __init__(self, num_zips: int):
+        self.num_zips = num_zips
+        # ids of the zips at the Nest; the lowest id is launched first
+        self._zips_at_nest = list(range(num_zips))
+        # (return time, zip id, flight) for every zip in the air
+        self._zips_in_air: List[Tuple[int, int, Flight]] = []
+        # cumulative usage of each zip
+        self.flights_flown = [0] * num_zips
+        self.seconds_flown = [0] * num_zips
+        self.distance_flown_m = [0.0] * num_zips
+
+    @property
+    def available_zips(self) -> int:
+        return len(self._zips_at_nest)
+
+    @property
+    def in_flight(self) -> List[Flight]:
+        return [flight for _, _, flight in self._zips_in_air]
+
+    def next_return_time(self) -> Optional[int]:
+        """
+        Returns:
+            int: Time (s) the next zip in the air is expected back, or None if all are at the Nest.
+        """
+        return self._zips_in_air[0][0] if self._zips_in_air else None
+
+    def launch(self, flight: Flight) -> int:
+        """
+        Assign a flight to an available zip and send it out.
+        Args:
+            flight (Flight): Flight that is launching.
+        Returns:
+            int: id of the zip flying it.
+        """
+        zip_id = heapq.heappop(self._zips_at_nest)
+        flight.zip_id = zip_id
+        return_time = flight.get_return_time()
+        heapq.heappush(self._zips_in_air, (return_time, zip_id, flight))
+
+        self.flights_flown[zip_id] += 1
+        self.seconds_flown[zip_id] += return_time - flight.launch_time
+        self.distance_flown_m[zip_id] += flight.distance
+        return zip_id
+
+    def land_returned(self, current_time: int) -> List[Flight]:
+        """
+        Make every zip whose flight has returned available again.
+        A zip is back at the Nest once the current time is past its return time.
+
+        Args:
+            current_time (int): Seconds since midnight.
+        Returns:
+            list: Flights that returned, earliest first.
+        """
+        returned = []
+        while self._zips_in_air and self._zips_in_air[0][0] < current_time:
+            _, zip_id, flight = heapq.heappop(self._zips_in_air)
+            heapq.heappush(self._zips_at_nest, zip_id)
+            returned.append(flight)
+        return returned
+
+    def utilisation(self, period_s: int) -> List[float]:
+        """
+        Get the share of a period each zip spent in the air.
+        Args:
+            period_s (int): Length of the period the zips were flying in (s).
+        Returns:
+            list: Fraction of the period, per zip id.
+        """
+        return [min(seconds / period_s, 1.0) for seconds in self.seconds_flown]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: JSON-serializable copy of the fleet, with each flight in the air as
+                [zip id, launch time, distance (m), [[order time, hospital index,
+                priority code], ...]].
+        """
+        return {
+            "zips_at_nest": list(self._zips_at_nest),
+            "in_air": [
+                [
+                    zip_id,
+                    flight.launch_time,
+                    flight.distance,
+                    [
+                        [o.time, o.hospital.index, o.priority_code]
+                        for o in flight.orders
+                    ],
+                ]
+                for _, zip_id, flight in self._zips_in_air
+            ],
+            "flights_flown": list(self.flights_flown),
+            "seconds_flown": list(self.seconds_flown),
+            "distance_flown_m": list(self.distance_flown_m),
+        }
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot: Dict[str, Any],
+        hospitals: Sequence[Optional[Hospital]],
+        zip_speed_mps: int,
+    ) -> "FleetTracker":
+        """
+        Args:
+            snapshot (dict): Output of `snapshot`.
+            hospitals (Sequence[Hospital]): Hospitals by index.
+            zip_speed_mps (int): Zips' speed (m/s), to work out when flights return.
+        Returns:
+            FleetTracker: The fleet, with new Flights for the zips in the air.
+        """
+        fleet = cls(len(snapshot["flights_flown"]))
+        # both lists were heaps when snapshotted, and copying keeps them heaps
+        fleet._zips_at_nest = list(snapshot["zips_at_nest"])
+        for zip_id, launch_time, distance, rows in snapshot["in_air"]:
+            orders = []
+            for received_s, hospital, priority in rows:
+                order = Order(received_s, hospitals[hospital], PRIORITIES[priority])
+                order.allocated = True
+                orders.append(order)
+            flight = Flight(
+                launch_time, orders, zip_speed_mps=zip_speed_mps, distance=distance
+            )
+            flight.zip_id = zip_id
+            fleet._zips_in_air.append((flight.get_return_time(), zip_id, flight))
+        fleet.flights_flown = list(snapshot["flights_flown"])
+        fleet.seconds_flown = list(snapshot["seconds_flown"])
+        fleet.distance_flown_m = list(snapshot["distance_flown_m"])
+        return fleet
+
+
+class EventTrace:
+    """Append-only JSON Lines log of the scheduler's decisions, e.g. to find out why an
+    order wasn't shipped.
+
+    Every record is one JSON object holding the event name ("event"), the time in
+    seconds since midnight ("t") and the event's fields. The events are:
+    order_queued, candidate_rejected_range, resupply_held, packing_improved,
+    flight_loaded, zip_returned and no_zips_available.
+
+    Records are buffered and written in batches. A trace without a file is disabled;
+    callers check `enabled` before building an event, so a disabled trace costs one
+    attribute lookup.
+    """
+
+    def __init__(self, f: Optional[TextIO] = None, buffer_size: int = 1024):
+        self.enabled = f is not None
+        self.buffer_size = buffer_size
+        self._file = f
+        # set when the trace opened the file itself and should close it
+        self._owns_file = False
+        self._buffer: List[str] = []
+        self._encode = json.JSONEncoder(separators=(",", ":")).encode
+
+    @classmethod
+    def open(cls, path: str, buffer_size: int = 1024) -> "EventTrace":
+        """
+        Start a trace that appends to a file.
+        Args:
+            path (str): JSON Lines file to append to.
+            buffer_size (int): Number of records to hold before writing them out.
+        Returns:
+            EventTrace: An enabled trace, which owns the file.
+        """
+        trace = cls(open(path, "a"), buffer_size)
+        trace._owns_file = True
+        return trace
+
+    def emit(self, event: str, time: int, **fields: Any) -> None:
+        """
+        Record an event.
+        Args:
+            event (str): Event name.
+            time (int): Seconds since midnight the event happened at.
+            fields: JSON-serializable details of the event.
+        """
+        if not self.enabled:
+            return
+        self._buffer.append(self._encode({"event": event, "t": time, **fields}))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write out the buffered records."""
+        if self._buffer and self._file is not None:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+            self._file.flush()
+
+    def close(self) -> None:
+        """Write out the buffered records and close the file, if the trace opened it."""
+        if not self.enabled:
+            return
+        self.flush()
+        if self._owns_file and self._file is not None:
+            self._file.close()
+        self.enabled = False
+
+    @staticmethod
+    def replay(
+        f: TextIO, events: Optional[Iterable[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Read a trace back, in the order it was written.
+        Args:
+            f (file_object): JSON Lines trace to read.
+            events (Iterable[str]): Only yield these events, if given.
+        Returns:
+            iterator: One dict per record.
+        """
+        wanted = set(events) if events is not None else None
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if wanted is None or record["event"] in wanted:
+                yield record
+
+
+class SchedulerJournal:
+    """A directory holding a scheduler's state: its last snapshot, and an append-only
+    journal of what it did since, so a restarted scheduler can pick up where it stopped.
+
+    The snapshot (snapshot.json) is `ZipScheduler.snapshot()`, written once every
+    `snapshot_interval_s`. The journal (journal.jsonl) has one compact JSON list per
+    line:
+
+        ["snapshot", generation]  first line, the snapshot the journal follows on from
+        ["order", time, hospital index, priority code]  an order was queued
+        ["tick", time, [[distance_m, [sequence, ...]], ...]]  launch_flights ran and
+            launched these flights, each order given by its queue sequence number
+
+    Snapshots are numbered. Writing one replaces the snapshot file first and the
+    journal second, each atomically, so a journal that doesn't follow on from the
+    snapshot on disk is already part of it and is ignored.
+
+    Orders are written out with the next tick, so a restart loses at most the orders
+    queued since the last tick. Saved state is never thrown away implicitly: it must be
+    loaded (see `ZipScheduler.resume`) before anything is written, unless the journal
+    is opened with `fresh=True`.
+    """
+
+    SNAPSHOT_FILE = "snapshot.json"
+    JOURNAL_FILE = "journal.jsonl"
+
+    def __init__(
+        self,
+        directory: str,
+        snapshot_interval_s: int = SNAPSHOT_INTERVAL_S,
+        fresh: bool = False,
+    ):
+        """
+        Args:
+            directory (str): Where to keep the state, created if needed.
+            snapshot_interval_s (int): Scheduler seconds between snapshots.
+            fresh (bool): Delete any state already saved there and start over.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self.journal_path = os.path.join(directory, self.JOURNAL_FILE)
+        if fresh:
+            for path in (self.snapshot_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.snapshot_interval_s = snapshot_interval_s
+        # number of the last snapshot written, 0 before the first one
+        self.generation = 0
+        self.last_snapshot_time: Optional[int] = None
+        self._file: Optional[TextIO] = None
+        # set once the state on disk was loaded, or written by this journal
+        self._loaded = False
+        # set when the journal on disk follows on from the snapshot on disk
+        self._journal_follows = False
+        self._encode = json.JSONEncoder(separators=(",", ":")).encode
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[list]]:
+        """
+        Read the saved state, so that later records carry on from it.
+        A last record that was cut short, by a crash in the middle of writing it, is
+        dropped from the journal.
+        Returns:
+            tuple: The snapshot (None if there is none yet) and the journal records
+                written since it, oldest first.
+        Raises:
+            ValueError: If a record before the last one can't be read.
+        """
+        snapshot = None
+        try:
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            pass
+        if snapshot is not None:
+            self.generation = snapshot["generation"]
+            self.last_snapshot_time = snapshot["time"]
+
+        records: List[list] = []
+        try:
+            with open(self.journal_path, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        if lines and self._decode(lines[0]) == ["snapshot", self.generation]:
+            self._journal_follows = True
+            kept = len(lines[0])
+            for number, line in enumerate(lines[1:], start=2):
+                record = self._decode(line)
+                if record is None:
+                    if number < len(lines):
+                        raise ValueError(
+                            f"{self.journal_path} is corrupt at line {number}"
+                        )
+                    # a write cut short by a crash; later records go in its place
+                    os.truncate(self.journal_path, kept)
+                    break
+                records.append(record)
+                kept += len(line)
+        self._loaded = True
+        return snapshot, records
+
+    @staticmethod
+    def _decode(line: bytes) -> Optional[list]:
+        # None for a line that wasn't written out in full
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def append(self, record: list) -> None:
+        """
+        Args:
+            record (list): Journal record, see the class docstring.
+        """
+        if self._file is None:
+            self._check_loaded()
+            if self._journal_follows:
+                self._file = open(self.journal_path, "a")
+            else:
+                self._file = open(self.journal_path, "w")
+                self._file.write(self._encode(["snapshot", self.generation]) + "\n")
+                self._loaded = self._journal_follows = True
+        self._file.write(self._encode(record) + "\n")
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def snapshot_due(self, current_time: int) -> bool:
+        return (
+            self.last_snapshot_time is None
+            or current_time - self.last_snapshot_time >= self.snapshot_interval_s
+        )
+
+    def write_snapshot(self, snapshot: Dict[str, Any], current_time: int) -> None:
+        """
+        Save a snapshot and start an empty journal after it.
+        Args:
+            snapshot (dict): `ZipScheduler.snapshot()`.
+            current_time (int): Seconds since midnight the snapshot was taken at.
+        """
+        self._check_loaded()
+        self.generation += 1
+        snapshot = {**snapshot, "generation": self.generation, "time": current_time}
+        with open(self.snapshot_path + ".tmp", "w") as f:
+            f.write(self._encode(snapshot))
+        os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+
+        if self._file is not None:
+            self._file.close()
+        with open(self.journal_path + ".tmp", "w") as f:
+            f.write(self._encode(["snapshot", self.generation]) + "\n")
+        os.replace(self.journal_path + ".tmp", self.journal_path)
+        self._file = open(self.journal_path, "a")
+        self._loaded = self._journal_follows = True
+        self.last_snapshot_time = current_time
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _check_loaded(self) -> None:
+        # writing over state that was never read would lose it
+        if self._loaded:
+            return
+        if os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path):
+            raise RuntimeError(
+                f"{os.path.dirname(self.snapshot_path)} holds a saved scheduler state:"
+                + " resume from it first, or open the journal with fresh=True"
+            )
+        self._loaded = True
+
+
+class PhaseProfiler:
+    """Cumulative wall time and call count per phase of the scheduler and the Runner, and
+    counts of the work done in them (e.g. candidates evaluated).
+
+    Timing a phase is two `time.perf_counter()` calls and a dict update, lost in the
+    noise of a day's run, so schedulers keep one on unless they are given a disabled
+    one, which skips even that. Phases nest: the scheduler's "pack_zip",
+    "dequeue_loaded_orders", "improve_packing", "optimize_routes" and
+    "launch_bookkeeping" run inside the Runner's "scheduler_tick" and
+    "emergency_dispatch", "track_flights" inside "flight_returned", and all of them
+    inside "run", so their times add up to more than the run.
+
+    Usage:
+
+        started = profiler.start()
+        ...
+        profiler.stop("pack_zip", started)
+        profiler.count("candidates_evaluated", len(candidates))
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        # phase -> [calls, seconds]
+        self._phases: Dict[str, List[float]] = {}
+        # counter -> total
+        self.counters: Dict[str, int] = {}
+
+    def start(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, phase: str, started: float) -> None:
+        """
+        Args:
+            phase (str): Name of the phase that just ended.
+            started (float): What `start()` returned when it began.
+        """
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - started
+        totals = self._phases.get(phase)
+        if totals is None:
+            self._phases[phase] = [1, elapsed]
+        else:
+            totals[0] += 1
+            totals[1] += elapsed
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: {"phases": {phase: {"calls", "seconds"}}, "counters": {counter: total}},
+                JSON-serializable.
         """
-        orders = []
-        for line in f.readlines():
-            fields = [values.strip() for values in line.split(",")]
-            orders.append(
-                Order(
-                    time=int(fields[0]),
-                    hospital=hospitals[fields[1]],
-                    priority=fields[2],
-                )
+        return {
+            "phases": {
+                phase: {"calls": int(calls), "seconds": seconds}
+                for phase, (calls, seconds) in self._phases.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def report(self) -> List[str]:
+        """
+        Returns:
+            list: One line per phase, slowest first, then one per counter.
+        """
+        lines = []
+        for phase, (calls, seconds) in sorted(
+            self._phases.items(), key=lambda item: -item[1][1]
+        ):
+            lines.append(
+                f"{phase:<24} {int(calls):>9} calls {1000 * seconds:>11.1f} ms"
+                + f" {1e6 * seconds / calls:>9.1f} us/call"
             )
-        return orders
+        for counter, total in sorted(self.counters.items()):
+            lines.append(f"{counter:<24} {total:>9}")
+        return lines
 
 
-# Feel free to extend as needed
-class Flight:
-    def __init__(self, launch_time: int, orders: List[Order]):
-        self.launch_time = launch_time
-        self.orders = orders
-        self.distance = Flight.get_distance(orders)
+class StreamingHistogram:
+    """Fixed-memory histogram of non-negative values, in the style of an HDR histogram.
 
-    def __str__(self) -> str:
-        orders_str = "->".join([o.hospital.name for o in self.orders])
-        return f"<Flight @ {self.launch_time} to {orders_str} returning at {self.get_return_time()}>"
+    Values below 2 ** SUB_BUCKET_BITS get a bucket each. Above that, every power of two
+    is split into 2 ** (SUB_BUCKET_BITS - 1) equal buckets, so a percentile is off by
+    less than 2 ** (1 - SUB_BUCKET_BITS) of its value (under 2% with 7 bits). Count,
+    sum, min and max are exact.
+    """
 
-    def get_return_time(self) -> int:
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        # bucket index -> number of values recorded in it
+        self._buckets: Dict[int, int] = {}
+
+    @classmethod
+    def _bucket(cls, value: float) -> int:
+        value = max(int(value), 0)
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if value < sub_buckets:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        half = sub_buckets >> 1
+        return sub_buckets + (shift - 1) * half + (value >> shift) - half
+
+    @classmethod
+    def _bucket_upper_bound(cls, bucket: int) -> int:
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if bucket < sub_buckets:
+            return bucket
+        half = sub_buckets >> 1
+        shift, offset = divmod(bucket - sub_buckets, half)
+        shift += 1
+        return ((half + offset + 1) << shift) - 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def record(self, value: float) -> None:
         """
-        Get return time in seconds for the flight.
+        Add a value.
+        Args:
+            value (float): Value to record, e.g. a wait time in seconds.
+        """
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bucket = self._bucket(value)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def percentile(self, percent: float) -> float:
+        """
+        Get an approximate percentile of the recorded values.
+        Args:
+            percent (float): Percentile to get, between 0 and 100.
         Returns:
-            int: Time (s) that flight is expected to return.
+            float: Value that `percent`% of the recorded values are at or below, 0 if empty.
         """
-        flight_time_s = round(self.distance / ZIP_SPEED_MPS)
-        return self.launch_time + flight_time_s
-
-    @staticmethod
-    def get_distance(flight_plan) -> int:
+        if not self.count or self.min is None or self.max is None:
+            return 0.0
+        rank = max(math.ceil(percent / 100 * self.count), 1)
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(max(self._bucket_upper_bound(bucket), self.min), self.max)
+        return self.max
+
+    def merge(self, other: "StreamingHistogram") -> None:
         """
-        Given a flight plan, calculate the distance (in meters) to go to each stop and then return to
-        the Nest.
+        Add every value recorded in another histogram to this one.
         Args:
-            flight_plan (List[Orders]): List of orders that make up the flight plan stops, including coordinates.
+            other (StreamingHistogram): Histogram to merge in.
+        """
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and other.max is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        for bucket, count in other._buckets.items():
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + count
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
         Returns:
-            int: flight plan distance in meters
+            dict: JSON-serializable summary, which `from_snapshot` can turn back into a histogram.
         """
-        flight_segment_distances = []
-
-        # parse the start and end coordinates for each stop in order to calculate distance
-        stop_coordinates = [
-            {"north_m": order.hospital.north_m, "east_m": order.hospital.east_m}
-            for order in flight_plan
-        ]
-
-        # add the Nest as the last stop to account for mileage to return home
-        stop_coordinates.append({"north_m": NEST[0], "east_m": NEST[1]})
-
-        # using the coordinates of the previous stop as the starting point and
-        # the coordinates of the current stop as the ending point, calculate the distance of the segment
-        for index, stop in enumerate(stop_coordinates):
-            start_coordinates = (
-                [
-                    stop_coordinates[index - 1]["north_m"],
-                    stop_coordinates[index - 1]["east_m"],
-                ]
-                if index > 0
-                else NEST
-            )
-            dest_hospital = [stop["north_m"], stop["east_m"]]
-
-            segment_distance = math.dist(start_coordinates, dest_hospital)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {str(bucket): n for bucket, n in self._buckets.items()},
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingHistogram":
+        histogram = cls()
+        histogram.count = snapshot["count"]
+        histogram.total = snapshot["sum"]
+        histogram.min = snapshot["min"]
+        histogram.max = snapshot["max"]
+        histogram._buckets = {int(b): n for b, n in snapshot["buckets"].items()}
+        return histogram
+
+
+class SchedulerMetrics:
+    """Streaming stats about one scheduler's orders and flights.
+
+    Every stat is a StreamingHistogram or a counter, so memory stays flat however long
+    the scheduler runs. Wait times (s) are split by priority and by hospital.
+    Metrics from several runs can be combined with `merge`, or through `snapshot`
+    and `from_snapshot` when the runs happened in other processes.
+    """
 
-            # get the absolute distance of start to end point for the stop
-            absolute_distance = abs(segment_distance)
-            flight_segment_distances.append(absolute_distance)
+    def __init__(self) -> None:
+        self.order_wait_s = StreamingHistogram()
+        self.order_wait_s_by_priority: Dict[str, StreamingHistogram] = {}
+        self.order_wait_s_by_hospital: Dict[str, StreamingHistogram] = {}
+        self.flight_packages = StreamingHistogram()
+        self.flight_distance_m = StreamingHistogram()
+        # assuming launch_flights is called once per minute
+        self.mins_with_0_zips_available = 0
+        self.mins_with_0_zips_available_and_emergency_order = 0
+
+    def wait_s(self, priority: str) -> StreamingHistogram:
+        """
+        Args:
+            priority (str): EMERGENCY or RESUPPLY.
+        Returns:
+            StreamingHistogram: Wait times of the orders with this priority (empty if none).
+        """
+        return self.order_wait_s_by_priority.get(priority, StreamingHistogram())
 
-        # the sum of the segment distances, beginning at and returning to the Nest, is the total distance flown
-        flight_path_distance = sum(flight_segment_distances)
-        return flight_path_distance
+    def record_order_loaded(self, order: Order, wait_s: int) -> None:
+        """
+        Args:
+            order (Order): Order that was just loaded on a zip.
+            wait_s (int): Seconds between the order being received and its zip launching.
+        """
+        self.order_wait_s.record(wait_s)
+        for key, histograms in (
+            (order.priority, self.order_wait_s_by_priority),
+            (order.hospital.name, self.order_wait_s_by_hospital),
+        ):
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = StreamingHistogram()
+            histogram.record(wait_s)
+
+    def record_flight(self, flight: Flight) -> None:
+        """
+        Args:
+            flight (Flight): Flight that just launched.
+        """
+        self.flight_packages.record(len(flight.orders))
+        self.flight_distance_m.record(flight.distance)
 
-    @staticmethod
-    def validate_flight_plan(flight_plan, order) -> bool:
+    def record_no_zips_available(self, emergency_waiting: bool) -> None:
         """
-        Validate whether the proposed next stop can be added to the current, valid flight plan.
-        Flight plan cannot exceed zip range and must be able to return to the Nest.
+        Args:
+            emergency_waiting (bool): Whether an Emergency order was in the queue.
+        """
+        self.mins_with_0_zips_available += 1
+        if emergency_waiting:
+            self.mins_with_0_zips_available_and_emergency_order += 1
 
+    def merge(self, other: "SchedulerMetrics") -> None:
+        """
+        Add another scheduler's metrics to these.
         Args:
-            flight_plan (List[Orders]): List of Orders currently in the flight plan, already validated.
-            order (Order): Order to validate as the next stop in flight plan.
-        Returns:
-            bool: Whether the flight plan is valid with the passed in proposed next stop included.
+            other (SchedulerMetrics): Metrics to merge in.
         """
-        print(
-            f"Checking if order [{order.time}] {order.hospital.name}--{order.priority} can be added to flight path."
+        self.order_wait_s.merge(other.order_wait_s)
+        for mine, theirs in (
+            (self.order_wait_s_by_priority, other.order_wait_s_by_priority),
+            (self.order_wait_s_by_hospital, other.order_wait_s_by_hospital),
+        ):
+            for key, histogram in theirs.items():
+                mine.setdefault(key, StreamingHistogram()).merge(histogram)
+        self.flight_packages.merge(other.flight_packages)
+        self.flight_distance_m.merge(other.flight_distance_m)
+        self.mins_with_0_zips_available += other.mins_with_0_zips_available
+        self.mins_with_0_zips_available_and_emergency_order += (
+            other.mins_with_0_zips_available_and_emergency_order
         )
 
-        # add the proposed next stop to the flight plan
-        flight_plan.append(order)
-
-        # not rounding distance to avoid over-allocating the zip
-        tentative_flight_path_distance = Flight.get_distance(flight_plan)
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: JSON-serializable copy of every stat, which `from_snapshot` can restore.
+        """
+        return {
+            "order_wait_s": self.order_wait_s.snapshot(),
+            "order_wait_s_by_priority": {
+                key: h.snapshot() for key, h in self.order_wait_s_by_priority.items()
+            },
+            "order_wait_s_by_hospital": {
+                key: h.snapshot() for key, h in self.order_wait_s_by_hospital.items()
+            },
+            "flight_packages": self.flight_packages.snapshot(),
+            "flight_distance_m": self.flight_distance_m.snapshot(),
+            "mins_with_0_zips_available": self.mins_with_0_zips_available,
+            "mins_with_0_zips_available_and_emergency_order": (
+                self.mins_with_0_zips_available_and_emergency_order
+            ),
+        }
 
-        print(
-            f"Tentative flight plan distance (including return to Nest): "
-            + f"{tentative_flight_path_distance} meters/ {ZIP_MAX_CUMULATIVE_RANGE_M} meters max range."
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "SchedulerMetrics":
+        metrics = cls()
+        metrics.order_wait_s = StreamingHistogram.from_snapshot(
+            snapshot["order_wait_s"]
         )
-        if tentative_flight_path_distance <= ZIP_MAX_CUMULATIVE_RANGE_M:
-            print("Order added!")
-            return True
-        else:
-            print("Could not add order - distance out of range!")
-            return False
+        for attribute in ("order_wait_s_by_priority", "order_wait_s_by_hospital"):
+            setattr(
+                metrics,
+                attribute,
+                {
+                    key: StreamingHistogram.from_snapshot(h)
+                    for key, h in snapshot[attribute].items()
+                },
+            )
+        metrics.flight_packages = StreamingHistogram.from_snapshot(
+            snapshot["flight_packages"]
+        )
+        metrics.flight_distance_m = StreamingHistogram.from_snapshot(
+            snapshot["flight_distance_m"]
+        )
+        metrics.mins_with_0_zips_available = snapshot["mins_with_0_zips_available"]
+        metrics.mins_with_0_zips_available_and_emergency_order = snapshot[
+            "mins_with_0_zips_available_and_emergency_order"
+        ]
+        return metrics
 
 
 class ZipScheduler:
+    # bump whenever the layout of `snapshot` changes, so older snapshots are refused
+    SNAPSHOT_VERSION = 1
+
     def __init__(
         self,
         hospitals: Dict[str, Hospital],
@@ -220,111 +2084,219 @@ class ZipScheduler:
         max_packages_per_zip: int,
         zip_speed_mps: int,
         zip_max_cumulative_range_m: int,
+        trace: Optional[EventTrace] = None,
+        min_resupply_orders_needed_to_load: int = MIN_RESUPPLY_ORDERS_NEEDED_TO_LOAD,
+        min_zips_to_ship_single_orders: int = MIN_ZIPS_TO_SHIP_SINGLE_ORDERS,
+        nest: Sequence[int] = NEST,
+        packing_budget_s: Optional[float] = None,
+        profiler: Optional[PhaseProfiler] = None,
+        journal: Optional[SchedulerJournal] = None,
+        distance_provider: Optional[DistanceProvider] = None,
+        emergency_dispatch_delay_s: Optional[int] = None,
     ):
         self.hospitals = hospitals
+        self.nest = nest
         self.num_zips = num_zips
         self.max_packages_per_zip = max_packages_per_zip
         self.zip_speed_mps = zip_speed_mps
         self.zip_max_cumulative_range_m = zip_max_cumulative_range_m
-        # Flights that have not yet returned/are unavailable
-        self._launched_flights: List[Flight] = []
+        # controls for order throttling to prioritize Emergency zips
+        self.min_resupply_orders_needed_to_load = min_resupply_orders_needed_to_load
+        self.min_zips_to_ship_single_orders = min_zips_to_ship_single_orders
+        # Seconds an Emergency order may wait for a free zip before it launches between
+        # minute ticks, so nearby orders can join it; None launches Emergency orders on
+        # the minute ticks only
+        self.emergency_dispatch_delay_s = emergency_dispatch_delay_s
+        # Every leg between the Nest and the hospitals, computed once (straight lines
+        # unless a provider says otherwise)
+        self.distance_matrix = DistanceMatrix(hospitals, nest, distance_provider)
+        # Shortest tours for packed flights, memoized per set of hospitals
+        self.route_optimizer = RouteOptimizer(self.distance_matrix)
+        # Time (s) each tick may spend improving the greedy packing, None to skip it
+        self.packing_budget_s = packing_budget_s
+        self.packing_optimizer = PackingOptimizer(
+            self.route_optimizer, max_packages_per_zip, zip_max_cumulative_range_m
+        )
+        # Zips at the Nest and flights that have not yet returned/are unavailable
+        self.fleet = FleetTracker(num_zips)
         # Track which orders haven't been launched yet
-        self._unfulfilled_orders: List[Order] = []
+        self._order_queue = OrderQueue()
+        # Orders queued since the last tick. Producers on any thread append to it without
+        # a lock (deque appends are atomic), and each tick moves them to the order queue.
+        self._intake: Deque[Order] = collections.deque()
+        # Held by whatever reads or changes the order queue or the fleet: a tick,
+        # tracking flights, or taking or restoring a snapshot
+        self._tick_lock = threading.RLock()
+        # Flight and order stats
+        self.metrics = SchedulerMetrics()
+        # Structured log of scheduling decisions, disabled unless a file is given
+        self.trace = trace if trace is not None else EventTrace()
+        # Time spent in each phase of scheduling, and the work done in them
+        self.profiler = profiler if profiler is not None else PhaseProfiler()
+        # Snapshots and a journal of queued orders and launches to restart from, if given
+        self.journal = journal
 
     @property
     def unfulfilled_orders(self) -> List[Order]:
-        return self._unfulfilled_orders
+        # a deque can't be copied while producers append to it, so drain it first
+        with self._tick_lock:
+            self._drain_intake()
+            return list(self._order_queue)
+
+    @property
+    def num_unfulfilled_orders(self) -> int:
+        with self._tick_lock:
+            self._drain_intake()
+            return len(self._order_queue)
 
     def queue_order(self, order: Order) -> None:
         """Add a new order to our queue.
 
+        Safe to call from any number of threads, including while a tick is running: the
+        order is buffered without taking a lock, and the next `launch_flights` call
+        picks it up.
+
         Note:
             Called every time a new order arrives.
 
         Args:
             order (Order): the order just placed.
         """
-        # added numeric weights for easier sorting
-        if order.priority == EMERGENCY:
-            order.weighted_priority = 5
-        else:
-            order.weighted_priority = 1
-        self.unfulfilled_orders.append(order)
+        self._intake.append(order)
+
+    def _drain_intake(self) -> None:
+        # move the orders buffered so far to the order queue, in the order they arrived;
+        # orders that arrive meanwhile wait for the next drain
+        intake = self._intake
+        for _ in range(len(intake)):
+            order = intake.popleft()
+            self._order_queue.push(order)
+            if self.journal is not None:
+                self.journal.append(
+                    ["order", order.time, order.hospital.index, order.priority_code]
+                )
+            if self.trace.enabled:
+                self.trace.emit(
+                    "order_queued",
+                    order.time,
+                    hospital=order.hospital.name,
+                    priority=order.priority,
+                    queued=len(self._order_queue),
+                )
 
-    def launch_flights(self, current_time: int) -> List[Flight]:
+    def launch_flights(
+        self, current_time: int, emergency_only: bool = False
+    ) -> List[Flight]:
         """Determines which flights should be launched right now.
         Each flight has an ordered list of Orders to serve.
 
         Note:
-            Will be called periodically (approximately once a minute).
+            Will be called periodically (approximately once a minute), and in between
+            with `emergency_only` when `next_emergency_dispatch` says so.
 
         Args:
             current_time (int): Seconds since midnight.
+            emergency_only (bool): Only load zips for the waiting Emergency orders (which
+                may still carry Resupply orders that fit), leaving every other order
+                for the next minute tick.
 
         Returns:
             list: Flight objects that launch at this time.
         """
+        # ticks don't overlap, but orders keep arriving in the intake while one runs
+        with self._tick_lock:
+            self._drain_intake()
+            return self._launch_flights(current_time, emergency_only)
+
+    def next_emergency_dispatch(self, current_time: int) -> Optional[int]:
+        """
+        When to launch the waiting Emergency orders ahead of the next minute tick:
+        `emergency_dispatch_delay_s` after the longest waiting one a zip can reach
+        arrived, or right away if that has passed.
+        Args:
+            current_time (int): Seconds since midnight.
+        Returns:
+            int: Seconds since midnight to call `launch_flights(..., emergency_only=True)`
+                at, or None if the fast path is off, no Emergency order a zip can reach
+                is waiting or no zip is free.
+        """
+        if self.emergency_dispatch_delay_s is None:
+            return None
+        with self._tick_lock:
+            self._drain_intake()
+            first = self._first_reachable_emergency()
+            if first is None:
+                return None
+            next_return_time = self.fleet.next_return_time()
+            zip_free = self.fleet.available_zips or (
+                next_return_time is not None and next_return_time < current_time
+            )
+            if not zip_free:
+                return None
+            return max(current_time, first.time + self.emergency_dispatch_delay_s)
+
+    def _first_reachable_emergency(self) -> Optional[Order]:
+        # orders for hospitals out of range never launch, so they don't call for a zip
+        for order in self._order_queue.iter_by_priority():
+            if order.priority != EMERGENCY:
+                break
+            round_trip_m = self.distance_matrix.route_distance([order.hospital.index])
+            if round_trip_m <= self.zip_max_cumulative_range_m:
+                return order
+        return None
+
+    def _launch_flights(self, current_time: int, emergency_only: bool) -> List[Flight]:
+        started = time.perf_counter()
+        profiler = self.profiler
 
         # if no orders are queued, there is nothing to do
-        if not self._unfulfilled_orders:
-            return
+        if not self._order_queue:
+            return []
 
         # if we have orders that need to go out, check for any returned zips that we can reuse
         self.track_flights(current_time)
 
-        # sort orders first by priority, then by time they were received
         # TODO: Other sort/route optimizations are possible, such as grouping nearby or same destinations
         #  in order to reduce flight time, etc
-        sorted_orders = sorted(
-            self._unfulfilled_orders,
-            key=lambda order_item: (-order_item.weighted_priority, order_item.time),
-        )
-
-        orders_quant = (
-            "is 1 unfulfilled order"
-            if len(sorted_orders) == 1
-            else f"are {len(sorted_orders)} unfulfilled orders"
-        )
-        # logger to show the sorted orders in the console in absence of a UI
-        print(f"There {orders_quant}.")
-        for index, order in enumerate(sorted_orders):
-            print(f"Order priority # {index + 1}: {order}, priority: {order.priority}")
-
-        available_zips = self.num_zips - len(self._launched_flights)
-        if available_zips:
-            zips_quant = (
-                "is 1 zip" if available_zips == 1 else f"are {available_zips} zips"
-            )
-            print(f"There { zips_quant } available.\n")
-        else:
-            print("No zips available, cannot load.\n\n")
-            NUM_MINS_WITH_0_ZIPS_AVAILABLE.append(1)
-            if sorted_orders[0].priority == EMERGENCY:
-                NUM_MINS_WITH_0_ZIPS_AVAILABLE_AND_EMERGENCY_ORDER.append(1)
-            return
+        available_zips = self.fleet.available_zips
+        if not available_zips and emergency_only:
+            # no zip came back since the minute tick, which already recorded the wait
+            return []
+        if not available_zips:
+            emergency_waiting = self._order_queue.emergency_waiting()
+            self.metrics.record_no_zips_available(emergency_waiting)
+            if self.trace.enabled:
+                self.trace.emit(
+                    "no_zips_available",
+                    current_time,
+                    queued=len(self._order_queue),
+                    emergency_waiting=emergency_waiting,
+                    next_return_t=self.fleet.next_return_time(),
+                )
+            self._journal_tick(current_time, [], {})
+            return []
 
-        loaded_zips = []
+        packed_routes: List[RouteBuilder] = []
+        # queue sequence number of every loaded order, for the journal
+        sequences: Dict[Order, int] = {}
 
         # iterate through the number of available zips to plan flight paths/allocate orders
         for available_zip in range(available_zips):
-            flight_plan = []
-
-            # check for orders that have not already been assigned to a zip
-            remaining_orders = [
-                item for item in sorted_orders if item.allocated is not True
-            ]
-
-            # all orders fulfilled
-            if not remaining_orders:
+            # all orders fulfilled (orders leave the queue as soon as their zip is loaded)
+            if not self._order_queue:
                 continue
 
             # these configurable settings are meant to group non-emergency orders together/
             # allowing them to wait in the queue if there are not enough to fill up a zip
             not_many_remaining_orders = (
-                len(remaining_orders) < MIN_RESUPPLY_ORDERS_NEEDED_TO_LOAD
+                len(self._order_queue) < self.min_resupply_orders_needed_to_load
+            )
+            no_emergency_orders = not self._order_queue.emergency_waiting()
+            not_many_zips_available = (
+                available_zips < self.min_zips_to_ship_single_orders
             )
-            no_emergency_orders = remaining_orders[0].priority == RESUPPLY
-            not_many_zips_available = available_zips < MIN_ZIPS_TO_SHIP_SINGLE_ORDERS
+            if emergency_only and no_emergency_orders:
+                break
 
             # this check reduces wait time for Emergency zips
             if (
@@ -335,59 +2307,348 @@ class ZipScheduler:
                 # We can probably deliver at least 2 non-priority orders at a time,
                 # so we can hold off on sending a single order in order to reserve zips for
                 # emergency orders
-                print(
-                    "No emergency orders in queue and mins to ship non-priority orders not met."
-                    + "Waiting to collect more orders."
-                )
+                if self.trace.enabled:
+                    self.trace.emit(
+                        "resupply_held",
+                        current_time,
+                        queued=len(self._order_queue),
+                        available_zips=available_zips,
+                    )
                 continue
 
             # there are still orders left to ship out
-            for order in remaining_orders:
-                if len(flight_plan) < MAX_PACKAGES_PER_ZIP:
-                    # validate that the order can be added to the zip flight plan without
-                    # surpassing the zip's max range
-                    is_valid = Flight.validate_flight_plan(flight_plan.copy(), order)
-                    if is_valid:
-                        # if the order can be added, add it and mark it as allocated
-                        order.allocated = True
-                        flight_plan.append(order)
-                        quant_orders = (
-                            "is currently 1 order"
-                            if len(flight_plan) == 1
-                            else f"are currently {len(flight_plan)} orders"
-                        )
-                        print(f"There {quant_orders} in this flight plan.")
+            phase_started = profiler.start()
+            route = self._pack_zip(current_time, emergency_only)
+            profiler.stop("pack_zip", phase_started)
+            if not route and emergency_only:
+                # no waiting Emergency order fits on a zip of its own
+                break
 
             # if the zip has orders in its flight path, it should be launched
-            if flight_plan:
-                # a loaded zip represents a flight that is ready to launch with a finalized flight path
-                loaded_zip = Flight(current_time, flight_plan)
-                loaded_zips.append(loaded_zip)
-                print(f"Flight loaded: {loaded_zip}")
+            if route:
+                packed_routes.append(route)
+                profiler.count("zips_packed")
 
-                for loaded_order in flight_plan:
+                phase_started = profiler.start()
+                for loaded_order in route.orders:
                     # gather stats on the average amount of time an order waited to get loaded
                     order_wait_time = current_time - loaded_order.time
-                    if loaded_order.priority == EMERGENCY:
-                        EMERGENCY_ORDER_WAIT_TIME.append(order_wait_time)
-                    if loaded_order.priority == RESUPPLY:
-                        RESUPPLY_ORDER_WAIT_TIME.append(order_wait_time)
-                    ORDER_WAIT_TIME.append(order_wait_time)
+                    self.metrics.record_order_loaded(loaded_order, order_wait_time)
 
                     # You should remove any orders from `self.unfilfilled_orders` as you go
-                    order_index = self._unfulfilled_orders.index(loaded_order)
-                    self._unfulfilled_orders.pop(order_index)
+                    if self.journal is not None:
+                        sequences[loaded_order] = self._order_queue.sort_key(
+                            loaded_order
+                        )[2]
+                    self._order_queue.remove(loaded_order)
+                profiler.stop("dequeue_loaded_orders", phase_started)
+
+        if self.packing_budget_s is not None and len(packed_routes) > 1:
+            phase_started = profiler.start()
+            packed_routes = self._improve_packing(
+                current_time, packed_routes, started + self.packing_budget_s
+            )
+            profiler.stop("improve_packing", phase_started)
 
+        phase_started = profiler.start()
+        loaded_zips = []
+        for route in packed_routes:
+            # fly the packed stops in the shortest order instead of the order they were packed
+            self.route_optimizer.optimize(route)
+            # a loaded zip represents a flight that is ready to launch with a finalized flight path
+            loaded_zips.append(route.to_flight(current_time, self.zip_speed_mps))
+        profiler.stop("optimize_routes", phase_started)
+
+        phase_started = profiler.start()
         for flight in loaded_zips:
             # gather flight plan stats
-            FLIGHT_PLAN_ORDERS.append(len(flight.orders))
-            FLIGHT_PLAN_DISTANCE.append(flight.distance)
+            self.metrics.record_flight(flight)
 
-        print("Zips packed!")
-        self._launched_flights.extend(loaded_zips)
+        for flight in loaded_zips:
+            self.fleet.launch(flight)
+            if self.trace.enabled:
+                self.trace.emit(
+                    "flight_loaded",
+                    current_time,
+                    zip=flight.zip_id,
+                    orders=[
+                        [o.time, o.hospital.name, o.priority] for o in flight.orders
+                    ],
+                    distance_m=flight.distance,
+                    return_t=flight.get_return_time(),
+                )
+        profiler.stop("launch_bookkeeping", phase_started)
+        self._journal_tick(current_time, loaded_zips, sequences)
         return loaded_zips
 
-    def track_flights(self, seconds_since_midnight) -> None:
+    def _journal_tick(
+        self, current_time: int, flights: List[Flight], sequences: Dict[Order, int]
+    ) -> None:
+        if self.journal is None:
+            return
+        self.journal.append(
+            [
+                "tick",
+                current_time,
+                [
+                    [flight.distance, [sequences[order] for order in flight.orders]]
+                    for flight in flights
+                ],
+            ]
+        )
+        if self.journal.snapshot_due(current_time):
+            self.journal.write_snapshot(self.snapshot(), current_time)
+        else:
+            self.journal.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Capture everything that decides which flights launch next: the queued orders,
+        the zips in the air and the metrics. The hospitals and settings are not
+        included, they come from the scheduler restoring it.
+        Returns:
+            dict: JSON-serializable state, which `restore` can load.
+        """
+        with self._tick_lock:
+            self._drain_intake()
+            return {
+                "version": self.SNAPSHOT_VERSION,
+                "hospitals": [
+                    h.name if h is not None else None
+                    for h in self._hospitals_by_index()
+                ],
+                "queue": self._order_queue.snapshot(),
+                "fleet": self.fleet.snapshot(),
+                "metrics": self.metrics.snapshot(),
+            }
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Replace this scheduler's orders, fleet and metrics with a snapshot's.
+        Args:
+            snapshot (dict): Output of `snapshot`, from a scheduler with the same
+                hospitals and number of zips.
+        """
+        hospitals = self._hospitals_by_index()
+        if snapshot["version"] != self.SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {snapshot['version']}")
+        if snapshot["hospitals"] != [h.name if h else None for h in hospitals]:
+            raise ValueError("Snapshot was taken with other hospitals")
+        if len(snapshot["fleet"]["flights_flown"]) != self.num_zips:
+            raise ValueError("Snapshot was taken with another number of zips")
+        with self._tick_lock:
+            self._order_queue = OrderQueue.from_snapshot(snapshot["queue"], hospitals)
+            self.fleet = FleetTracker.from_snapshot(
+                snapshot["fleet"], hospitals, self.zip_speed_mps
+            )
+            self.metrics = SchedulerMetrics.from_snapshot(snapshot["metrics"])
+
+    def resume(self) -> int:
+        """
+        Pick up from the state saved in the journal: restore its last snapshot, then
+        replay the orders and launches journaled since, as they were decided.
+
+        Note:
+            Call it once, on a new scheduler, before queueing any orders.
+
+        Returns:
+            int: Number of journal records replayed.
+        Raises:
+            RuntimeError: If the scheduler has no journal.
+        """
+        if self.journal is None:
+            raise RuntimeError("There is no journal to resume from")
+        snapshot, records = self.journal.load()
+        with self._tick_lock:
+            if snapshot is not None:
+                self.restore(snapshot)
+            hospitals = self._hospitals_by_index()
+            orders = self._order_queue.by_sequence()
+            for record in records:
+                if record[0] == "order":
+                    _, received_s, hospital, priority = record
+                    order = Order(received_s, hospitals[hospital], PRIORITIES[priority])
+                    orders[self._order_queue.push(order)] = order
+                else:
+                    _, current_time, flights = record
+                    self._replay_tick(current_time, flights, orders)
+        return len(records)
+
+    def _replay_tick(
+        self, current_time: int, flights: List[list], orders: Dict[int, Order]
+    ) -> None:
+        # the bookkeeping of launch_flights, without deciding anything again
+        self.track_flights(current_time)
+        if not self.fleet.available_zips:
+            self.metrics.record_no_zips_available(self._order_queue.emergency_waiting())
+            return
+        loaded_zips = []
+        for distance, flight_sequences in flights:
+            flight_orders = [orders.pop(sequence) for sequence in flight_sequences]
+            for order in flight_orders:
+                order.allocated = True
+                self.metrics.record_order_loaded(order, current_time - order.time)
+                self._order_queue.remove(order)
+            loaded_zips.append(
+                Flight(
+                    current_time,
+                    flight_orders,
+                    zip_speed_mps=self.zip_speed_mps,
+                    distance=distance,
+                )
+            )
+        for flight in loaded_zips:
+            self.metrics.record_flight(flight)
+        for flight in loaded_zips:
+            self.fleet.launch(flight)
+
+    def _hospitals_by_index(self) -> List[Optional[Hospital]]:
+        hospitals: List[Optional[Hospital]] = [None] * (
+            max((h.index for h in self.hospitals.values()), default=0) + 1
+        )
+        for hospital in self.hospitals.values():
+            hospitals[hospital.index] = hospital
+        return hospitals
+
+    def _improve_packing(
+        self, current_time: int, routes: List[RouteBuilder], deadline: float
+    ) -> List[RouteBuilder]:
+        # spend what is left of the tick's budget moving orders between the packed zips
+        packing, moves = self.packing_optimizer.improve(
+            [route.orders for route in routes], deadline
+        )
+        if not moves:
+            return routes
+        improved = []
+        for orders in packing:
+            route = RouteBuilder(self.distance_matrix, self.zip_max_cumulative_range_m)
+            for order in orders:
+                route.insert(order)
+            improved.append(route)
+        if self.trace.enabled:
+            self.trace.emit(
+                "packing_improved",
+                current_time,
+                moves=moves,
+                zips_freed=len(routes) - len(improved),
+                distance_m=sum(
+                    self.route_optimizer.tour_length(route.stops) for route in routes
+                ),
+                improved_distance_m=sum(
+                    self.route_optimizer.tour_length(route.stops) for route in improved
+                ),
+            )
+        return improved
+
+    def _pack_zip(
+        self, current_time: int, emergency_only: bool = False
+    ) -> RouteBuilder:
+        """
+        Pick the orders for one zip and mark them as allocated.
+
+        The highest priority order that fits on a flight of its own goes first (only an
+        Emergency order can for `emergency_only` zips). The zip is then filled with
+        orders that fit in its remaining range, visiting each at its cheapest place on
+        the route: waiting Emergency orders first, oldest first, then the Resupply
+        orders that add the least distance. The cost of fitting every waiting hospital
+        into the route is computed in one numpy pass per stop.
+
+        Args:
+            current_time (int): Seconds since midnight.
+            emergency_only (bool): Leave the zip empty unless an Emergency order fits.
+        Returns:
+            RouteBuilder: The packed route (empty if nothing fits).
+        """
+        route = RouteBuilder(self.distance_matrix, self.zip_max_cumulative_range_m)
+
+        for order in self._order_queue.iter_by_priority():
+            if emergency_only and order.priority != EMERGENCY:
+                break
+            self.profiler.count("orders_scanned")
+            added = route.append_cost(order.hospital.index)
+            if route.fits(added):
+                order.allocated = True
+                route.insert(order)
+                break
+            self._trace_rejected_candidate(current_time, route, order, added)
+        if not route:
+            return route
+
+        while len(route) < self.max_packages_per_zip:
+            stop, position = self._next_emergency_stop(current_time, route)
+            if stop is None:
+                stop, position = self._next_resupply_stop(current_time, route)
+            if stop is None:
+                break
+            stop.allocated = True
+            route.insert(stop, position)
+        return route
+
+    def _next_emergency_stop(
+        self, current_time: int, route: RouteBuilder
+    ) -> Tuple[Optional[Order], int]:
+        # the highest priority Emergency order that fits anywhere on the route
+        for order in self._order_queue.iter_by_priority():
+            if order.priority != EMERGENCY:
+                break
+            self.profiler.count("orders_scanned")
+            added, position = route.cheapest_insertion(order.hospital.index)
+            if route.fits(added):
+                return order, position
+            self._trace_rejected_candidate(current_time, route, order, added)
+        return None, 0
+
+    def _next_resupply_stop(
+        self, current_time: int, route: RouteBuilder
+    ) -> Tuple[Optional[Order], int]:
+        # the Resupply order that adds the least distance, oldest first on ties
+        stops = self._waiting_hospitals()
+        self.profiler.count("candidates_evaluated", len(stops))
+        added, positions = route.insertion_costs(stops)
+        in_range = route.distance + added <= route.max_range_m
+        if self.trace.enabled:
+            for stop, cost in zip(stops[~in_range].tolist(), added[~in_range].tolist()):
+                order = self._order_queue.first_at(stop)
+                if order is not None:
+                    self._trace_rejected_candidate(current_time, route, order, cost)
+        stops, added, positions = stops[in_range], added[in_range], positions[in_range]
+
+        best_order: Optional[Order] = None
+        best_key: Optional[Tuple[int, float, int, int]] = None
+        best_position = 0
+        for candidate in np.argsort(added, kind="stable").tolist():
+            if best_key is not None and added[candidate] > best_key[1]:
+                break
+            order = self._order_queue.first_at(int(stops[candidate]))
+            if order is None:
+                continue
+            weighted_priority, received_s, sequence = self._order_queue.sort_key(order)
+            key = (weighted_priority, float(added[candidate]), received_s, sequence)
+            if best_key is None or key < best_key:
+                best_order, best_key = order, key
+                best_position = int(positions[candidate])
+        return best_order, best_position
+
+    def _waiting_hospitals(self) -> np.ndarray:
+        waiting = self._order_queue.waiting_hospitals()
+        return np.fromiter(waiting, dtype=np.intp, count=len(waiting))
+
+    def _trace_rejected_candidate(
+        self, current_time: int, route: RouteBuilder, order: Order, added_m: float
+    ) -> None:
+        if self.trace.enabled:
+            self.trace.emit(
+                "candidate_rejected_range",
+                current_time,
+                order_t=order.time,
+                hospital=order.hospital.name,
+                priority=order.priority,
+                stops=[o.hospital.name for o in route.orders],
+                distance_m=route.distance + added_m,
+                max_range_m=self.zip_max_cumulative_range_m,
+            )
+
+    def track_flights(self, seconds_since_midnight: int) -> None:
         """
         Track how many zips are in flight/ how many have returned.
         This tracking functionality allows us to know how many zips are currently available.
@@ -395,11 +2656,51 @@ class ZipScheduler:
         Args:
             seconds_since_midnight(int): In lieu of current time for the purpose of the exercise
         """
-        for index, flight in enumerate(self._launched_flights):
-            if seconds_since_midnight > flight.get_return_time():
-                # Remove returned zips from launched/unavailable zips list
-                self._launched_flights.pop(index)
-                print(f"{flight} has returned!")
+        started = self.profiler.start()
+        # Move returned zips from the unavailable zips back to the Nest
+        with self._tick_lock:
+            for flight in self.fleet.land_returned(seconds_since_midnight):
+                if self.trace.enabled:
+                    self.trace.emit(
+                        "zip_returned",
+                        seconds_since_midnight,
+                        zip=flight.zip_id,
+                        launch_t=flight.launch_time,
+                        return_t=flight.get_return_time(),
+                    )
+        self.profiler.stop("track_flights", started)
+
+
+class EventQueue:
+    """Min-heap of simulation events, ordered by time and then by event kind.
+    Events of the same kind at the same time pop in the order they were pushed.
+    """
+
+    def __init__(self) -> None:
+        self._events: List[Tuple[int, int, int, Any]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def push(self, time: int, kind: int, payload: Any = None) -> None:
+        """
+        Schedule an event.
+        Args:
+            time (int): Seconds since midnight the event happens at.
+            kind (int): One of the *_EVENT constants.
+            payload (Any): Object the event is about, e.g. the Order received.
+        """
+        heapq.heappush(self._events, (time, kind, next(self._counter), payload))
+
+    def pop(self) -> Tuple[int, int, Any]:
+        """
+        Remove the next event.
+        Returns:
+            tuple: time, kind and payload of the earliest event.
+        """
+        time, kind, _, payload = heapq.heappop(self._events)
+        return time, kind, payload
 
 
 class Runner:
@@ -407,24 +2708,78 @@ class Runner:
     progressing.
     """
 
-    def __init__(self, hospitals_path: str, orders_path: str):
+    def __init__(
+        self,
+        hospitals_path: str,
+        orders_path: str,
+        trace: Optional[EventTrace] = None,
+        verbose: bool = True,
+        cache_orders: bool = True,
+        **scheduler_options: Any,
+    ):
+        """
+        Args:
+            hospitals_path (str): hospitals.csv to load.
+            orders_path (str): orders.csv to play back.
+            trace (EventTrace): Where the scheduler records its decisions, if anywhere.
+            verbose (bool): Whether to print orders, flights and the daily stats.
+            cache_orders (bool): Whether to use the binary cache of the orders CSV, see
+                `OrderTable.load`.
+            scheduler_options: ZipScheduler arguments that override the module defaults,
+                e.g. num_zips=12.
+        """
         with open(hospitals_path, "r") as f:
-            self.hospitals = Hospital.load_from_csv(f)
+            hospitals = Hospital.load_from_csv(f)
+
+        orders = OrderTable.load(orders_path, hospitals, cache=cache_orders)
+
+        self._start(hospitals, orders, trace, verbose, scheduler_options)
+
+    @classmethod
+    def from_loaded(
+        cls,
+        hospitals: Dict[str, Hospital],
+        orders: Union[List[Order], OrderTable],
+        trace: Optional[EventTrace] = None,
+        verbose: bool = True,
+        **scheduler_options: Any,
+    ) -> "Runner":
+        """
+        Build a runner around inputs that are already parsed, e.g. ones shared by many
+        simulations. A list of orders is queued as-is, so it must not have been run
+        before; an OrderTable creates fresh orders every run.
+        Takes the same options as `Runner()`.
+        """
+        runner = cls.__new__(cls)
+        runner._start(hospitals, orders, trace, verbose, scheduler_options)
+        return runner
 
-        with open(orders_path, "r") as f:
-            self.orders = Order.load_from_csv(f, self.hospitals)
+    def _start(
+        self,
+        hospitals: Dict[str, Hospital],
+        orders: Union[List[Order], OrderTable],
+        trace: Optional[EventTrace],
+        verbose: bool,
+        scheduler_options: Dict[str, Any],
+    ) -> None:
+        self.hospitals = hospitals
+        self.orders = orders
+        self.verbose = verbose
 
-        self.scheduler = ZipScheduler(
-            hospitals=self.hospitals,
+        options: Dict[str, Any] = dict(
             num_zips=NUM_ZIPS,
             max_packages_per_zip=MAX_PACKAGES_PER_ZIP,
             zip_speed_mps=ZIP_SPEED_MPS,
             zip_max_cumulative_range_m=ZIP_MAX_CUMULATIVE_RANGE_M,
         )
+        options.update(scheduler_options)
+        self.scheduler = ZipScheduler(hospitals=self.hospitals, trace=trace, **options)
         self.daily_flights_counter = 0
+        # flights launched by the emergency fast path, between minute ticks
+        self.emergency_dispatch_flights = 0
 
     @staticmethod
-    def get_minutes(seconds) -> float:
+    def get_minutes(seconds: float) -> float:
         """
         Convert to minutes given seconds.
         Args:
@@ -435,6 +2790,15 @@ class Runner:
         minutes = seconds / 60
         return minutes
 
+    def zip_utilisation(self) -> List[float]:
+        """
+        Returns:
+            list: Share of the day since the first order that each zip spent in the air.
+        """
+        if not self.orders:
+            return [0.0] * self.scheduler.num_zips
+        return self.scheduler.fleet.utilisation(SECONDS_PER_DAY - self.orders[0].time)
+
     def gather_stats(self) -> None:
         """
         Print out daily stats about FLIGHTS and ORDERS at the end of the day.
@@ -457,129 +2821,286 @@ class Runner:
             f"{len(self.scheduler.unfulfilled_orders)} unfulfilled orders at"
             + " the end of the day"
         )
-        avg_order_wait_time = round(
-            self.get_minutes(sum(ORDER_WAIT_TIME) / len(ORDER_WAIT_TIME)), 2
-        )
-        avg_resupply_order_wait_time = round(
-            self.get_minutes(
-                sum(RESUPPLY_ORDER_WAIT_TIME) / len(RESUPPLY_ORDER_WAIT_TIME)
-            ),
-            2,
-        )
-        avg_emergency_order_wait_time = round(
-            self.get_minutes(
-                sum(EMERGENCY_ORDER_WAIT_TIME) / len(EMERGENCY_ORDER_WAIT_TIME)
-            ),
-            2,
-        )
+        metrics = self.scheduler.metrics
+        emergency_wait = metrics.wait_s(EMERGENCY)
+        resupply_wait = metrics.wait_s(RESUPPLY)
+        avg_order_wait_time = round(self.get_minutes(metrics.order_wait_s.mean), 2)
+        avg_resupply_order_wait_time = round(self.get_minutes(resupply_wait.mean), 2)
+        avg_emergency_order_wait_time = round(self.get_minutes(emergency_wait.mean), 2)
 
         print(
             f"The average Emergency order wait time was: {avg_emergency_order_wait_time}"
-            + f" minutes for {len(EMERGENCY_ORDER_WAIT_TIME)} Emergency orders served."
+            + f" minutes for {emergency_wait.count} Emergency orders served."
         )
 
         print(
             f"The average Re-Supply wait time was: {avg_resupply_order_wait_time}"
-            + f" minutes for {len(RESUPPLY_ORDER_WAIT_TIME)} Re-Supply orders served."
+            + f" minutes for {resupply_wait.count} Re-Supply orders served."
         )
 
         print(
             f"The average order (Emergency or Re-Supply) wait time was: {avg_order_wait_time}"
-            + f" minutes for for {len(ORDER_WAIT_TIME)} total orders served."
+            + f" minutes for for {metrics.order_wait_s.count} total orders served."
         )
 
-        print("\nFLIGHT STATS\n")
-        avg_packages_per_flight = round(
-            sum(FLIGHT_PLAN_ORDERS) / len(FLIGHT_PLAN_ORDERS), 2
-        )
-        avg_distance_per_flight = round(
-            sum(FLIGHT_PLAN_DISTANCE) / len(FLIGHT_PLAN_DISTANCE)
+        for label, wait in (
+            ("Emergency", emergency_wait),
+            ("Re-Supply", resupply_wait),
+        ):
+            p50, p95, p99 = (
+                round(self.get_minutes(wait.percentile(p)), 2) for p in (50, 95, 99)
+            )
+            print(
+                f"{label} wait time percentiles: p50 {p50}, p95 {p95}, p99 {p99} minutes."
+            )
+        # Emergency orders are the ones where every second counts
+        p50, p90, p99 = (round(emergency_wait.percentile(p)) for p in (50, 90, 99))
+        print(
+            f"Emergency queue latency: p50 {p50}, p90 {p90}, p99 {p99},"
+            + f" max {round(emergency_wait.max or 0)} seconds."
         )
+        if self.scheduler.emergency_dispatch_delay_s is not None:
+            print(
+                f"{self.emergency_dispatch_flights} flights were launched between minute"
+                + " ticks by the emergency fast path (batching delay:"
+                + f" {self.scheduler.emergency_dispatch_delay_s} s)."
+            )
+
+        print("\nFLIGHT STATS\n")
+        avg_packages_per_flight = round(metrics.flight_packages.mean, 2)
+        avg_distance_per_flight = round(metrics.flight_distance_m.mean)
+        max_range_m = self.scheduler.zip_max_cumulative_range_m
         percent_max_flight_range_used = round(
-            (avg_distance_per_flight / ZIP_MAX_CUMULATIVE_RANGE_M) * 100
+            (avg_distance_per_flight / max_range_m) * 100
         )
 
         print(f"{self.daily_flights_counter} flights went out today.")
         print(
             f"Flights carried an average of {avg_packages_per_flight} packages and flew and average"
-            + f" of {avg_distance_per_flight} meters (max range: {ZIP_MAX_CUMULATIVE_RANGE_M}), using an average"
+            + f" of {avg_distance_per_flight} meters (max range: {max_range_m}), using an average"
             + f" {percent_max_flight_range_used}% of the max range."
         )
         print(
-            f"There were {len(NUM_MINS_WITH_0_ZIPS_AVAILABLE_AND_EMERGENCY_ORDER)} cumulative minutes with 0 zips"
+            f"There were {metrics.mins_with_0_zips_available_and_emergency_order} cumulative minutes with 0 zips"
             + " available and an Emergency package in the queue throughout the day."
         )
         print(
-            f"There were {len(NUM_MINS_WITH_0_ZIPS_AVAILABLE)} cumulative minutes with 0 zips available and any package"
+            f"There were {metrics.mins_with_0_zips_available} cumulative minutes with 0 zips available and any package"
             + " in the queue throughout the day."
         )
 
+        zip_utilisation = self.zip_utilisation()
+        print(
+            f"Zips were in the air an average of {round(100 * sum(zip_utilisation) / len(zip_utilisation))}%"
+            + f" of the day since the first order (busiest zip: {round(100 * max(zip_utilisation))}%,"
+            + f" least used zip: {round(100 * min(zip_utilisation))}%)."
+        )
+
     def run(self) -> None:
         """Run the simulator.
         This assumes any orders not fulfilled by the end of the day are failed.
 
         Note:
-            This is a barebones implementation that should help get you
-            started. You probably want to expand the runner's capabilities.
+            Time jumps straight from one event to the next: order arrivals, zip returns
+            and the once-a-minute scheduler ticks. Ticks are only scheduled while
+            orders are waiting, since `launch_flights` has nothing to do otherwise.
+            With the scheduler's emergency fast path on, an Emergency order arriving,
+            or a zip returning while one waits, also schedules an emergency dispatch
+            when `ZipScheduler.next_emergency_dispatch` asks for one before the next
+            tick.
         """
-
-        # Simulate time going from the first order time, until the end of the
-        # day, in 1 minute increments
-        sec_per_day = 24 * 60 * 60
-        for sec_since_midnight in range(self.orders[0].time, sec_per_day):
-            # Find and queue pending orders.
-            self.__queue_pending_orders(sec_since_midnight)
-
-            if sec_since_midnight % 60 == 0:
+        profiler = self.scheduler.profiler
+        run_started = profiler.start()
+        self._events = EventQueue()
+        self._next_tick: Optional[int] = None
+        self._next_dispatch: Optional[int] = None
+        # orders are handed to the event queue one at a time, as the previous one arrives
+        self._pending_orders = iter(self.orders)
+        self.__schedule_next_order()
+
+        while self._events:
+            sec_since_midnight, kind, payload = self._events.pop()
+            if sec_since_midnight >= SECONDS_PER_DAY:
+                break
+
+            started = profiler.start()
+            if kind == ORDER_RECEIVED_EVENT:
+                self.__queue_order(sec_since_midnight, payload)
+                self.__schedule_next_order()
+                self.__schedule_tick(sec_since_midnight)
+                if payload.priority == EMERGENCY:
+                    self.__schedule_emergency_dispatch(sec_since_midnight)
+                profiler.stop("order_received", started)
+            elif kind == SCHEDULER_TICK_EVENT:
+                self._next_tick = None
                 # Once a minute, poke the flight launcher
                 self.__update_launch_flights(sec_since_midnight)
+                if self.scheduler.num_unfulfilled_orders:
+                    self.__schedule_tick(sec_since_midnight + 1)
+                profiler.stop("scheduler_tick", started)
+            elif kind == FLIGHT_RETURNED_EVENT:
+                self.scheduler.track_flights(sec_since_midnight)
+                self.__schedule_emergency_dispatch(sec_since_midnight)
+                profiler.stop("flight_returned", started)
+            elif kind == EMERGENCY_DISPATCH_EVENT:
+                # dispatches that an earlier one replaced are dropped
+                if sec_since_midnight == self._next_dispatch:
+                    self._next_dispatch = None
+                    if self.__update_launch_flights(
+                        sec_since_midnight, emergency_only=True
+                    ):
+                        self.__schedule_emergency_dispatch(sec_since_midnight)
+                profiler.stop("emergency_dispatch", started)
+
+        self.scheduler.trace.flush()
+        profiler.stop("run", run_started)
+        if self.verbose:
+            self.gather_stats()
+
+    def __schedule_next_order(self) -> None:
+        """Schedule the arrival of the next order from the CSV, if there is one."""
+        order = next(self._pending_orders, None)
+        if order is not None:
+            self._events.push(order.time, ORDER_RECEIVED_EVENT, order)
+
+    def __schedule_tick(self, earliest: int) -> None:
+        """Schedule the first scheduler tick on or after a time, unless one is pending.
+
+        Args:
+            earliest (int): Seconds since midnight.
+        """
+        if self._next_tick is None:
+            self._next_tick = -(-earliest // SECONDS_PER_TICK) * SECONDS_PER_TICK
+            self._events.push(self._next_tick, SCHEDULER_TICK_EVENT)
 
-        self.gather_stats()
+    def __schedule_emergency_dispatch(self, now: int) -> None:
+        """Schedule an emergency dispatch if the scheduler wants one before the next tick.
+
+        Args:
+            now (int): Seconds since midnight.
+        """
+        due = self.scheduler.next_emergency_dispatch(now)
+        if due is None:
+            return
+        # a tick, or a dispatch, at or before then launches the order anyway
+        for pending in (self._next_tick, self._next_dispatch):
+            if pending is not None and pending <= due:
+                return
+        self._next_dispatch = due
+        self._events.push(due, EMERGENCY_DISPATCH_EVENT)
 
-    def __queue_pending_orders(self, sec_since_midnight: int) -> None:
-        """Grab an order from the queue and queue it.
+    def __queue_order(self, sec_since_midnight: int, order: Order) -> None:
+        """Tell our scheduler about an order that was just placed.
 
         Args:
             sec_since_midnight (int): Seconds since midnight.
+            order (Order): the order just placed.
         """
-        while self.orders and self.orders[0].time == sec_since_midnight:
-            # Find any orders that were placed during this second and tell
-            # our scheduler about them
-            order = self.orders.pop(0)
+        if self.verbose:
             print(
                 f"[{sec_since_midnight}] {order.priority} order received",
                 f"to {order.hospital.name}",
             )
-            self.scheduler.queue_order(order)
+        self.scheduler.queue_order(order)
 
-    def __update_launch_flights(self, sec_since_midnight: int) -> None:
+    def __update_launch_flights(
+        self, sec_since_midnight: int, emergency_only: bool = False
+    ) -> int:
         """Schedule which flights should launch now.
 
         Args:
             sec_since_midnight (int): Seconds since midnight.
+            emergency_only (bool): Whether this is an emergency dispatch between ticks.
+        Returns:
+            int: Number of flights launched.
         """
-        flights = self.scheduler.launch_flights(current_time=sec_since_midnight)
+        flights = self.scheduler.launch_flights(
+            current_time=sec_since_midnight, emergency_only=emergency_only
+        )
         if flights:
-            print(f"[{sec_since_midnight}] Scheduling flights:")
+            if self.verbose:
+                label = "emergency flights" if emergency_only else "flights"
+                print(f"[{sec_since_midnight}] Scheduling {label}:")
             for f in flights:
-                print(f"{f}\n")
+                if self.verbose:
+                    print(f"{f}\n")
                 self.daily_flights_counter += 1
+                if emergency_only:
+                    self.emergency_dispatch_flights += 1
+                # a zip counts as back the second after its return time
+                self._events.push(f.get_return_time() + 1, FLIGHT_RETURNED_EVENT, f)
+        return len(flights or [])
 
 
 """
 Usage:
 
-> python3 traveling_zip.py
+> python3 traveling_zip.py [--trace trace.jsonl]
 
 Runs the provided CSVs
 Feel free to edit this if you'd like
 """
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the provided order CSVs.")
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="append a JSON Lines trace of scheduling decisions to this file",
+    )
+    parser.add_argument(
+        "--packing-budget-ms",
+        type=float,
+        help="let each tick spend this long improving how orders are packed on zips",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="parse orders.csv instead of using (or writing) its binary cache",
+    )
+    parser.add_argument(
+        "--emergency-delay-s",
+        type=int,
+        help="launch Emergency orders between minute ticks, once they have waited this"
+        + " long for other orders to join them (0 launches them as soon as a zip is free)",
+    )
+    parser.add_argument(
+        "--grid-map",
+        metavar="NPZ",
+        help="fly around the blocked cells of this map (see GridDistances.load)"
+        + " instead of in straight lines",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="run under cProfile, and write the scheduler's phase timings and the"
+        + " cProfile report, by cumulative time, to this file",
+    )
+    args = parser.parse_args()
+
     root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     hospitals_path = os.path.join(root_dir, "inputs", "hospitals.csv")
     orders_path = os.path.join(root_dir, "inputs", "orders.csv")
+    trace = EventTrace.open(args.trace) if args.trace else None
     runner = Runner(
         hospitals_path=hospitals_path,
         orders_path=orders_path,
+        trace=trace,
+        cache_orders=not args.no_cache,
+        distance_provider=GridDistances.load(args.grid_map) if args.grid_map else None,
+        emergency_dispatch_delay_s=args.emergency_delay_s,
+        packing_budget_s=(
+            args.packing_budget_ms / 1000
+            if args.packing_budget_ms is not None
+            else None
+        ),
     )
-    runner.run()
+    if args.profile:
+        profile = cProfile.Profile()
+        profile.runcall(runner.run)
+        with open(args.profile, "w") as f:
+            f.write("\n".join(runner.scheduler.profiler.report()) + "\n\n")
+            pstats.Stats(profile, stream=f).sort_stats("cumulative").print_stats(50)
+    else:
+        runner.run()
+    if trace is not None:
+        trace.close()
@@ -0,0 +1,179 @@
+#! /usr/bin/env python3
+"""
+Seeded synthetic workloads for the scheduler.
+
+Generates a hospital layout and a day of orders in the same CSV formats as
+`inputs/hospitals.csv` and `inputs/orders.csv`, at any size. The same seed always
+produces the same files.
+
+Usage:
+
+> python3 workload.py --hospitals 1000 --orders 100000 --out-dir /tmp/workload
+> python3 workload.py --hospitals 10000 --orders 1000000 --emergency-ratio 0.2 \
+      --burstiness 0.5 --seed 7 --out-dir /tmp/workload
+"""
+
+import argparse
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from traveling_zip import (
+    EMERGENCY,
+    RESUPPLY,
+    SECONDS_PER_DAY,
+    ZIP_MAX_CUMULATIVE_RANGE_M,
+)
+
+# (name, north_m, east_m)
+HospitalRow = Tuple[str, int, int]
+# (received time, hospital name, priority)
+OrderRow = Tuple[int, str, str]
+
+# orders are received between 6am and 10pm by default
+DEFAULT_FIRST_ORDER_S = 6 * 60 * 60
+DEFAULT_LAST_ORDER_S = 22 * 60 * 60
+
+# a burst spreads its orders around its centre with this standard deviation (s)
+BURST_SPREAD_S = 300
+# average number of orders in a burst
+ORDERS_PER_BURST = 20
+
+
+def generate_hospitals(
+    num_hospitals: int,
+    radius_m: float = 0.45 * ZIP_MAX_CUMULATIVE_RANGE_M,
+    seed: int = 0,
+) -> List[HospitalRow]:
+    """
+    Scatter hospitals uniformly over a disc centered on the Nest.
+    Args:
+        num_hospitals (int): Number of hospitals.
+        radius_m (float): Radius of the disc (m). The default keeps every hospital
+            reachable on a single-stop flight.
+        seed (int): Random seed.
+    Returns:
+        list: (name, north_m, east_m) per hospital.
+    """
+    rng = np.random.default_rng(seed)
+    # the square root spreads hospitals evenly over the area instead of bunching them at the centre
+    distances = radius_m * np.sqrt(rng.random(num_hospitals))
+    angles = rng.random(num_hospitals) * 2 * np.pi
+    norths = np.rint(distances * np.cos(angles)).astype(int)
+    easts = np.rint(distances * np.sin(angles)).astype(int)
+    width = len(str(num_hospitals))
+    return [
+        (f"Hospital{index:0{width}d}", int(north), int(east))
+        for index, (north, east) in enumerate(zip(norths, easts))
+    ]
+
+
+def generate_orders(
+    hospital_names: List[str],
+    num_orders: int,
+    emergency_ratio: float = 0.3,
+    burstiness: float = 0.0,
+    first_order_s: int = DEFAULT_FIRST_ORDER_S,
+    last_order_s: int = DEFAULT_LAST_ORDER_S,
+    seed: int = 0,
+) -> List[OrderRow]:
+    """
+    Generate a day of orders, sorted by the time they were received.
+    Args:
+        hospital_names (list): Hospitals the orders are for, picked uniformly.
+        num_orders (int): Number of orders.
+        emergency_ratio (float): Share of Emergency orders, between 0 and 1.
+        burstiness (float): Share of orders that arrive in bursts of about
+            ORDERS_PER_BURST orders, between 0 and 1. The rest arrive uniformly.
+        first_order_s (int): Earliest time an order can be received (s since midnight).
+        last_order_s (int): Latest time an order can be received (s since midnight).
+        seed (int): Random seed.
+    Returns:
+        list: (received time, hospital name, priority) per order.
+    """
+    rng = np.random.default_rng(seed)
+    num_bursty = int(round(num_orders * burstiness))
+
+    times = rng.uniform(first_order_s, last_order_s, num_orders - num_bursty)
+    if num_bursty:
+        num_bursts = max(num_bursty // ORDERS_PER_BURST, 1)
+        centres = rng.uniform(first_order_s, last_order_s, num_bursts)
+        bursts = centres[rng.integers(0, num_bursts, num_bursty)]
+        bursts += rng.normal(0, BURST_SPREAD_S, num_bursty)
+        times = np.concatenate([times, bursts])
+    times = np.sort(np.clip(np.rint(times), 0, SECONDS_PER_DAY - 1).astype(int))
+
+    hospital_indices = rng.integers(0, len(hospital_names), num_orders)
+    emergencies = rng.random(num_orders) < emergency_ratio
+    return [
+        (int(time), hospital_names[hospital], EMERGENCY if emergency else RESUPPLY)
+        for time, hospital, emergency in zip(times, hospital_indices, emergencies)
+    ]
+
+
+def write_hospitals_csv(path: str, hospitals: List[HospitalRow]) -> None:
+    with open(path, "w") as f:
+        f.writelines(f"{name}, {north}, {east}\n" for name, north, east in hospitals)
+
+
+def write_orders_csv(path: str, orders: List[OrderRow]) -> None:
+    with open(path, "w") as f:
+        f.writelines(f"{time}, {name}, {priority}\n" for time, name, priority in orders)
+
+
+def generate_workload(
+    out_dir: str,
+    num_hospitals: int,
+    num_orders: int,
+    emergency_ratio: float = 0.3,
+    burstiness: float = 0.0,
+    seed: int = 0,
+) -> Tuple[str, str]:
+    """
+    Generate a hospital layout and a day of orders and write them as CSVs.
+    Args:
+        out_dir (str): Directory to write hospitals.csv and orders.csv to.
+        num_hospitals (int): Number of hospitals.
+        num_orders (int): Number of orders.
+        emergency_ratio (float): Share of Emergency orders.
+        burstiness (float): Share of orders that arrive in bursts.
+        seed (int): Random seed.
+    Returns:
+        tuple: Paths of the hospitals and orders CSVs.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    hospitals = generate_hospitals(num_hospitals, seed=seed)
+    orders = generate_orders(
+        [name for name, _, _ in hospitals],
+        num_orders,
+        emergency_ratio=emergency_ratio,
+        burstiness=burstiness,
+        seed=seed,
+    )
+    hospitals_path = os.path.join(out_dir, "hospitals.csv")
+    orders_path = os.path.join(out_dir, "orders.csv")
+    write_hospitals_csv(hospitals_path, hospitals)
+    write_orders_csv(orders_path, orders)
+    return hospitals_path, orders_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic workload.")
+    parser.add_argument("--hospitals", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--emergency-ratio", type=float, default=0.3)
+    parser.add_argument("--burstiness", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", required=True)
+    args = parser.parse_args()
+
+    paths = generate_workload(
+        args.out_dir,
+        args.hospitals,
+        args.orders,
+        emergency_ratio=args.emergency_ratio,
+        burstiness=args.burstiness,
+        seed=args.seed,
+    )
+    print("\n".join(paths))